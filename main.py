@@ -1,11 +1,12 @@
-import matplotlib.pyplot as plt
-import matplotlib.patches as patches
-from matplotlib.widgets import Slider, Button
-import math
+import datetime
+import difflib
+import os
 
-plt.style.use('dark_background')
-# Tắt toolbar TRƯỚC khi tạo figure
-plt.rcParams['toolbar'] = 'None'
+# Chỉ lõi tính toán (numpy) được import ở đây; matplotlib, Tk và style chỉ
+# được nạp khi ứng dụng tương tác thực sự khởi động
+from prism import physics
+from prism.dispersion import CauchyModel
+from prism.profiler import FrameProfiler
 
 class SimplePrismSimulator:
     def __init__(self):
@@ -15,15 +16,27 @@ class SimplePrismSimulator:
         self.theta1 = 45  # Góc tới (độ)
         self.prism_angle = 60  # Góc lăng kính
         
-        # Màu sắc cho tán sắc
-        self.colors = ['#8A2BE2', '#4169E1', '#00BFFF', '#00FF00', '#FFFF00', '#FFA500', '#FF0000']
-        self.wavelengths = ['380nm', '450nm', '485nm', '510nm', '570nm', '590nm', '650nm']
-        self.n_colors = [1.532, 1.528, 1.525, 1.522, 1.520, 1.518, 1.515]
-        
         # Trạng thái hiển thị
         self.show_dispersion = False
         self.show_angles = True
         self.show_normals = False
+        self.show_curve = False
+        
+        # Mô hình tán sắc: mặc định hoặc thủy tinh chọn từ danh mục
+        self.dispersion_model = CauchyModel()
+        
+        # Góc nghiêng tia tới ra khỏi mặt tiết diện (phím lên/xuống), khác 0 = tia xiên 3D
+        self.tilt = 0.0
+        
+        # Đo thời gian từng giai đoạn (F2: bật/tắt overlay, F3: xuất trace)
+        self.profiler = FrameProfiler()
+        self.profiler.enabled = os.environ.get('PRISM_PROFILE', '') not in ('', '0')
+        
+        # Hàng đợi xuất ảnh nền (tạo ở lần chụp ảnh đầu tiên)
+        self.exports = None
+        
+        # Cửa sổ bản đồ chế độ tia (F4)
+        self.regime_window = None
         
         self.setup_figure()
         self.create_widgets()
@@ -32,6 +45,12 @@ class SimplePrismSimulator:
         
     def setup_figure(self):
         """Thiết lập figure và axes"""
+        import matplotlib.pyplot as plt
+        from prism.scene import PrismScene, apply_style
+        
+        # Style tối và tắt toolbar TRƯỚC khi tạo figure
+        apply_style()
+        
         self.fig = plt.figure(figsize=(14, 10), facecolor='#1a1a2e')
         self.fig.suptitle('MO PHONG LANG KINH CHINH XAC', 
                          fontsize=16, fontweight='bold', color='white', y=0.95)
@@ -53,8 +72,19 @@ class SimplePrismSimulator:
         self.ax_controls = self.fig.add_subplot(gs[1, :])
         self.ax_controls.axis('off')
         
+        # Các artist được tạo một lần, update_plot chỉ cập nhật dữ liệu
+        self.scene = PrismScene(self.ax_main, self.ax_info, profiler=self.profiler)
+        
+        self.profiler.instrument_canvas(self.fig.canvas)
+        self.profiler.attach_overlay(self.fig)
+        self.fig.canvas.mpl_connect('key_press_event', self.on_key)
+        
     def create_widgets(self):
         """Tạo widgets điều khiển"""
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider, Button, TextBox
+        from prism.scheduler import UpdateScheduler
+        
         # Slider parameters
         slider_height = 0.03
         slider_width = 0.25
@@ -103,32 +133,35 @@ class SimplePrismSimulator:
         ax_screenshot = plt.axes([button_left, bottom_start - 3*spacing, button_width, button_height])
         self.btn_screenshot = Button(ax_screenshot, 'Chụp ảnh', color='lightyellow')
         
+        # Nút Đường cong δ(θ₁)
+        ax_curve = plt.axes([button_left, bottom_start - 4*spacing, button_width, button_height])
+        self.btn_curve = Button(ax_curve, 'Đường cong δ', color='plum')
+        
+        # Ô nhập tên thủy tinh (Enter để chọn, để trống: mô hình mặc định)
+        ax_glass = plt.axes([button_left + button_width + 0.08, bottom_start,
+                             0.1, button_height])
+        self.text_glass = TextBox(ax_glass, 'Thủy tinh ', initial='')
+        self.text_glass.text_disp.set_color('black')
+        
+        # Slider chỉ yêu cầu vẽ lại; bộ lập lịch gộp các yêu cầu thành tối đa
+        # một khung hình (update_plot đã vẽ cả figure nên slider không tự vẽ)
+        self.scheduler = UpdateScheduler(self.fig.canvas, self.update_plot)
+        for slider in (self.slider_n1, self.slider_n2,
+                       self.slider_theta, self.slider_prism_angle):
+            slider.drawon = False
+            slider.on_changed(self.scheduler.request)
+        
         # Connect events
-        self.slider_n1.on_changed(self.update_plot)
-        self.slider_n2.on_changed(self.update_plot)
-        self.slider_theta.on_changed(self.update_plot)
-        self.slider_prism_angle.on_changed(self.update_plot)
         self.btn_reset.on_clicked(self.reset_values)
         self.btn_dispersion.on_clicked(self.toggle_dispersion)
         self.btn_normal.on_clicked(self.set_normal_mode)
         self.btn_screenshot.on_clicked(self.take_screenshot)
+        self.btn_curve.on_clicked(self.toggle_curve)
+        self.text_glass.on_submit(self.select_glass)
         
     def snell_law(self, n1, n2, theta1):
         """Định luật Snell"""
-        if theta1 == 0:
-            return 0
-        
-        theta1_rad = math.radians(abs(theta1))
-        sin_theta2 = (n1 / n2) * math.sin(theta1_rad)
-        
-        if abs(sin_theta2) > 1:
-            return None  # Phản xạ toàn phần
-            
-        theta2_rad = math.asin(sin_theta2)
-        theta2 = math.degrees(theta2_rad)
-        
-        # Giữ dấu
-        return theta2 if theta1 >= 0 else -theta2
+        return physics.snell_law(n1, n2, theta1)
     
     def calculate_prism_ray(self, n_medium):
         """Tính toán tia sáng qua lăng kính"""
@@ -137,369 +170,161 @@ class SimplePrismSimulator:
         theta1 = self.slider_theta.val
         A = self.slider_prism_angle.val
         
-        # Bước 1: Khúc xạ tại mặt vào
-        r1 = self.snell_law(n1, n2, theta1)
-        if r1 is None:
-            return {"error": "Phản xạ toàn phần tại mặt vào"}
-        
-        # Bước 2: Góc tới tại mặt ra
-        r2 = A - r1
-        if r2 < 0:
-            return {"error": "Tia không đến mặt ra"}
-        
-        # Bước 3: Khúc xạ tại mặt ra
-        theta2 = self.snell_law(n2, n1, r2)
-        if theta2 is None:
-            return {"error": "Phản xạ toàn phần tại mặt ra"}
-        
-        # Bước 4: Tính góc lệch
-        delta = theta1 + theta2 - A
-        
-        return {
-            "theta1": theta1,    # Góc tới
-            "r1": r1,           # Góc khúc xạ tại mặt vào
-            "r2": r2,           # Góc tới tại mặt ra
-            "theta2": theta2,   # Góc ra
-            "delta": delta      # Góc lệch
-        }
-    
-    def draw_prism(self):
-        """Vẽ lăng kính tam giác đều"""
-        A_rad = math.radians(self.prism_angle)
-        
-        # Tọa độ lăng kính (tam giác cân với đỉnh ở trên)
-        height = 1.5
-        base_half = height * math.tan(A_rad / 2)
-        
-        # 3 đỉnh lăng kính
-        vertices = [
-            [-base_half, 0],      # Trái dưới
-            [base_half, 0],       # Phải dưới
-            [0, height]           # Đỉnh trên
-        ]
-        
-        # Vẽ lăng kính
-        prism = patches.Polygon(vertices, closed=True, 
-                              facecolor='lightblue', alpha=0.3,
-                              edgecolor='cyan', linewidth=3)
-        self.ax_main.add_patch(prism)
-        
-        # Vẽ viền
-        vertices_closed = vertices + [vertices[0]]
-        x_coords = [v[0] for v in vertices_closed]
-        y_coords = [v[1] for v in vertices_closed]
-        self.ax_main.plot(x_coords, y_coords, 'cyan', linewidth=3, label='Lăng kính')
-        
-        return vertices
-    
-    def draw_single_ray(self):
-        """Vẽ tia sáng đơn màu"""
-        result = self.calculate_prism_ray(self.slider_n2.val)
-        
-        if "error" in result:
-            # Hiển thị lỗi
-            self.ax_main.text(0, -0.5, result["error"], 
-                            ha='center', fontsize=12, color='red', fontweight='bold',
-                            bbox=dict(boxstyle="round", facecolor="yellow", alpha=0.8))
-            return
-        
-        # Tính toán tọa độ các điểm
-        A_rad = math.radians(self.prism_angle)
-        height = 1.5
-        base_half = height * math.tan(A_rad / 2)
-        
-        # Điểm va chạm tại mặt trái (đơn giản hóa)
-        impact_x = -base_half/2
-        impact_y = height * (1 - abs(impact_x)/base_half)  # Tỷ lệ với chiều cao
-        
-        # Điểm ra tại mặt phải
-        exit_x = base_half/2
-        exit_y = height * (1 - abs(exit_x)/base_half)
-        
-        # 1. Tia tới
-        theta1_rad = math.radians(result["theta1"])
-        start_x = impact_x - 2.0  # Điểm bắt đầu
-        start_y = impact_y - 2.0 * math.tan(theta1_rad)  # Tính từ góc tới
-        
-        self.ax_main.plot([start_x, impact_x], [start_y, impact_y], 
-                         'red', linewidth=3, label='Tia tới', alpha=0.9)
-        
-        # 2. Tia trong lăng kính
-        self.ax_main.plot([impact_x, exit_x], [impact_y, exit_y], 
-                         'orange', linewidth=3, label='Tia trong lăng kính', alpha=0.9)
-        
-        # 3. Tia ra
-        theta2_rad = math.radians(result["theta2"])
-        end_x = exit_x + 2.0
-        end_y = exit_y + 2.0 * math.tan(theta2_rad)
-        
-        self.ax_main.plot([exit_x, end_x], [exit_y, end_y], 
-                         'lime', linewidth=3, label='Tia ra', alpha=0.9)
-        
-        # Hiển thị thông tin góc
-        if self.show_angles:
-            # Góc tới
-            self.ax_main.text(impact_x-0.3, impact_y+0.15, 
-                            f'θ₁={result["theta1"]:.1f}°', 
-                            color='red', fontsize=10, fontweight='bold')
-            
-            # Góc khúc xạ trong lăng kính
-            self.ax_main.text(impact_x+0.1, impact_y-0.15, 
-                            f'r₁={result["r1"]:.1f}°', 
-                            color='orange', fontsize=10, fontweight='bold')
-            
-            # Góc tới tại mặt ra
-            self.ax_main.text(exit_x-0.2, exit_y-0.15, 
-                            f'r₂={result["r2"]:.1f}°', 
-                            color='orange', fontsize=9, fontweight='bold')
-            
-            # Góc ra
-            self.ax_main.text(exit_x+0.15, exit_y+0.1, 
-                            f'θ₂={result["theta2"]:.1f}°', 
-                            color='lime', fontsize=10, fontweight='bold')
-        
-        # Hiển thị góc lệch
-        self.ax_main.text(1.2, -1.0, f'Góc lệch δ = {result["delta"]:.1f}°', 
-                        color='yellow', fontsize=12, fontweight='bold',
-                        bbox=dict(boxstyle="round", facecolor="blue", alpha=0.7))
+        return physics.prism_ray(n1, n2, theta1, A)
     
-    def draw_dispersed_rays(self):
-        """Vẽ tia sáng tán sắc"""
-        # Tia tới trắng (chung cho tất cả màu)
-        basic_result = self.calculate_prism_ray(self.slider_n2.val)
-        
-        if "error" not in basic_result:
-            # Vẽ tia tới trắng
-            A_rad = math.radians(self.prism_angle)
-            height = 1.5
-            base_half = height * math.tan(A_rad / 2)
-            
-            impact_x = -base_half/2
-            impact_y = height * (1 - abs(impact_x)/base_half)
-            
-            theta1_rad = math.radians(basic_result["theta1"])
-            start_x = impact_x - 2.0
-            start_y = impact_y - 2.0 * math.tan(theta1_rad)
-            
-            self.ax_main.plot([start_x, impact_x], [start_y, impact_y], 
-                             'white', linewidth=4, label='Tia tới (trắng)', alpha=0.8)
-        
-        # Vẽ từng màu tán sắc
-        for i, (color, n_color, wavelength) in enumerate(zip(self.colors, self.n_colors, self.wavelengths)):
-            result = self.calculate_prism_ray(n_color)
-            
-            if "error" not in result:
-                A_rad = math.radians(self.prism_angle)
-                height = 1.5
-                base_half = height * math.tan(A_rad / 2)
-                
-                impact_x = -base_half/2
-                impact_y = height * (1 - abs(impact_x)/base_half)
-                exit_x = base_half/2
-                exit_y = height * (1 - abs(exit_x)/base_half)
-                
-                # Tia trong lăng kính
-                self.ax_main.plot([impact_x, exit_x], [impact_y, exit_y], 
-                                 color=color, linewidth=2, alpha=0.6)
-                
-                # Tia ra với góc khác nhau do tán sắc
-                theta2_rad = math.radians(result["theta2"])
-                end_x = exit_x + 2.5
-                end_y = exit_y + 2.5 * math.tan(theta2_rad)
-                
-                self.ax_main.plot([exit_x, end_x], [exit_y, end_y], 
-                                 color=color, linewidth=3, alpha=0.9,
-                                 label=f'{wavelength} (δ={result["delta"]:.1f}°)')
-        
-        # Chú thích tán sắc
-        self.ax_main.text(0, 2.2, 'TAN SAC ANH SANG', 
-                        ha='center', fontsize=12, color='white', fontweight='bold',
-                        bbox=dict(boxstyle="round", facecolor="purple", alpha=0.7))
-    
-    def draw_info_panel(self):
-        """Vẽ panel thông tin bên phải"""
-        self.ax_info.clear()
-        self.ax_info.set_xlim(0, 1)
-        self.ax_info.set_ylim(0, 1)
-        self.ax_info.axis('off')
-        
-        # Thông số hiện tại
-        info_text = f"""
-THAM SO:
-n1 = {self.slider_n1.val:.2f}
-n2 = {self.slider_n2.val:.2f}
-theta1 = {self.slider_theta.val:.1f} do
-A = {self.slider_prism_angle.val:.1f} do
-
-DINH LUAT SNELL:
-n1 x sin(theta1) = n2 x sin(theta2)
-
-TAN SAC:
-Chi so khuc xa phu thuoc
-buoc song anh sang
--> Tach thanh cac mau
-
-PHAN XA TOAN PHAN:
-Xay ra khi:
-sin(theta) > n2/n1
-        """
-        
-        self.ax_info.text(0.05, 0.95, info_text, transform=self.ax_info.transAxes,
-                         fontsize=10, color='white', verticalalignment='top',
-                         bbox=dict(boxstyle="round,pad=0.5", facecolor="navy", alpha=0.8))
+    def get_state(self):
+        """Trạng thái cảnh hiện tại lấy từ các slider"""
+        from prism.scene import SceneState
+        return SceneState(n1=self.slider_n1.val,
+                          n2=self.slider_n2.val,
+                          theta1=self.slider_theta.val,
+                          prism_angle=self.slider_prism_angle.val,
+                          show_dispersion=self.show_dispersion,
+                          show_angles=self.show_angles,
+                          show_curve=self.show_curve,
+                          dispersion_model=self.dispersion_model,
+                          tilt=self.tilt)
     
     def update_plot(self, val=None):
         """Cập nhật toàn bộ đồ thị"""
-        # Lấy giá trị từ slider để cập nhật biến trạng thái
-        self.prism_angle = self.slider_prism_angle.val
-        
-        # Xóa và thiết lập lại axes chính
-        self.ax_main.clear()
-        self.ax_main.set_xlim(-3, 4)
-        self.ax_main.set_ylim(-1.5, 2.5)
-        self.ax_main.set_aspect('equal')
-        self.ax_main.grid(True, alpha=0.3)
-        self.ax_main.set_facecolor('#16213e')
-        
-        # Vẽ các thành phần
-        self.draw_prism()
-        
-        if self.show_dispersion:
-            self.draw_dispersed_rays()
-        else:
-            self.draw_single_ray()
-        
-        self.draw_info_panel()
-        
-        # Labels
-        self.ax_main.set_xlabel('X (đơn vị tùy ý)', color='white')
-        self.ax_main.set_ylabel('Y (đơn vị tùy ý)', color='white')
+        with self.profiler.stage('update_plot'):
+            # Lấy giá trị từ slider để cập nhật biến trạng thái
+            self.prism_angle = self.slider_prism_angle.val
+            
+            # Chỉ cập nhật dữ liệu của các artist đã có, không xóa axes
+            self.scene.update(self.get_state())
         
-        # Legend
-        if not self.show_dispersion:
-            self.ax_main.legend(loc='upper right', framealpha=0.8, fontsize=9)
+        self.profiler.update_overlay()
+        self.fig.canvas.draw_idle()
         
-        plt.draw()
+        if self.regime_window is not None:
+            fig, view, _ = self.regime_window
+            view.set_marker(self.slider_theta.val, self.slider_prism_angle.val)
+            fig.canvas.draw_idle()
     
     def setup_zoom(self):
-        """Thiết lập zoom và pan với chuột"""
-        def zoom_factory(ax, base_scale=2.):
-            def zoom_fun(event):
-                if event.inaxes != ax:
-                    return
-                    
-                cur_xlim = ax.get_xlim()
-                cur_ylim = ax.get_ylim()
-                
-                xdata = event.xdata
-                ydata = event.ydata
-                
-                if event.button == 'up':
-                    scale_factor = 1 / base_scale
-                elif event.button == 'down':
-                    scale_factor = base_scale
-                else:
-                    return
-                
-                new_width = (cur_xlim[1] - cur_xlim[0]) * scale_factor
-                new_height = (cur_ylim[1] - cur_ylim[0]) * scale_factor
-                
-                relx = (cur_xlim[1] - xdata)/(cur_xlim[1] - cur_xlim[0])
-                rely = (cur_ylim[1] - ydata)/(cur_ylim[1] - cur_ylim[0])
-                
-                ax.set_xlim([xdata - new_width * (1-relx), xdata + new_width * (relx)])
-                ax.set_ylim([ydata - new_height * (1-rely), ydata + new_height * (rely)])
-                ax.figure.canvas.draw()
-            
-            fig = ax.get_figure()
-            fig.canvas.mpl_connect('scroll_event', zoom_fun)
-            return zoom_fun
-        
-        def pan_factory(ax):
-            """Thêm chức năng kéo để dịch chuyển mượt mà"""
-            # Lưu trạng thái
-            pan_factory.is_pressed = False
-            pan_factory.press_data = None
-            
-            def on_press(event):
-                if event.inaxes != ax or event.button != 1:  # Chỉ chuột trái
-                    return
-                    
-                pan_factory.is_pressed = True
-                pan_factory.press_data = {
-                    'x': event.xdata,
-                    'y': event.ydata,
-                    'xlim': ax.get_xlim(),
-                    'ylim': ax.get_ylim()
-                }
-                # Thay đổi cursor khi kéo
-                ax.figure.canvas.get_tk_widget().configure(cursor="fleur")
-
-            def on_motion(event):
-                if not pan_factory.is_pressed or pan_factory.press_data is None:
-                    return
-                if event.inaxes != ax:
-                    return
-
-                # Tính độ dịch chuyển
-                dx = event.xdata - pan_factory.press_data['x']
-                dy = event.ydata - pan_factory.press_data['y']
-                
-                # Cập nhật giới hạn axes (mượt hơn)
-                xlim = pan_factory.press_data['xlim']
-                ylim = pan_factory.press_data['ylim']
-                
-                ax.set_xlim(xlim[0] - dx, xlim[1] - dx)
-                ax.set_ylim(ylim[0] - dy, ylim[1] - dy)
-                
-                # Sử dụng draw_idle thay vì draw để giảm lag
-                ax.figure.canvas.draw_idle()
-
-            def on_release(event):
-                if pan_factory.is_pressed:
-                    pan_factory.is_pressed = False
-                    pan_factory.press_data = None
-                    # Trở lại cursor bình thường
-                    try:
-                        ax.figure.canvas.get_tk_widget().configure(cursor="")
-                    except:
-                        pass  # Ignore nếu không phải tkinter backend
-                    ax.figure.canvas.draw()
-
-            # Kết nối events
-            fig = ax.get_figure()
-            fig.canvas.mpl_connect('button_press_event', on_press)
-            fig.canvas.mpl_connect('motion_notify_event', on_motion)
-            fig.canvas.mpl_connect('button_release_event', on_release)
-            
-        zoom_factory(self.ax_main)
-        pan_factory(self.ax_main)
+        """Thiết lập zoom và pan với chuột (vẽ lại bằng blitting)"""
+        from prism.navigation import AxesNavigator
+        self.navigator = AxesNavigator(self.ax_main, profiler=self.profiler)
     
     def reset_values(self, event):
         """Reset về giá trị mặc định"""
-        self.slider_n1.reset()
-        self.slider_n2.reset()
-        self.slider_theta.reset()
-        self.slider_prism_angle.reset()
-        self.show_dispersion = False
-        self.update_plot()
+        # Bốn slider reset + đổi chế độ chỉ tạo đúng một khung hình
+        with self.scheduler.batch():
+            self.slider_n1.reset()
+            self.slider_n2.reset()
+            self.slider_theta.reset()
+            self.slider_prism_angle.reset()
+            self.show_dispersion = False
+            self.dispersion_model = CauchyModel()
+            self.tilt = 0.0
+            self.text_glass.set_val('')
+            self.scene.reset_view()
+            self.scheduler.request()
     
     def toggle_dispersion(self, event):
         """Bật chế độ tán sắc"""
         self.show_dispersion = True
-        self.update_plot()
+        self.scheduler.request()
     
     def set_normal_mode(self, event):
         """Bật chế độ bình thường (tia đơn màu)"""
         self.show_dispersion = False
-        self.update_plot()
+        self.scheduler.request()
+    
+    def select_glass(self, text):
+        """Chọn thủy tinh trong danh mục cho chế độ tán sắc; n₂ đặt theo n_d của nó"""
+        from prism.catalog import CatalogGlass, load_catalog
+        
+        name = text.strip()
+        if not name:
+            self.dispersion_model = CauchyModel()
+            self.scheduler.request()
+            return
+        
+        catalog = load_catalog()
+        if name not in catalog:
+            matches = difflib.get_close_matches(name.upper(), catalog.names, n=3)
+            hint = f" (goi y: {', '.join(matches)})" if matches else ""
+            print(f"Khong co thuy tinh '{name}' trong danh muc{hint}")
+            return
+        
+        glass = CatalogGlass(catalog.names[catalog.row(name)])
+        with self.scheduler.batch():
+            self.dispersion_model = glass
+            self.show_dispersion = True
+            self.slider_n2.set_val(glass.nd)
+            self.scheduler.request()
+    
+    def toggle_curve(self, event):
+        """Bật/tắt inset đường cong góc lệch δ(θ₁)"""
+        self.show_curve = not self.show_curve
+        self.scheduler.request()
+    
+    def on_key(self, event):
+        """F2: bật/tắt profiler và overlay; F3: xuất dòng thời gian ra file trace;
+        F4: mở bản đồ chế độ tia; lên/xuống: tăng/giảm góc nghiêng tia tới 5°"""
+        if event.key == 'f2':
+            self.profiler.enabled = not self.profiler.enabled
+            self.profiler.reset()
+            self.scheduler.request()
+        elif event.key == 'f3':
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"prism_trace_{timestamp}.json"
+            count = self.profiler.export_trace(filename)
+            print(f"Da luu trace ({count} su kien): {filename}")
+        elif event.key == 'f4':
+            self.show_regime_map()
+        elif event.key in ('up', 'down'):
+            step = 5.0 if event.key == 'up' else -5.0
+            self.tilt = min(60.0, max(-60.0, self.tilt + step))
+            self.scheduler.request()
+    
+    def show_regime_map(self):
+        """Mở bản đồ δ/chế độ tia trên θ₁ x A với n₁, n₂ hiện tại (đánh dấu điểm đang xem)
+
+        Nếu cửa sổ đang mở có cùng n₁, n₂ thì dùng lại; ngược lại đóng cửa sổ
+        cũ (dừng timer và thread pool của nó) trước khi mở cửa sổ mới.
+        """
+        from prism.regime_map import RegimeMap, show_map
+        
+        fixed = {'n1': self.slider_n1.val, 'n2': self.slider_n2.val}
+        if self.regime_window is not None:
+            fig, view, _ = self.regime_window
+            if all(view.map.fixed[name] == value for name, value in fixed.items()):
+                fig.show()
+                return
+            self.close_regime_map()
+        
+        regime_map = RegimeMap(fixed=fixed)
+        window = show_map(regime_map,
+                          marker=(self.slider_theta.val, self.slider_prism_angle.val))
+        self.regime_window = window
+        window[0].canvas.mpl_connect('close_event',
+                                     lambda event: self._forget_regime_map(window))
+    
+    def _forget_regime_map(self, window):
+        if self.regime_window is window:
+            self.regime_window = None
+    
+    def close_regime_map(self):
+        """Đóng cửa sổ bản đồ chế độ tia (nếu đang mở)"""
+        import matplotlib.pyplot as plt
+        
+        if self.regime_window is None:
+            return
+        fig, view, _ = self.regime_window
+        self.regime_window = None
+        # Không phải backend nào cũng phát close_event khi đóng bằng plt.close
+        view.close()
+        plt.close(fig)
     
     def take_screenshot(self, event):
-        """Chụp ảnh với dialog chọn vị trí lưu"""
+        """Chụp ảnh với dialog chọn vị trí lưu (render chạy nền, không chặn giao diện)"""
+        filename = None
         try:
             import tkinter as tk
             from tkinter import filedialog
-            import datetime
             
             # Tạo root window và đưa lên trên cùng
             root = tk.Tk()
@@ -525,27 +350,45 @@ sin(theta) > n2/n1
                 ],
                 title="Chon vi tri luu anh mo phong lang kinh"
             )
+            root.destroy()
             
-            if filename:  # Nếu người dùng chọn vị trí lưu
-                self.fig.savefig(filename, dpi=300, bbox_inches='tight', 
-                                facecolor=self.fig.get_facecolor(), edgecolor='none')
-                print(f"Da luu anh: {filename}")
-            else:
+            if not filename:  # Người dùng bấm hủy
                 print("Da huy luu anh")
-                
+                return
             
         except Exception as e:
-            print(f"Loi dialog: {e}")
-            # Fallback - lưu trực tiếp
-            import datetime
+            # Không mở được dialog (ví dụ thiếu Tk) - lưu vào thư mục hiện tại
             timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"prism_simulation_{timestamp}.png"
-            self.fig.savefig(filename, dpi=300, bbox_inches='tight', 
-                            facecolor=self.fig.get_facecolor(), edgecolor='none')
-            print(f"Da luu anh: {filename} (trong thu muc hien tai)")
+            filename = os.path.abspath(f"prism_simulation_{timestamp}.png")
+            print(f"Loi dialog: {e} - se luu vao thu muc hien tai: {filename}")
+        
+        self.export_image(filename)
+    
+    def export_image(self, filename, dpi=300):
+        """Đưa cảnh hiện tại (trạng thái + khung nhìn) vào hàng đợi xuất nền"""
+        from prism.export import ExportJob, ExportQueue
+        
+        if self.exports is None:
+            self.exports = ExportQueue(self.fig.canvas, on_progress=self.on_export_progress,
+                                       on_done=self.on_export_done)
+        job = ExportJob(filename, self.get_state(), dpi=dpi,
+                        xlim=tuple(self.ax_main.get_xlim()),
+                        ylim=tuple(self.ax_main.get_ylim()))
+        self.exports.submit(job)
+        print(f"Dang luu anh ({self.exports.pending()} anh trong hang doi): {filename}")
+    
+    def on_export_progress(self, completed, submitted):
+        print(f"Xuat anh: {completed}/{submitted}")
+    
+    def on_export_done(self, job, path, error):
+        if error is None:
+            print(f"Da luu anh: {path}")
+        else:
+            print(f"Loi luu anh {job.path}: {error}")
     
     def run(self):
         """Chạy ứng dụng"""
+        import matplotlib.pyplot as plt
         plt.show()
 
 def main():
@@ -0,0 +1 @@
+"""Các thành phần dùng chung của mô phỏng lăng kính"""
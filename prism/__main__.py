@@ -0,0 +1,51 @@
+"""Tính đường đi tia qua lăng kính từ dòng lệnh - không cần matplotlib hay màn hình
+
+Ví dụ::
+
+    python -m prism --n1 1.0 --n2 1.5 --theta1 45 --A 60
+    python -m prism --n2 1.62 --theta1 30 50 70 --json
+"""
+import argparse
+import json
+import sys
+
+from prism import physics
+from prism.deviation import cutoff_angles, minimum_deviation
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m prism', description="Tinh duong di tia qua lang kinh")
+    parser.add_argument('--n1', type=float, default=1.0, help="chiet suat moi truong")
+    parser.add_argument('--n2', type=float, default=1.5, help="chiet suat lang kinh")
+    parser.add_argument('--theta1', type=float, nargs='+', default=[45.0],
+                        help="goc toi (do), co the nhieu gia tri")
+    parser.add_argument('--A', type=float, default=60.0, help="goc lang kinh (do)")
+    parser.add_argument('--json', action='store_true', help="in ket qua dang JSON")
+    args = parser.parse_args(argv)
+
+    rays = [physics.prism_ray(args.n1, args.n2, theta1, args.A) for theta1 in args.theta1]
+    theta1_min, delta_min = minimum_deviation(args.n1, args.n2, args.A)
+
+    if args.json:
+        print(json.dumps({
+            "rays": rays,
+            "theta1_min": theta1_min,
+            "delta_min": delta_min,
+            "cutoffs": cutoff_angles(args.n1, args.n2, args.A),
+        }, ensure_ascii=False))
+        return 0
+
+    for theta1, ray in zip(args.theta1, rays):
+        if "error" in ray:
+            print(f"theta1 = {theta1:6.2f} do: {ray['error']}")
+        else:
+            print(f"theta1 = {theta1:6.2f} do: r1 = {ray['r1']:.3f}, r2 = {ray['r2']:.3f}, "
+                  f"theta2 = {ray['theta2']:.3f}, delta = {ray['delta']:.3f} do")
+    if delta_min is not None:
+        print(f"Goc lech cuc tieu: delta_min = {delta_min:.3f} do tai theta1 = {theta1_min:.3f} do")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,451 @@
+"""Xuất hoạt ảnh quét tham số (θ₁, A, n₁, n₂, hệ số mô hình tán sắc)
+
+Mỗi tham số được nội suy tuyến tính giữa các khung khóa. Scene neo mô hình tán
+sắc sao cho n(λ_d) = n₂, nên chỉ các hệ số quyết định hình dạng đường cong
+n(λ) tạo ra thay đổi: ``model.A`` của Cauchy và việc nhân đều mọi ``model.B*``
+của Sellmeier bị phép neo triệt tiêu nên bị từ chối (dùng ``n2`` để đổi mức
+chiết suất). Khung hình được render
+trên một figure off-screen duy nhất (dùng lại mọi artist của ``PrismScene``) và
+ghi ngay vào bộ mã hóa khi vừa vẽ xong, nên bộ nhớ không tăng theo số khung:
+
+- ``.mp4 .mkv .mov .webm``: pipe RGBA thô vào ``ffmpeg``;
+- ``.gif``: mỗi khung được lượng tử hóa (Pillow) và ghi nối tiếp vào file;
+- ``.png .apng``: APNG ghi trực tiếp bằng ``zlib``.
+
+Với ``--workers N``, dải khung được chia thành N đoạn liên tiếp, mỗi process
+render một đoạn ra file tạm rồi các đoạn được nối lại (GIF/APNG nối byte trực
+tiếp, video dùng concat của ffmpeg - không mã hóa lại).
+
+Ví dụ::
+
+    python -m prism.animate -o sweep.gif --frames 300 --key theta1=20,70
+    python -m prism.animate -o sweep.mp4 --frames 10000 --workers 4 \\
+        --key "A=0@40,0.5@70,1@40" --key model.B=0.004,0.03 --mode dispersion
+"""
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+
+import numpy as np
+
+from prism.dispersion import CauchyModel, SellmeierModel
+from prism.scene import SceneState
+
+# Các trường số của SceneState có thể quét, và tên viết tắt trên dòng lệnh
+PARAMS = ('theta1', 'prism_angle', 'n1', 'n2')
+ALIASES = {'A': 'prism_angle'}
+# Tiền tố cho hệ số của mô hình tán sắc (``model.B``)
+MODEL_PREFIX = 'model.'
+MODELS = {'cauchy': CauchyModel, 'sellmeier': SellmeierModel}
+
+VIDEO_FORMATS = ('.mp4', '.mkv', '.mov', '.webm')
+
+# Hệ số cộng thêm hằng số vào n(λ): bị triệt tiêu hoàn toàn khi neo n(λ_d) = n₂
+ANCHORED = {CauchyModel: ('A',)}
+# Hệ số chỉ có tỉ lệ giữa chúng ảnh hưởng tới đường cong đã neo (nhân đều bị triệt tiêu)
+SCALE_FREE = {SellmeierModel: ('B1', 'B2', 'B3')}
+
+
+@dataclass(frozen=True)
+class Track:
+    """Khung khóa của một tham số: ``positions`` (0..1, tăng dần) và ``values``"""
+    param: str
+    positions: tuple
+    values: tuple
+
+    def value(self, t):
+        return float(np.interp(t, self.positions, self.values))
+
+
+def parse_track(text):
+    """``param=v0,v1,...`` (chia đều) hoặc ``param=t0@v0,t1@v1,...`` -> ``Track``"""
+    param, sep, spec = text.partition('=')
+    param = param.strip()
+    if not sep or not spec.strip():
+        raise ValueError(f"khung khoa khong hop le: {text!r}")
+    param = ALIASES.get(param, param)
+
+    items = [item.strip() for item in spec.split(',') if item.strip()]
+    try:
+        if any('@' in item for item in items):
+            pairs = [tuple(float(x) for x in item.split('@')) for item in items]
+            positions, values = zip(*pairs)
+        else:
+            values = tuple(float(item) for item in items)
+            positions = tuple(np.linspace(0, 1, len(values)).tolist()) if len(values) > 1 else (0.0,)
+    except ValueError:
+        raise ValueError(f"khung khoa khong hop le: {text!r}") from None
+    if any(b <= a for a, b in zip(positions, positions[1:])):
+        raise ValueError(f"vi tri khung khoa phai tang dan: {text!r}")
+    return Track(param, tuple(positions), tuple(values))
+
+
+@dataclass(frozen=True)
+class Sweep:
+    """Dãy ``frames`` trạng thái nội suy từ ``base`` theo các ``tracks``"""
+    base: SceneState
+    tracks: tuple = ()
+    frames: int = 100
+
+    def __post_init__(self):
+        model = self.base.dispersion_model
+        model_fields = {f.name for f in fields(model)}
+        model_tracks = {}
+        for track in self.tracks:
+            name = track.param
+            if name.startswith(MODEL_PREFIX):
+                coef = name[len(MODEL_PREFIX):]
+                if coef not in model_fields:
+                    raise ValueError(f"mo hinh {type(model).__name__} khong co he so {coef!r}")
+                if coef in ANCHORED.get(type(model), ()):
+                    raise ValueError(f"he so {name} bi triet tieu khi neo n(587.6nm) = n2 "
+                                     f"(dung n2 de quet muc chiet suat)")
+                model_tracks[coef] = track
+            elif name not in PARAMS:
+                raise ValueError(f"tham so khong hop le: {name!r}")
+        self._check_scale_free(model, model_tracks)
+
+    def _check_scale_free(self, model, model_tracks):
+        """Từ chối khi các hệ số ``SCALE_FREE`` chỉ bị nhân đều (đường cong đã neo không đổi)"""
+        coefs = SCALE_FREE.get(type(model), ())
+        if not any(coef in model_tracks for coef in coefs):
+            return
+        # Nội suy tuyến tính: tỉ lệ không đổi tại mọi khung khóa thì không đổi ở mọi t
+        knots = sorted({p for coef in coefs if coef in model_tracks
+                        for p in model_tracks[coef].positions})
+        vectors = np.array([[model_tracks[coef].value(t) if coef in model_tracks
+                             else getattr(model, coef) for coef in coefs] for t in knots])
+        totals = vectors.sum(axis=1, keepdims=True)
+        if np.all(totals != 0) and np.allclose(vectors / totals, vectors[0] / totals[0],
+                                               rtol=1e-12, atol=0.0):
+            names = ', '.join(MODEL_PREFIX + coef for coef in coefs)
+            raise ValueError(f"{names} chi bi nhan deu nen bi triet tieu khi neo "
+                             f"n(587.6nm) = n2; chi ti le giua chung lam doi hinh dang n(lambda)")
+
+    def state(self, index):
+        """``SceneState`` của khung ``index``"""
+        t = index / (self.frames - 1) if self.frames > 1 else 0.0
+        scene_values, model_values = {}, {}
+        for track in self.tracks:
+            if track.param.startswith(MODEL_PREFIX):
+                model_values[track.param[len(MODEL_PREFIX):]] = track.value(t)
+            else:
+                scene_values[track.param] = track.value(t)
+        if model_values:
+            scene_values['dispersion_model'] = replace(self.base.dispersion_model, **model_values)
+        return replace(self.base, **scene_values)
+
+
+# ----------------------------------------------------------------------
+# Bộ ghi luồng: mỗi bộ ghi nhận khung RGBA (H x W x 4, uint8) lần lượt.
+# ``start``/``standalone=False`` dùng khi ghi một đoạn để nối bằng ``join``.
+# ----------------------------------------------------------------------
+class FFmpegWriter:
+    """Pipe khung RGBA thô vào ``ffmpeg`` (H.264/VP9 tùy phần mở rộng)"""
+
+    def __init__(self, path, size, fps, total, start=0, standalone=True):
+        executable = shutil.which('ffmpeg')
+        if executable is None:
+            raise RuntimeError("khong tim thay ffmpeg (dung .gif hoac .png de xuat khong can ffmpeg)")
+        width, height = size
+        if path.lower().endswith('.webm'):
+            codec = ['-c:v', 'libvpx-vp9', '-b:v', '0', '-crf', '32']
+        else:
+            codec = ['-c:v', 'libx264', '-preset', 'medium', '-crf', '20']
+        self.path = path
+        self._log = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [executable, '-y', '-loglevel', 'error',
+             '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}',
+             '-r', str(fps), '-i', '-',
+             # yuv420p cần kích thước chẵn
+             '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', *codec, path],
+            stdin=subprocess.PIPE, stderr=self._log)
+
+    def write(self, rgba):
+        self._process.stdin.write(memoryview(rgba).cast('B'))
+
+    def close(self):
+        self._process.stdin.close()
+        code = self._process.wait()
+        self._log.seek(0)
+        message = self._log.read().decode(errors='replace').strip()
+        self._log.close()
+        if code != 0:
+            raise RuntimeError(f"ffmpeg loi ({code}): {message}")
+
+    @staticmethod
+    def join(path, parts, size, fps, total):
+        """Nối các đoạn video bằng concat demuxer (sao chép luồng, không mã hóa lại)"""
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            for part in parts:
+                escaped = os.path.abspath(part).replace("'", r"'\''")
+                f.write(f"file '{escaped}'\n")
+            listing = f.name
+        try:
+            result = subprocess.run(
+                [shutil.which('ffmpeg'), '-y', '-loglevel', 'error', '-f', 'concat',
+                 '-safe', '0', '-i', listing, '-c', 'copy', path],
+                capture_output=True, text=True)
+        finally:
+            os.remove(listing)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg loi ({result.returncode}): {result.stderr.strip()}")
+
+
+class GifWriter:
+    """GIF động ghi từng khung (bảng màu cục bộ 256 màu cho mỗi khung)"""
+
+    def __init__(self, path, size, fps, total, start=0, standalone=True):
+        try:
+            from PIL import GifImagePlugin
+        except ImportError:
+            raise RuntimeError("xuat .gif can Pillow >= 9.1 (pip install Pillow), "
+                               "hoac dung .png de xuat APNG") from None
+        if not hasattr(GifImagePlugin, 'getdata'):
+            raise RuntimeError("phien ban Pillow nay khong co GifImagePlugin.getdata")
+        self.size = size
+        self.duration = 1000.0 / fps
+        self.index = start
+        self.standalone = standalone
+        self._file = open(path, 'wb')
+        if standalone:
+            self._file.write(self.header(size))
+
+    @staticmethod
+    def header(size):
+        width, height = size
+        return (b'GIF89a' + struct.pack('<HHBBB', width, height, 0, 0, 0)
+                # NETSCAPE2.0: lặp vô hạn
+                + b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+
+    def write(self, rgba):
+        from PIL import GifImagePlugin, Image
+
+        image = Image.frombuffer('RGBA', self.size, rgba, 'raw', 'RGBA', 0, 1).convert('RGB')
+        image = image.quantize(256, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        # GIF tính thời gian theo 1/100 s: làm tròn theo thời điểm tích lũy để
+        # tổng thời lượng không bị trôi
+        duration = 10 * (round((self.index + 1) * self.duration / 10)
+                         - round(self.index * self.duration / 10))
+        for chunk in GifImagePlugin.getdata(image, duration=max(duration, 10),
+                                            include_color_table=True):
+            self._file.write(chunk)
+        self.index += 1
+
+    def close(self):
+        if self.standalone:
+            self._file.write(b';')
+        self._file.close()
+
+    @classmethod
+    def join(cls, path, parts, size, fps, total):
+        with open(path, 'wb') as out:
+            out.write(cls.header(size))
+            for part in parts:
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+            out.write(b';')
+
+
+def _png_chunk(kind, data):
+    return (struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+
+class ApngWriter:
+    """PNG động (APNG, RGBA 8 bit) nén từng khung bằng ``zlib``"""
+
+    compression = 6
+
+    def __init__(self, path, size, fps, total, start=0, standalone=True):
+        self.size = size
+        # Thời gian mỗi khung = 1/fps giây (phân số delay_num/delay_den)
+        self.delay = (1, int(fps)) if float(fps).is_integer() else (int(round(1000 / fps)), 1000)
+        self.index = start
+        self.standalone = standalone
+        self._file = open(path, 'wb')
+        if standalone:
+            self._file.write(self.header(size, total))
+
+    @staticmethod
+    def header(size, total):
+        width, height = size
+        return (b'\x89PNG\r\n\x1a\n'
+                + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0))
+                + _png_chunk(b'acTL', struct.pack('>II', total, 0)))
+
+    def write(self, rgba):
+        width, height = self.size
+        rows = np.empty((height, width * 4 + 1), dtype=np.uint8)
+        rows[:, 0] = 0      # Bộ lọc "None" cho mọi dòng
+        rows[:, 1:] = np.frombuffer(rgba, dtype=np.uint8).reshape(height, width * 4)
+        data = zlib.compress(rows, self.compression)
+
+        # Số thứ tự chunk toàn cục: khung 0 = fcTL(0) + IDAT; khung i = fcTL(2i-1) + fdAT(2i)
+        i = self.index
+        sequence = 2 * i - 1 if i else 0
+        self._file.write(_png_chunk(b'fcTL', struct.pack(
+            '>IIIIIHHBB', sequence, width, height, 0, 0, *self.delay, 0, 0)))
+        if i == 0:
+            self._file.write(_png_chunk(b'IDAT', data))
+        else:
+            self._file.write(_png_chunk(b'fdAT', struct.pack('>I', sequence + 1) + data))
+        self.index += 1
+
+    def close(self):
+        if self.standalone:
+            self._file.write(_png_chunk(b'IEND', b''))
+        self._file.close()
+
+    @classmethod
+    def join(cls, path, parts, size, fps, total):
+        with open(path, 'wb') as out:
+            out.write(cls.header(size, total))
+            for part in parts:
+                with open(part, 'rb') as f:
+                    shutil.copyfileobj(f, out)
+            out.write(_png_chunk(b'IEND', b''))
+
+
+def writer_for(path):
+    """Lớp bộ ghi theo phần mở rộng của ``path``"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in VIDEO_FORMATS:
+        return FFmpegWriter
+    if ext == '.gif':
+        return GifWriter
+    if ext in ('.png', '.apng'):
+        return ApngWriter
+    raise ValueError(f"dinh dang khong ho tro: {ext or path!r}")
+
+
+# ----------------------------------------------------------------------
+# Render
+# ----------------------------------------------------------------------
+def _scene_figure(dpi):
+    from prism.scene import apply_style, create_scene_figure
+
+    apply_style()
+    fig, scene = create_scene_figure()
+    fig.set_dpi(dpi)
+    return fig, scene
+
+
+def render_range(sweep, path, start, stop, fps=30, dpi=100, standalone=True, progress=None):
+    """Render các khung ``[start, stop)`` của ``sweep`` vào ``path``, trả về số khung
+
+    Figure và các artist được tạo một lần; mỗi khung chỉ cập nhật scene, vẽ lại
+    canvas và đưa bộ đệm RGBA của canvas thẳng cho bộ ghi (không sao chép).
+    """
+    fig, scene = _scene_figure(dpi)
+    canvas = fig.canvas
+    canvas.draw()
+    size = canvas.get_width_height(physical=True)
+    writer = writer_for(path)(path, size, fps, sweep.frames, start=start, standalone=standalone)
+    try:
+        for index in range(start, stop):
+            scene.update(sweep.state(index))
+            canvas.draw()
+            writer.write(canvas.buffer_rgba())
+            if progress:
+                progress(index - start + 1, stop - start)
+    finally:
+        writer.close()
+    return stop - start
+
+
+def _render_segment(args):
+    return render_range(*args, standalone=False)
+
+
+def render_sweep(sweep, path, fps=30, dpi=100, workers=1, progress=None):
+    """Render toàn bộ ``sweep`` ra ``path``; ``workers > 1`` chia dải khung cho nhiều process
+
+    ``progress(done, total)`` được gọi sau mỗi khung (một process) hoặc mỗi đoạn.
+    """
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    writer_cls = writer_for(path)
+    workers = max(1, min(workers, sweep.frames))
+    if workers == 1:
+        return render_range(sweep, path, 0, sweep.frames, fps, dpi, progress=progress)
+
+    bounds = np.linspace(0, sweep.frames, workers + 1).astype(int)
+    ext = os.path.splitext(path)[1]
+    with tempfile.TemporaryDirectory(prefix='prism_anim_', dir=os.path.dirname(path)) as tmp:
+        parts = [os.path.join(tmp, f"part{i:03d}{ext}") for i in range(workers)]
+        tasks = [(sweep, part, int(a), int(b), fps, dpi)
+                 for part, a, b in zip(parts, bounds[:-1], bounds[1:])]
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for count in pool.map(_render_segment, tasks):
+                done += count
+                if progress:
+                    progress(done, sweep.frames)
+        # Kích thước khung giống nhau ở mọi process (cùng figure, cùng dpi)
+        fig, _ = _scene_figure(dpi)
+        fig.canvas.draw()
+        size = fig.canvas.get_width_height(physical=True)
+        writer_cls.join(path, parts, size, fps, sweep.frames)
+    return sweep.frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Xuat hoat anh quet tham so lang kinh (mp4/webm qua ffmpeg, gif, apng)")
+    parser.add_argument('-o', '--output', default='sweep.gif',
+                        help="file dau ra: .mp4 .mkv .mov .webm .gif .png/.apng")
+    parser.add_argument('--key', action='append', default=[], metavar='PARAM=GIA_TRI',
+                        help="khung khoa, vi du theta1=20,70 hoac 'A=0@40,0.5@70,1@40'; "
+                             "tham so: theta1, A, n1, n2, model.<he so>")
+    parser.add_argument('--frames', type=int, default=120)
+    parser.add_argument('--fps', type=float, default=30.0)
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1,
+                        help="so process (chia dai khung roi noi ket qua)")
+    parser.add_argument('--mode', choices=('single', 'dispersion'), default='single')
+    parser.add_argument('--model', choices=tuple(MODELS), default='cauchy',
+                        help="mo hinh chiet suat n(lambda) o che do tan sac")
+    parser.add_argument('--n1', type=float, default=SceneState.n1)
+    parser.add_argument('--n2', type=float, default=SceneState.n2)
+    parser.add_argument('--theta1', type=float, default=SceneState.theta1)
+    parser.add_argument('--A', type=float, default=SceneState.prism_angle)
+    args = parser.parse_args(argv)
+
+    if args.frames < 1:
+        parser.error("--frames phai >= 1")
+    base = SceneState(n1=args.n1, n2=args.n2, theta1=args.theta1, prism_angle=args.A,
+                      show_dispersion=args.mode == 'dispersion',
+                      dispersion_model=MODELS[args.model]())
+    try:
+        sweep = Sweep(base, tuple(parse_track(text) for text in args.key), args.frames)
+        writer_for(args.output)
+    except ValueError as e:
+        parser.error(str(e))
+
+    def progress(done, total):
+        print(f"\r{done}/{total} khung hinh", end='', flush=True)
+
+    start = time.perf_counter()
+    try:
+        render_sweep(sweep, args.output, args.fps, args.dpi, args.workers, progress)
+    except (OSError, RuntimeError) as e:
+        print(f"\nLoi xuat hoat anh: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+    print(f"\nDa luu {args.output}: {sweep.frames} khung trong {elapsed:.2f}s "
+          f"({sweep.frames / elapsed:.1f} khung/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
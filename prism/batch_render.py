@@ -0,0 +1,169 @@
+"""Render hàng loạt cấu hình lăng kính ra file ảnh, không cần màn hình
+
+Đọc bảng tham số (CSV có dòng tiêu đề, hoặc JSON lines) với các cột
+``n1, n2, theta1, A, mode`` (và tùy chọn ``name``, ``tilt``), rồi render mỗi dòng ra
+PNG/SVG/PDF bằng Agg - không import pyplot hay Tk. Công việc được chia cho một
+process pool; mỗi worker chỉ tạo một figure và dùng lại nó cho mọi ảnh.
+
+Ví dụ::
+
+    python -m prism.batch_render params.csv -o out --format png,svg --workers 4
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from prism.scene import SceneState, apply_style, create_scene_figure
+
+FORMATS = ('png', 'svg', 'pdf')
+
+# Giá trị cột ``mode`` được chấp nhận
+MODES = {
+    'single': False, 'normal': False, 'binh_thuong': False,
+    'dispersion': True, 'tan_sac': True,
+}
+
+# Figure và scene dùng lại trong một process (tạo bởi _init_worker)
+_worker = None
+
+
+def read_table(path):
+    """Đọc bảng tham số, trả về danh sách ``(name, SceneState)``"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith('.csv'):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    jobs = []
+    for index, row in enumerate(rows):
+        row = {key.strip(): value for key, value in row.items()
+               if key and value not in (None, '')}
+        try:
+            mode = str(row.get('mode', 'single')).strip().lower()
+            if mode not in MODES:
+                raise ValueError(f"mode khong hop le: {mode!r}")
+            state = SceneState(
+                n1=float(row.get('n1', SceneState.n1)),
+                n2=float(row.get('n2', SceneState.n2)),
+                theta1=float(row.get('theta1', SceneState.theta1)),
+                prism_angle=float(row.get('A', SceneState.prism_angle)),
+                show_dispersion=MODES[mode],
+                tilt=float(row.get('tilt', SceneState.tilt)))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"{path}: dong {index + 1}: {e}") from None
+        name = str(row.get('name') or f"prism_{index:05d}")
+        jobs.append((name, state))
+    return jobs
+
+
+def _init_worker(out_dir, formats, dpi):
+    """Tạo figure một lần cho mỗi process"""
+    global _worker
+    apply_style()
+    fig, scene = create_scene_figure()
+    _worker = {
+        "fig": fig,
+        "scene": scene,
+        "out_dir": out_dir,
+        "formats": formats,
+        "dpi": dpi,
+    }
+
+
+def _render_jobs(jobs):
+    """Render một nhóm cấu hình bằng figure của process hiện tại"""
+    fig = _worker["fig"]
+    scene = _worker["scene"]
+    count = 0
+    for name, state in jobs:
+        scene.update(state)
+        for fmt in _worker["formats"]:
+            path = os.path.join(_worker["out_dir"], f"{name}.{fmt}")
+            fig.savefig(path, dpi=_worker["dpi"], format=fmt,
+                        facecolor=fig.get_facecolor(), edgecolor='none')
+            count += 1
+    return count
+
+
+def render_table(jobs, out_dir, formats=('png',), dpi=150, workers=None, chunk_size=8,
+                 progress=None):
+    """Render danh sách ``(name, SceneState)``, trả về số file đã ghi
+
+    ``progress(done, total)`` (nếu có) được gọi sau mỗi nhóm ``chunk_size`` cấu hình.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    formats = tuple(formats)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+    done = 0
+    written = 0
+
+    if workers <= 1:
+        _init_worker(out_dir, formats, dpi)
+        results = map(_render_jobs, chunks)
+        for chunk, count in zip(chunks, results):
+            done += len(chunk)
+            written += count
+            if progress:
+                progress(done, len(jobs))
+        return written
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(out_dir, formats, dpi)) as pool:
+        for chunk, count in zip(chunks, pool.map(_render_jobs, chunks)):
+            done += len(chunk)
+            written += count
+            if progress:
+                progress(done, len(jobs))
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render hang loat cau hinh lang kinh (headless, Agg)")
+    parser.add_argument('table', help="bang tham so .csv hoac .jsonl")
+    parser.add_argument('-o', '--out-dir', default='renders', help="thu muc dau ra")
+    parser.add_argument('--format', default='png',
+                        help="dinh dang, phan cach bang dau phay (png,svg,pdf)")
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="so process (mac dinh: so nhan CPU)")
+    parser.add_argument('--chunk-size', type=int, default=8,
+                        help="so cau hinh moi lan giao cho worker")
+    args = parser.parse_args(argv)
+
+    formats = [fmt.strip().lower() for fmt in args.format.split(',') if fmt.strip()]
+    unknown = [fmt for fmt in formats if fmt not in FORMATS]
+    if unknown or not formats:
+        parser.error(f"dinh dang khong ho tro: {', '.join(unknown) or args.format}")
+
+    try:
+        jobs = read_table(args.table)
+    except (OSError, ValueError) as e:
+        print(f"Loi doc bang tham so: {e}", file=sys.stderr)
+        return 1
+
+    def progress(done, total):
+        print(f"\r{done}/{total} cau hinh", end='', flush=True)
+
+    start = time.perf_counter()
+    written = render_table(jobs, args.out_dir, formats, dpi=args.dpi,
+                           workers=args.workers, chunk_size=args.chunk_size,
+                           progress=progress)
+    elapsed = time.perf_counter() - start
+
+    rate = written / elapsed if elapsed > 0 else float('inf')
+    print(f"\nDa render {written} anh vao {args.out_dir} trong {elapsed:.2f}s "
+          f"({rate:.1f} anh/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
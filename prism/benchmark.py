@@ -0,0 +1,303 @@
+"""Bộ benchmark tái lập được, chạy headless trên Agg
+
+Đo:
+
+- thông lượng giải tia: ``prism_ray`` (vô hướng) và ``solve_prism_batch`` (mảng),
+  bộ dò tia hình học ``trace_rays``, dò tia xiên 3D ``trace_skew`` và bài toán
+  ngược ``index_from_min_deviation``;
+- thời gian một khung hình ``update_plot`` (trung vị, p99) ở chế độ đơn sắc và
+  tán sắc - đo trên chính ``SimplePrismSimulator``;
+- chi phí một bước zoom/pan (blitting qua ``AxesNavigator``);
+- độ trễ ``savefig`` ở dpi 100/300 cho PNG/SVG/PDF.
+
+Kết quả được ghi ra JSON; lệnh ``compare`` so với một file baseline và báo
+các chỉ số bị chậm đi quá ngưỡng (mã thoát 1 nếu có)::
+
+    python -m prism.benchmark run -o bench.json
+    python -m prism.benchmark compare baseline.json bench.json --tolerance 0.1
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+# Các nhóm benchmark theo thứ tự chạy
+GROUPS = ('physics', 'frame', 'navigation', 'export')
+
+
+def _metric(value, unit, better):
+    """Một chỉ số: ``better`` là 'lower' hoặc 'higher'"""
+    return {"value": float(value), "unit": unit, "better": better}
+
+
+def _timings(func, repeat):
+    """Thời gian (ms) của ``repeat`` lần gọi ``func()``"""
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples[i] = (time.perf_counter() - start) * 1000
+    return samples
+
+
+def _latency(results, name, samples):
+    results[f"{name}.median_ms"] = _metric(np.median(samples), 'ms', 'lower')
+    results[f"{name}.p99_ms"] = _metric(np.percentile(samples, 99), 'ms', 'lower')
+
+
+def bench_physics(results, quick=False):
+    """Thông lượng giải tia vô hướng, theo mảng, dò tia hình học và giải ngược"""
+    from prism import physics, raytrace
+
+    rng = np.random.default_rng(0)
+    count = 2_000 if quick else 20_000
+    theta1 = rng.uniform(0, 85, count).tolist()
+    start = time.perf_counter()
+    for t in theta1:
+        physics.prism_ray(1.0, 1.5, t, 60.0)
+    elapsed = time.perf_counter() - start
+    results["physics.prism_ray.calls_per_s"] = _metric(count / elapsed, 'calls/s', 'higher')
+
+    count = 100_000 if quick else 1_000_000
+    theta1 = rng.uniform(0, 85, count)
+    n2 = rng.uniform(1.0, 2.5, count)
+    samples = _timings(lambda: physics.solve_prism_batch(1.0, n2, theta1, 60.0),
+                       3 if quick else 5)
+    results["physics.solve_prism_batch.rays_per_s"] = _metric(
+        count / (np.median(samples) / 1000), 'rays/s', 'higher')
+
+    count = 10_000 if quick else 100_000
+    vertices = raytrace.prism_vertices(60.0)
+    origins, directions = raytrace.parallel_beam((-2.0, 0.6), 10.0, 1.0, count)
+    samples = _timings(lambda: raytrace.trace_rays(vertices, origins, directions, 1.0, 2.4,
+                                                   max_bounces=10, record_paths=False),
+                       3 if quick else 5)
+    results["physics.trace_rays.rays_per_s"] = _metric(
+        count / (np.median(samples) / 1000), 'rays/s', 'higher')
+
+    from prism import skew
+
+    count = 100_000 if quick else 1_000_000
+    planes = skew.prism_planes(60.0)
+    origins, directions = skew.skew_beam(60.0, 45.0, 15.0, count, spread=2.0, width=0.2, rng=rng)
+    samples = _timings(lambda: skew.trace_chunks(planes, origins, directions, 1.0, 1.5),
+                       3 if quick else 5)
+    results["physics.trace_skew.rays_per_s"] = _metric(
+        count / (np.median(samples) / 1000), 'rays/s', 'higher')
+
+    from prism import inverse
+
+    count = 100_000
+    A = rng.uniform(30, 60, count)
+    theta1 = np.degrees(np.arcsin(rng.uniform(1.3, 1.9, count) * np.sin(np.radians(A / 2))))
+    delta_min = 2 * theta1 - A
+    samples = _timings(lambda: inverse.index_from_min_deviation(delta_min, A, sigma_delta=0.01),
+                       3 if quick else 5)
+    results["physics.inverse.solves_per_s"] = _metric(
+        count / (np.median(samples) / 1000), 'solves/s', 'higher')
+
+
+def _create_app():
+    """``SimplePrismSimulator`` trên backend Agg (không mở cửa sổ)"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import main
+    return main.SimplePrismSimulator()
+
+
+def _set_quietly(slider, value):
+    """Đổi giá trị slider mà không kích hoạt callback (không qua bộ lập lịch)"""
+    slider.eventson = False
+    try:
+        slider.set_val(value)
+    finally:
+        slider.eventson = True
+
+
+def bench_frame(results, app, quick=False):
+    """Thời gian ``update_plot`` (gồm cả vẽ canvas) khi kéo slider góc tới"""
+    frames = 20 if quick else 100
+    values = np.linspace(20, 70, frames)
+
+    for mode, dispersion in (('single', False), ('dispersion', True)):
+        app.show_dispersion = dispersion
+        app.update_plot()   # Khởi động: legend, cache font...
+        samples = np.empty(frames)
+        for i, value in enumerate(values):
+            _set_quietly(app.slider_theta, value)
+            start = time.perf_counter()
+            app.update_plot()
+            samples[i] = (time.perf_counter() - start) * 1000
+        _latency(results, f"frame.{mode}", samples)
+
+    app.show_dispersion = False
+    _set_quietly(app.slider_theta, app.slider_theta.valinit)
+    app.update_plot()
+
+
+def bench_navigation(results, app, quick=False):
+    """Chi phí một bước zoom (cuộn) và một bước pan (kéo chuột) với blitting"""
+    from matplotlib.backend_bases import MouseEvent
+
+    navigator = app.navigator
+    canvas = app.fig.canvas
+    steps = 20 if quick else 100
+    cx, cy = app.ax_main.transAxes.transform((0.5, 0.5))
+
+    def zoom_step(i):
+        button = 'up' if i % 2 == 0 else 'down'
+        navigator.on_scroll(MouseEvent('scroll_event', canvas, cx, cy, button=button))
+        navigator.flush()
+
+    zoom_step(0)    # Lưu nền tĩnh trước khi đo
+    samples = np.empty(steps)
+    for i in range(steps):
+        start = time.perf_counter()
+        zoom_step(i + 1)
+        samples[i] = (time.perf_counter() - start) * 1000
+    navigator.settle()
+    _latency(results, "navigation.zoom_step", samples)
+
+    navigator.on_press(MouseEvent('button_press_event', canvas, cx, cy, button=1))
+    for i in range(steps):
+        dx = 40 * np.sin(i / 5)
+        event = MouseEvent('motion_notify_event', canvas, cx + dx, cy + dx / 2, button=1)
+        start = time.perf_counter()
+        navigator.on_motion(event)
+        navigator.flush()
+        samples[i] = (time.perf_counter() - start) * 1000
+    navigator.on_release(MouseEvent('button_release_event', canvas, cx, cy, button=1))
+    _latency(results, "navigation.pan_step", samples)
+
+    app.scene.reset_view()
+    app.update_plot()
+
+
+def bench_export(results, app, quick=False):
+    """Độ trễ ``savefig`` (như nút Chụp ảnh: bbox_inches='tight') vào bộ nhớ"""
+    repeat = 1 if quick else 3
+    for fmt in ('png', 'svg', 'pdf'):
+        for dpi in (100, 300):
+            def save():
+                app.fig.savefig(io.BytesIO(), format=fmt, dpi=dpi, bbox_inches='tight',
+                                facecolor=app.fig.get_facecolor(), edgecolor='none')
+            save()  # Khởi động (font, cache)
+            samples = _timings(save, repeat)
+            results[f"export.{fmt}.dpi{dpi}.median_ms"] = _metric(
+                np.median(samples), 'ms', 'lower')
+
+
+def environment():
+    """Thông tin môi trường đi kèm kết quả"""
+    import matplotlib
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "time": time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def run(groups=GROUPS, quick=False, progress=None):
+    """Chạy các nhóm benchmark, trả về dict ``{"meta": ..., "results": ...}``"""
+    results = {}
+    app = None
+    for group in groups:
+        if progress:
+            progress(group)
+        if group == 'physics':
+            bench_physics(results, quick)
+            continue
+        if app is None:
+            app = _create_app()
+        {'frame': bench_frame, 'navigation': bench_navigation,
+         'export': bench_export}[group](results, app, quick)
+    meta = environment()
+    meta["quick"] = quick
+    meta["groups"] = list(groups)
+    return {"meta": meta, "results": results}
+
+
+def compare(baseline, current, tolerance=0.10):
+    """So sánh hai kết quả, trả về danh sách ``(name, base, new, change, regressed)``
+
+    ``change`` là tỉ lệ thay đổi theo hướng "tốt hơn" (dương = nhanh hơn); một
+    chỉ số bị coi là chậm đi khi tệ hơn baseline quá ``tolerance``.
+    """
+    rows = []
+    for name, base in baseline["results"].items():
+        new = current["results"].get(name)
+        if new is None:
+            continue
+        if base["better"] == 'higher':
+            change = new["value"] / base["value"] - 1
+        else:
+            change = base["value"] / new["value"] - 1
+        rows.append((name, base, new, change, change < -tolerance))
+    return rows
+
+
+def _cmd_run(args):
+    groups = [g.strip() for g in args.only.split(',')] if args.only else list(GROUPS)
+    unknown = [g for g in groups if g not in GROUPS]
+    if unknown:
+        print(f"Nhom benchmark khong hop le: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    report = run(groups, args.quick, progress=lambda g: print(f"[{g}]", flush=True))
+    for name, metric in report["results"].items():
+        print(f"  {name:42s} {metric['value']:14.2f} {metric['unit']}")
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Da luu ket qua: {args.output}")
+    return 0
+
+
+def _cmd_compare(args):
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.tolerance)
+    regressions = 0
+    for name, base, new, change, regressed in rows:
+        flag = 'CHAM HON' if regressed else ''
+        regressions += regressed
+        print(f"{name:42s} {base['value']:12.2f} -> {new['value']:12.2f} {base['unit']:8s} "
+              f"{change:+7.1%} {flag}")
+    print(f"{len(rows)} chi so, {regressions} chi so cham hon nguong {args.tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark mo phong lang kinh (headless)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_run = sub.add_parser('run', help="chay benchmark")
+    p_run.add_argument('-o', '--output', default='bench.json')
+    p_run.add_argument('--quick', action='store_true', help="it lan lap hon (kiem tra nhanh)")
+    p_run.add_argument('--only', help=f"chi chay cac nhom: {','.join(GROUPS)}")
+    p_run.set_defaults(func=_cmd_run)
+
+    p_cmp = sub.add_parser('compare', help="so sanh voi baseline")
+    p_cmp.add_argument('baseline')
+    p_cmp.add_argument('current')
+    p_cmp.add_argument('--tolerance', type=float, default=0.10,
+                       help="ti le cham di toi da cho phep (mac dinh 0.10)")
+    p_cmp.set_defaults(func=_cmd_compare)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+"""Danh mục thủy tinh: bảng n(λ) tính sẵn, lưu dạng file ánh xạ bộ nhớ
+
+Danh mục là file văn bản, mỗi dòng một loại thủy tinh (``ten mo_hinh he_so...``,
+xem ``prism/data/glasses.txt``), hoặc file ``.agf`` của Zemax do nhà sản xuất
+phát hành (hàng trăm loại thủy tinh). Lần nạp đầu tiên tính n(λ) của mọi loại
+trên lưới bước sóng mịn và ghi ra một file ``.npy`` (kèm file ``.json`` chứa
+tên và hệ số) trong thư mục cache; các lần chạy sau và các process worker chỉ
+mở file đó bằng ``mmap`` - không tính lại, không sao chép, mọi process dùng
+chung các trang bộ nhớ của hệ điều hành. Tên file cache chứa mã băm của nội
+dung danh mục và lưới nên sửa danh mục sẽ tự sinh bảng mới.
+
+Tra theo tên là một lần tra dict, theo bước sóng là phép tính chỉ số trên lưới
+đều rồi nội suy tuyến tính giữa hai mẫu kề nhau - cả hai đều O(1).
+
+Ví dụ::
+
+    python -m prism.catalog                    # liệt kê thủy tinh và n_d
+    python -m prism.catalog N-SF11 --wavelength 486.1 587.6 656.3
+    python -m prism.catalog --catalog schott.agf --rebuild
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+from prism.dispersion import (
+    REFERENCE_WAVELENGTH, VISIBLE_RANGE, CauchyModel, SellmeierModel)
+
+# Danh mục đi kèm
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'data', 'glasses.txt')
+
+# Lưới bước sóng của bảng (nm)
+TABLE_RANGE = VISIBLE_RANGE
+TABLE_STEP = 0.1
+
+# Tăng khi đổi định dạng file cache
+_FORMAT_VERSION = 1
+
+MODELS = {'sellmeier': SellmeierModel, 'cauchy': CauchyModel}
+
+# Công thức trong file .agf -> hàm tạo mô hình từ dòng CD
+_AGF_FORMULAS = {
+    # Sellmeier 1: CD K1 L1 K2 L2 K3 L3
+    2: lambda cd: SellmeierModel(B1=cd[0], B2=cd[2], B3=cd[4],
+                                 C1=cd[1], C2=cd[3], C3=cd[5]),
+}
+
+
+def cache_dir():
+    """Thư mục cache bảng chiết suất (đổi bằng biến môi trường ``PRISM_CACHE_DIR``)"""
+    path = os.environ.get('PRISM_CACHE_DIR')
+    if not path:
+        path = os.path.join(os.path.expanduser('~'), '.cache', 'prism')
+    return path
+
+
+def _decode(data):
+    # File .agf thường là UTF-16 có BOM
+    if data.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return data.decode('utf-16')
+    return data.decode('utf-8', errors='replace')
+
+
+def parse_catalog(text):
+    """Đọc danh mục, trả về list ``(tên, mô hình)``
+
+    Thủy tinh dùng công thức chưa hỗ trợ trong file ``.agf`` bị bỏ qua.
+    """
+    lines = text.splitlines()
+    if any(line.startswith('NM ') for line in lines):
+        return _parse_agf(lines)
+
+    glasses = []
+    for number, line in enumerate(lines, 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        name, kind, *coefficients = line.split()
+        model = MODELS.get(kind.lower())
+        if model is None:
+            raise ValueError(f"dong {number}: mo hinh khong hop le '{kind}'")
+        try:
+            glasses.append((name, model(*map(float, coefficients))))
+        except (TypeError, ValueError):
+            raise ValueError(f"dong {number}: he so khong hop le cho {name}") from None
+    return glasses
+
+
+def _parse_agf(lines):
+    glasses = []
+    name = formula = None
+    for line in lines:
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0] == 'NM' and len(parts) >= 3:
+            name, formula = parts[1], int(float(parts[2]))
+        elif parts[0] == 'CD' and name is not None:
+            make = _AGF_FORMULAS.get(formula)
+            if make is not None:
+                glasses.append((name, make([float(value) for value in parts[1:]])))
+            name = None
+    return glasses
+
+
+def _describe(model):
+    kind = next(key for key, cls in MODELS.items() if isinstance(model, cls))
+    return [kind, [float(getattr(model, field)) for field in model.__dataclass_fields__]]
+
+
+def _write_atomic(path, write):
+    # Ghi ra file tạm rồi đổi tên - process khác không bao giờ thấy file dở dang
+    temporary = f'{path}.{os.getpid()}.tmp'
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+class GlassCatalog:
+    """Bảng n(λ) của mọi thủy tinh trong danh mục, đọc qua ``mmap``
+
+    ``table[i, j]`` là chiết suất của thủy tinh ``names[i]`` tại bước sóng
+    ``wavelengths[j]``. Đối tượng pickle chỉ mang đường dẫn nên có thể gửi
+    sang process khác; bên nhận mở lại cùng file cache.
+    """
+
+    def __init__(self, path=None, cache=None, step=TABLE_STEP, rebuild=False):
+        self.path = os.path.abspath(path or CATALOG_PATH)
+        self.cache = cache
+        self.step = float(step)
+        self.start, self.stop = TABLE_RANGE
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        key = hashlib.sha256(data)
+        key.update(f'{self.start}:{self.stop}:{self.step}:{_FORMAT_VERSION}'.encode())
+        stem = os.path.splitext(os.path.basename(self.path))[0]
+        base = os.path.join(cache or cache_dir(), f'{stem}-{key.hexdigest()[:16]}')
+        self.table_path = base + '.npy'
+        self.meta_path = base + '.json'
+
+        self.built = False
+        if rebuild or not self._load():
+            self._build(_decode(data))
+            self._load()
+            self.built = True
+
+    def _load(self):
+        try:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            table = np.load(self.table_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+        if table.shape != (len(meta['names']), meta['count']):
+            return False
+
+        self.names = meta['names']
+        self._definitions = meta['models']
+        self._rows = {name.upper(): row for row, name in enumerate(self.names)}
+        self.table = table
+        return True
+
+    def _build(self, text):
+        glasses = parse_catalog(text)
+        if not glasses:
+            raise ValueError(f"danh muc khong co thuy tinh nao: {self.path}")
+
+        count = int(round((self.stop - self.start) / self.step)) + 1
+        wavelengths = self.start + self.step * np.arange(count)
+        table = np.empty((len(glasses), count))
+        for row, (_, model) in enumerate(glasses):
+            table[row] = model.index(wavelengths)
+
+        meta = {
+            'source': self.path,
+            'names': [name for name, _ in glasses],
+            'models': [_describe(model) for _, model in glasses],
+            'start': self.start,
+            'step': self.step,
+            'count': count,
+        }
+        os.makedirs(os.path.dirname(self.table_path), exist_ok=True)
+
+        def write_meta(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+
+        def write_table(path):
+            with open(path, 'wb') as f:
+                np.save(f, table)
+
+        _write_atomic(self.meta_path, write_meta)
+        _write_atomic(self.table_path, write_table)
+
+    def __reduce__(self):
+        return (GlassCatalog, (self.path, self.cache, self.step))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name.upper() in self._rows
+
+    def __iter__(self):
+        return iter(self.names)
+
+    @property
+    def wavelengths(self):
+        return self.start + self.step * np.arange(self.table.shape[1])
+
+    def row(self, name):
+        """Chỉ số dòng của thủy tinh ``name`` (không phân biệt hoa thường)"""
+        try:
+            return self._rows[name.upper()]
+        except KeyError:
+            raise KeyError(f"khong co thuy tinh '{name}' trong danh muc") from None
+
+    def model(self, name):
+        """Mô hình tán sắc gốc (Sellmeier/Cauchy) của thủy tinh ``name``"""
+        kind, coefficients = self._definitions[self.row(name)]
+        return MODELS[kind](*coefficients)
+
+    def index(self, name, wavelength_nm):
+        """Chiết suất của ``name`` tại các bước sóng (nm), nội suy trên bảng
+
+        Bước sóng ngoài lưới được tính trực tiếp từ mô hình gốc.
+        """
+        values = self.table[self.row(name)]
+        wavelength = np.asarray(wavelength_nm, dtype=float)
+        position = (wavelength - self.start) / self.step
+        inside = (position >= 0) & (position <= len(values) - 1)
+
+        lower = np.clip(np.floor(position), 0, len(values) - 2).astype(np.intp)
+        fraction = position - lower
+        n = values[lower] * (1 - fraction) + values[lower + 1] * fraction
+        if not np.all(inside):
+            n = np.where(inside, n, self.model(name).index(wavelength))
+        return n
+
+    def nd(self, name):
+        """Chiết suất tại vạch d (587.6 nm)"""
+        return float(self.index(name, REFERENCE_WAVELENGTH))
+
+
+# Danh mục đã mở trong process hiện tại, theo đường dẫn
+_catalogs = {}
+
+
+def load_catalog(path=None):
+    """Danh mục dùng chung trong process (mở một lần, tạo bảng nếu chưa có)"""
+    key = os.path.abspath(path or CATALOG_PATH)
+    catalog = _catalogs.get(key)
+    if catalog is None:
+        catalog = _catalogs[key] = GlassCatalog(key)
+    return catalog
+
+
+@dataclass(frozen=True)
+class CatalogGlass:
+    """Thủy tinh trong danh mục, dùng thay ``CauchyModel`` trong ``SceneState``
+
+    Chỉ mang tên và đường dẫn danh mục nên pickle gọn; bảng được mở qua
+    ``load_catalog`` ở process sử dụng. Với ``n_ref``, đường cong được dịch
+    sao cho n(λ_d) = ``n_ref`` như các mô hình khác.
+    """
+    name: str
+    catalog: str = None         # None = danh mục đi kèm
+
+    def index(self, wavelength_nm, n_ref=None):
+        """Chiết suất tại các bước sóng (nm)"""
+        catalog = load_catalog(self.catalog)
+        n = catalog.index(self.name, wavelength_nm)
+        if n_ref is not None:
+            n = n + (n_ref - catalog.nd(self.name))
+        return n
+
+    @property
+    def nd(self):
+        return load_catalog(self.catalog).nd(self.name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Danh muc thuy tinh va bang chiet suat n(lambda)")
+    parser.add_argument('names', nargs='*', help="ten thuy tinh (bo trong = liet ke tat ca)")
+    parser.add_argument('--catalog', help="file danh muc (.txt hoac .agf)")
+    parser.add_argument('--wavelength', type=float, nargs='+',
+                        default=[486.1, REFERENCE_WAVELENGTH, 656.3], help="buoc song (nm)")
+    parser.add_argument('--rebuild', action='store_true', help="tinh lai bang")
+    args = parser.parse_args(argv)
+
+    try:
+        catalog = GlassCatalog(args.catalog, rebuild=args.rebuild)
+        if catalog.built:
+            print(f"Da tao bang {catalog.table.shape[0]} x {catalog.table.shape[1]}: "
+                  f"{catalog.table_path}", file=sys.stderr)
+        names = args.names or catalog.names
+        print('ten'.ljust(16) + ''.join(f'{w:>10.1f}' for w in args.wavelength))
+        for name in names:
+            n = catalog.index(name, args.wavelength)
+            print(catalog.names[catalog.row(name)].ljust(16)
+                  + ''.join(f'{value:>10.5f}' for value in n))
+    except KeyError as e:
+        print(f"Loi: {e.args[0]}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"Loi: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
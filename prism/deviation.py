@@ -0,0 +1,125 @@
+"""Đường cong góc lệch δ(θ₁), góc lệch cực tiểu và các góc tới hạn
+
+``DeviationEngine.curve(n1, n2, A)`` tính δ trên một lưới θ₁ dày trong một lần
+gọi ``solve_prism_batch``; δ_min và các góc tới hạn (phản xạ toàn phần, tia không
+đến mặt ra) được tính giải tích. Kết quả được giữ trong một LRU cache có giới
+hạn, khóa theo (n1, n2, A) đã lượng tử hóa, nên khi kéo slider quay lại các
+trạng thái gần đây thì không phải tính lại.
+"""
+import math
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from prism import physics
+
+DeviationCurve = namedtuple('DeviationCurve', [
+    'n1', 'n2', 'A',        # Tham số (đã lượng tử hóa) của đường cong
+    'theta1',               # Lưới góc tới (độ)
+    'delta',                # Góc lệch (độ), NaN khi tia bị chặn
+    'status',               # Mã RAY_* cho từng điểm lưới
+    'theta1_min',           # Góc tới cho góc lệch cực tiểu (None nếu không có)
+    'delta_min',            # Góc lệch cực tiểu (None nếu không có)
+    'cutoffs',              # dict các góc tới hạn (độ hoặc None)
+])
+DeviationCurve.__doc__ = """Đường cong δ(θ₁) của một lăng kính"""
+
+
+def minimum_deviation(n1, n2, A):
+    """Góc lệch cực tiểu (giải tích) - trả về ``(theta1_min, delta_min)`` hoặc ``(None, None)``
+
+    Tại góc lệch cực tiểu tia đi đối xứng: r1 = r2 = A/2, nên
+    sin θ₁ = (n2/n1)·sin(A/2) và δ_min = 2θ₁ - A.
+    """
+    s = n2 / n1 * math.sin(math.radians(A / 2))
+    if abs(s) > 1:
+        return None, None
+    theta1 = math.degrees(math.asin(s))
+    return theta1, 2 * theta1 - A
+
+
+def cutoff_angles(n1, n2, A):
+    """Các góc tới hạn theo θ₁ (độ), ``None`` nếu không xảy ra trong [0°, 90°]
+
+    - ``tir_exit_below``: θ₁ nhỏ hơn góc này thì phản xạ toàn phần tại mặt ra
+    - ``no_exit_above``: θ₁ lớn hơn góc này thì tia không đến mặt ra
+    - ``tir_entry_above``: θ₁ lớn hơn góc này thì phản xạ toàn phần tại mặt vào
+    """
+    ratio = n2 / n1
+
+    def incidence_for(r1):
+        """θ₁ cho góc khúc xạ r1 tại mặt vào (None nếu không đạt được)"""
+        s = ratio * math.sin(math.radians(r1))
+        if s < 0 or s > 1:
+            return None
+        return math.degrees(math.asin(s))
+
+    tir_exit_below = None
+    if n2 > n1:
+        critical = math.degrees(math.asin(n1 / n2))
+        if A - critical > 0:
+            tir_exit_below = incidence_for(A - critical)
+            if tir_exit_below is None:
+                tir_exit_below = 90.0   # Phản xạ toàn phần tại mặt ra với mọi θ₁
+
+    tir_entry_above = math.degrees(math.asin(ratio)) if n1 > n2 else None
+
+    return {
+        "tir_exit_below": tir_exit_below,
+        "no_exit_above": incidence_for(A),
+        "tir_entry_above": tir_entry_above,
+    }
+
+
+class DeviationEngine:
+    """Tính và cache các đường cong δ(θ₁)"""
+
+    def __init__(self, grid_size=2048, theta_range=(0.0, 90.0), cache_size=256,
+                 index_quantum=1e-4, angle_quantum=1e-3):
+        self.theta1 = np.linspace(*theta_range, grid_size)
+        self.theta1.setflags(write=False)
+        self.index_quantum = index_quantum
+        self.angle_quantum = angle_quantum
+        self._cached_curve = lru_cache(maxsize=cache_size)(self._compute)
+
+    def key(self, n1, n2, A):
+        """Khóa cache: (n1, n2, A) đã lượng tử hóa thành số nguyên"""
+        return (round(n1 / self.index_quantum), round(n2 / self.index_quantum),
+                round(A / self.angle_quantum))
+
+    def curve(self, n1, n2, A):
+        """``DeviationCurve`` cho (n1, n2, A), lấy từ cache nếu có"""
+        return self._cached_curve(self.key(n1, n2, A))
+
+    def _compute(self, key):
+        n1 = key[0] * self.index_quantum
+        n2 = key[1] * self.index_quantum
+        A = key[2] * self.angle_quantum
+
+        rays = physics.solve_prism_batch(n1, n2, self.theta1, A)
+        for values in (rays.delta, rays.status):
+            values.setflags(write=False)
+
+        theta1_min, delta_min = minimum_deviation(n1, n2, A)
+        # Cực tiểu chỉ có nghĩa khi tia đối xứng thực sự đi qua lăng kính
+        if theta1_min is not None:
+            status = physics.solve_prism_batch(n1, n2, theta1_min, A).status
+            if status != physics.RAY_OK:
+                theta1_min = delta_min = None
+
+        return DeviationCurve(n1, n2, A, self.theta1, rays.delta, rays.status,
+                              theta1_min, delta_min, cutoff_angles(n1, n2, A))
+
+    def cache_info(self):
+        """Thống kê cache (hits, misses, maxsize, currsize)"""
+        return self._cached_curve.cache_info()
+
+    def hit_rate(self):
+        """Tỉ lệ truy vấn trúng cache (0..1)"""
+        info = self.cache_info()
+        total = info.hits + info.misses
+        return info.hits / total if total else 0.0
+
+    def clear(self):
+        self._cached_curve.cache_clear()
@@ -0,0 +1,105 @@
+"""Mô hình chiết suất theo bước sóng và màu sRGB của ánh sáng đơn sắc
+
+Các mô hình (Cauchy, Sellmeier) là dataclass bất biến nên có thể nằm trong
+``SceneState``. ``index(wavelength_nm, n_ref)`` trả về n(λ); khi có ``n_ref``,
+đường cong được dịch/co giãn sao cho n(λ_d = 587.6 nm) = ``n_ref`` - nhờ đó
+slider n₂ điều khiển cả phổ tán sắc.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+# Vạch d của heli (nm) - bước sóng tham chiếu của n₂
+REFERENCE_WAVELENGTH = 587.6
+
+# Dải khả kiến mặc định (nm)
+VISIBLE_RANGE = (380.0, 750.0)
+
+
+@dataclass(frozen=True)
+class CauchyModel:
+    """n(λ) = A + B/λ² + C/λ⁴ với λ tính bằng µm (mặc định: thủy tinh BK7)"""
+    A: float = 1.5046
+    B: float = 0.00420
+    C: float = 0.0
+
+    def index(self, wavelength_nm, n_ref=None):
+        """Chiết suất tại các bước sóng (nm)"""
+        inv2 = (1000.0 / np.asarray(wavelength_nm, dtype=float)) ** 2
+        n = self.A + self.B * inv2 + self.C * inv2 ** 2
+        if n_ref is not None:
+            n = n + (n_ref - self.index(REFERENCE_WAVELENGTH))
+        return n
+
+
+@dataclass(frozen=True)
+class SellmeierModel:
+    """n²(λ) = 1 + Σ Bᵢλ²/(λ² - Cᵢ) với λ tính bằng µm (mặc định: BK7)"""
+    B1: float = 1.03961212
+    B2: float = 0.231792344
+    B3: float = 1.01046945
+    C1: float = 0.00600069867
+    C2: float = 0.0200179144
+    C3: float = 103.560653
+
+    def _susceptibility(self, wavelength_nm):
+        lam2 = (np.asarray(wavelength_nm, dtype=float) / 1000.0) ** 2
+        return (self.B1 * lam2 / (lam2 - self.C1)
+                + self.B2 * lam2 / (lam2 - self.C2)
+                + self.B3 * lam2 / (lam2 - self.C3))
+
+    def index(self, wavelength_nm, n_ref=None):
+        """Chiết suất tại các bước sóng (nm)"""
+        chi = self._susceptibility(wavelength_nm)
+        if n_ref is not None:
+            # Co giãn (n² - 1) để n(λ_d) = n_ref, giữ nguyên hình dạng đường cong
+            chi = chi * ((n_ref ** 2 - 1) / self._susceptibility(REFERENCE_WAVELENGTH))
+        return np.sqrt(1 + chi)
+
+
+def wavelength_grid(start=VISIBLE_RANGE[0], stop=VISIBLE_RANGE[1], step=1.0):
+    """Lưới bước sóng [start, stop] (nm), bao gồm cả hai đầu"""
+    count = int(round((stop - start) / step)) + 1
+    return start + step * np.arange(count)
+
+
+def _lobe(wavelength, mu, sigma_left, sigma_right):
+    sigma = np.where(wavelength < mu, sigma_left, sigma_right)
+    return np.exp(-0.5 * ((wavelength - mu) / sigma) ** 2)
+
+
+# Ma trận XYZ -> sRGB tuyến tính (D65)
+_XYZ_TO_SRGB = np.array([
+    [3.2406, -1.5372, -0.4986],
+    [-0.9689, 1.8758, 0.0415],
+    [0.0557, -0.2040, 1.0570],
+])
+
+
+def wavelength_to_rgb(wavelength_nm):
+    """Màu sRGB (mảng N x 3, giá trị 0..1) của ánh sáng đơn sắc
+
+    Hàm ghép màu CIE 1931 được xấp xỉ bằng tổng các Gauss hai phía (Wyman,
+    Sloan & Shirley 2013). Mỗi màu được chuẩn hóa về độ sáng tối đa rồi làm tối
+    dần ở hai đầu phổ như mắt người cảm nhận.
+    """
+    w = np.atleast_1d(np.asarray(wavelength_nm, dtype=float))
+
+    x = (1.056 * _lobe(w, 599.8, 37.9, 31.0) + 0.362 * _lobe(w, 442.0, 16.0, 26.7)
+         - 0.065 * _lobe(w, 501.1, 20.4, 26.2))
+    y = 0.821 * _lobe(w, 568.8, 46.9, 40.5) + 0.286 * _lobe(w, 530.9, 16.3, 31.1)
+    z = 1.217 * _lobe(w, 437.0, 11.8, 36.0) + 0.681 * _lobe(w, 459.0, 26.0, 13.8)
+
+    rgb = np.stack([x, y, z], axis=-1) @ _XYZ_TO_SRGB.T
+    # Màu phổ nằm ngoài gam sRGB - cắt phần âm rồi chuẩn hóa theo kênh lớn nhất
+    rgb = np.clip(rgb, 0, None)
+    peak = rgb.max(axis=-1, keepdims=True)
+    rgb = np.divide(rgb, peak, out=np.zeros_like(rgb), where=peak > 0)
+
+    # Giảm độ sáng ở hai đầu dải khả kiến
+    falloff = np.clip(np.minimum(0.3 + 0.7 * (w - 380) / 40,
+                                 0.3 + 0.7 * (780 - w) / 80), 0, 1)
+    rgb *= falloff[:, None]
+
+    # Mã hóa gamma sRGB
+    return np.where(rgb <= 0.0031308, 12.92 * rgb, 1.055 * rgb ** (1 / 2.4) - 0.055)
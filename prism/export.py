@@ -0,0 +1,150 @@
+"""Hàng đợi xuất ảnh chạy nền (không chặn giao diện)
+
+Mỗi yêu cầu xuất là một ``ExportJob`` chứa bản chụp ``SceneState`` và khung
+nhìn tại thời điểm yêu cầu. Việc render chạy trong một process riêng trên
+figure off-screen (Agg/SVG/PDF) nên GUI vẫn tương tác được trong lúc lưu ảnh
+lớn, và matplotlib (vốn không thread-safe) không bị dùng song song trong cùng
+một process. Khi có ``canvas``, các callback tiến độ/hoàn thành được gọi trên
+luồng GUI thông qua timer của canvas.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+# Figure off-screen của process render (tạo ở lần xuất đầu tiên)
+_worker_scene = None
+
+
+@dataclass(frozen=True)
+class ExportJob:
+    """Một yêu cầu xuất ảnh"""
+    path: str
+    state: object               # SceneState tại thời điểm yêu cầu
+    dpi: int = 300
+    format: str = None          # None = theo phần mở rộng của ``path``
+    xlim: tuple = None          # Khung nhìn (None = mặc định)
+    ylim: tuple = None
+
+
+def render_job(job):
+    """Render ``job`` ra file bằng figure off-screen của process hiện tại"""
+    global _worker_scene
+    from prism.scene import apply_style, create_scene_figure
+
+    if _worker_scene is None:
+        apply_style()
+        _worker_scene = create_scene_figure()
+    fig, scene = _worker_scene
+
+    scene.update(job.state)
+    if job.xlim is None or job.ylim is None:
+        scene.reset_view()
+    else:
+        scene.ax_main.set_xlim(*job.xlim)
+        scene.ax_main.set_ylim(*job.ylim)
+
+    directory = os.path.dirname(os.path.abspath(job.path))
+    os.makedirs(directory, exist_ok=True)
+    fig.savefig(job.path, dpi=job.dpi, format=job.format, bbox_inches='tight',
+                facecolor=fig.get_facecolor(), edgecolor='none')
+    return os.path.abspath(job.path)
+
+
+class ExportQueue:
+    """Hàng đợi các ``ExportJob`` được render lần lượt trong process nền
+
+    ``on_progress(completed, submitted)`` và ``on_done(job, path, error)`` được
+    gọi sau mỗi lần xuất xong (``error`` là exception hoặc None).
+    """
+
+    # Chu kỳ kiểm tra kết quả trên luồng GUI (ms)
+    poll_interval = 100
+
+    def __init__(self, canvas=None, on_progress=None, on_done=None, workers=1):
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+
+        self._pool = None
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        if canvas is not None:
+            self._timer = canvas.new_timer(interval=self.poll_interval)
+            self._timer.add_callback(self.poll)
+
+    def submit(self, job):
+        """Đưa ``job`` vào hàng đợi, trả về ``Future``"""
+        try:
+            future = self._executor().submit(render_job, job)
+        except BrokenProcessPool:
+            # Process render đã chết (ví dụ bị kill) - tạo pool mới
+            self._pool = None
+            future = self._executor().submit(render_job, job)
+        with self._lock:
+            self._futures[future] = job
+            self.submitted += 1
+
+        if self._timer is not None:
+            self._timer.start()
+        else:
+            future.add_done_callback(self._finish)
+        return future
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn: process render không kế thừa trạng thái Tk/GUI của process chính
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def pending(self):
+        """Số yêu cầu chưa xong"""
+        with self._lock:
+            return len(self._futures)
+
+    def poll(self):
+        """Gọi callback cho các yêu cầu đã xong (chạy trên luồng GUI)"""
+        with self._lock:
+            finished = [future for future in self._futures if future.done()]
+        for future in finished:
+            self._finish(future)
+        if self._timer is not None and not self.pending():
+            self._timer.stop()
+
+    def _finish(self, future):
+        with self._lock:
+            job = self._futures.pop(future, None)
+            if job is None:
+                return
+            self.completed += 1
+            completed, submitted = self.completed, self.submitted
+
+        error = future.exception()
+        path = None if error is not None else future.result()
+        if self.on_progress:
+            self.on_progress(completed, submitted)
+        if self.on_done:
+            self.on_done(job, path, error)
+
+    def wait(self):
+        """Chờ mọi yêu cầu xong (và gọi callback còn lại)"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.exception()
+        self.poll()
+
+    def shutdown(self, wait=True):
+        if wait:
+            self.wait()
+        if self._timer is not None:
+            self._timer.stop()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
@@ -0,0 +1,359 @@
+"""Bài toán ngược: tìm chiết suất từ góc lệch đo được (dạng mảng)
+
+- ``index_from_min_deviation``: n₂ = n₁·sin((A + δ_min)/2) / sin(A/2);
+- ``index_from_deviation``: với θ₁ đã biết, θ₂ = δ + A - θ₁ và khử r₁, r₂ từ
+  n₂ sin r₁ = n₁ sin θ₁, n₂ sin r₂ = n₁ sin θ₂, r₁ + r₂ = A cho nghiệm đóng
+  n₂² = s₁² + ((s₂ + s₁ cos A) / sin A)² với sᵢ = n₁ sin θᵢ.
+
+Cả hai đều là công thức đóng nên không cần lặp; mỗi nghiệm được kiểm tra lại
+bằng ``solve_prism_batch`` (``residual`` = δ tính xuôi - δ đo) và độ bất định
+được lan truyền từ sai số đo. ``fit_dispersion`` khớp hệ số Cauchy/Sellmeier
+cho nhiều mẫu cùng lúc bằng Levenberg-Marquardt theo lô.
+
+Ví dụ::
+
+    python -m prism.inverse do_dac.csv -o ket_qua.csv --sigma-delta 0.01 --fit cauchy
+"""
+import argparse
+import csv
+import sys
+import time
+from collections import namedtuple
+from dataclasses import fields
+
+import numpy as np
+
+from prism import physics
+from prism.dispersion import CauchyModel, SellmeierModel
+
+MODELS = {'cauchy': CauchyModel, 'sellmeier': SellmeierModel}
+
+# Sai lệch δ tối đa (độ) khi tính xuôi lại để coi nghiệm là hợp lệ
+ROUND_TRIP_TOLERANCE = 1e-8
+
+InverseResult = namedtuple('InverseResult', ['n2', 'sigma', 'converged', 'residual'])
+InverseResult.__doc__ = """Chiết suất tìm được (NaN khi vô nghiệm), độ bất định 1σ,
+cờ hợp lệ (tính xuôi cho lại δ đo) và sai lệch δ khi tính xuôi (độ)"""
+
+ModelFit = namedtuple('ModelFit', ['params', 'sigma', 'converged', 'rms', 'iterations'])
+ModelFit.__doc__ = """Hệ số mô hình (theo thứ tự trường của lớp mô hình), độ bất định
+1σ, cờ hội tụ, sai số RMS của n và số vòng lặp (theo từng mẫu)"""
+
+
+def _propagate(func, values, sigmas):
+    """Độ bất định của ``func(*values)`` từ sai số độc lập ``sigmas`` (sai phân trung tâm)"""
+    variance = 0.0
+    for i, sigma in enumerate(sigmas):
+        if np.all(np.asarray(sigma) == 0):
+            continue
+        step = 1e-6 * (1 + np.abs(values[i]))
+        plus, minus = list(values), list(values)
+        plus[i] = values[i] + step
+        minus[i] = values[i] - step
+        derivative = (func(*plus) - func(*minus)) / (2 * step)
+        variance = variance + (derivative * sigma) ** 2
+    return np.sqrt(variance)
+
+
+def _n2_min_deviation(delta_min, A, n1):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return n1 * np.sin(np.radians((A + delta_min) / 2)) / np.sin(np.radians(A / 2))
+
+
+def _n2_deviation(delta, theta1, A, n1):
+    s1 = n1 * np.sin(np.radians(theta1))
+    s2 = n1 * np.sin(np.radians(delta + A - theta1))
+    a = np.radians(A)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        along = (s2 + s1 * np.cos(a)) / np.sin(a)
+        # cos r₁ ≥ 0: nghiệm âm không ứng với tia thực
+        return np.where(along >= 0, np.sqrt(s1 ** 2 + along ** 2), np.nan)
+
+
+def _result(n2, sigma, delta_forward, delta, status):
+    residual = delta_forward - delta
+    converged = (status == physics.RAY_OK) & (np.abs(residual) <= ROUND_TRIP_TOLERANCE)
+    n2 = np.where(converged, n2, np.nan)
+    return InverseResult(n2, np.where(converged, sigma, np.nan), converged, residual)
+
+
+def index_from_min_deviation(delta_min, A, n1=1.0, sigma_delta=0.0, sigma_A=0.0, sigma_n1=0.0):
+    """n₂ từ góc lệch cực tiểu ``delta_min`` và góc lăng kính ``A`` (độ, mảng broadcast được)"""
+    delta_min, A, n1 = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                             for v in (delta_min, A, n1)))
+    n2 = _n2_min_deviation(delta_min, A, n1)
+    sigma = _propagate(_n2_min_deviation, (delta_min, A, n1), (sigma_delta, sigma_A, sigma_n1))
+
+    # Tính xuôi tại góc tới đối xứng sin θ₁ = (n₂/n₁)·sin(A/2)
+    with np.errstate(invalid='ignore'):
+        theta1 = np.degrees(np.arcsin(n2 / n1 * np.sin(np.radians(A / 2))))
+    rays = physics.solve_prism_batch(n1, n2, theta1, A)
+    return _result(n2, sigma, rays.delta, delta_min, rays.status)
+
+
+def index_from_deviation(delta, theta1, A, n1=1.0, sigma_delta=0.0, sigma_theta1=0.0,
+                         sigma_A=0.0, sigma_n1=0.0):
+    """n₂ từ góc lệch ``delta`` đo tại góc tới ``theta1`` đã biết (độ, mảng broadcast được)"""
+    delta, theta1, A, n1 = np.broadcast_arrays(*(np.asarray(v, dtype=float)
+                                                 for v in (delta, theta1, A, n1)))
+    n2 = _n2_deviation(delta, theta1, A, n1)
+    sigma = _propagate(_n2_deviation, (delta, theta1, A, n1),
+                       (sigma_delta, sigma_theta1, sigma_A, sigma_n1))
+    rays = physics.solve_prism_batch(n1, n2, theta1, A)
+    return _result(n2, sigma, rays.delta, delta, rays.status)
+
+
+# ----------------------------------------------------------------------
+# Khớp mô hình tán sắc
+# ----------------------------------------------------------------------
+def _cauchy_jacobian(params, wavelength_nm):
+    """n(λ) và đạo hàm theo (A, B, C) - λ tính bằng µm như ``CauchyModel``"""
+    inv2 = (1000.0 / wavelength_nm) ** 2
+    jac = np.stack([np.ones_like(inv2), inv2, inv2 ** 2], axis=-1)
+    return (jac * params[..., None, :]).sum(axis=-1), jac
+
+
+def _sellmeier_jacobian(params, wavelength_nm):
+    """n(λ) và đạo hàm theo (B1, B2, B3, C1, C2, C3)"""
+    lam2 = (wavelength_nm / 1000.0) ** 2
+    B, C = params[..., None, :3], params[..., None, 3:]
+    ratio = lam2[..., None] / (lam2[..., None] - C)
+    n = np.sqrt(1 + (B * ratio).sum(axis=-1))
+    dB = ratio / (2 * n[..., None])
+    dC = B * ratio ** 2 / lam2[..., None] / (2 * n[..., None])
+    return n, np.concatenate([dB, dC], axis=-1)
+
+
+_JACOBIANS = {CauchyModel: _cauchy_jacobian, SellmeierModel: _sellmeier_jacobian}
+# Các mô hình tuyến tính theo hệ số
+_LINEAR = (CauchyModel,)
+
+
+def _cost(jacobian, params, wavelength_nm, n, weight):
+    """Tổng bình phương phần dư có trọng số của từng mẫu"""
+    model_n, _ = jacobian(params, wavelength_nm)
+    return (((model_n - n) * weight) ** 2).sum(axis=-1)
+
+
+def _normal(jw):
+    """Ma trận chuẩn JᵀJ theo lô"""
+    return jw.transpose(0, 2, 1) @ jw
+
+
+def _solve(matrices, vectors):
+    """Giải các hệ ``matrices @ x = vectors`` theo lô (giả nghịch đảo nếu suy biến)"""
+    try:
+        return np.linalg.solve(matrices, vectors[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(matrices) @ vectors[..., None])[..., 0]
+
+
+def _inverse(matrices):
+    try:
+        return np.linalg.inv(matrices)
+    except np.linalg.LinAlgError:
+        return np.linalg.pinv(matrices)
+
+
+def fit_dispersion(wavelength_nm, n, model=CauchyModel, sigma_n=None, initial=None,
+                   fixed=(), max_iter=100, tol=1e-10):
+    """Khớp ``model`` (lớp hoặc tên 'cauchy'/'sellmeier') cho n(λ) của nhiều mẫu cùng lúc
+
+    ``wavelength_nm`` và ``n`` có shape ``(..., k)``: mỗi hàng là một mẫu với k
+    bước sóng. ``sigma_n`` (tùy chọn) là độ bất định của từng giá trị n, dùng làm
+    trọng số; khi không có, độ bất định của hệ số được ước lượng từ phần dư.
+    ``initial`` mặc định là hệ số của ``model()`` (BK7); các hệ số có tên trong
+    ``fixed`` giữ nguyên giá trị ban đầu (ví dụ ``('C1', 'C2', 'C3')`` khi chỉ
+    đo trong dải khả kiến). Trả về ``ModelFit`` với ``params`` shape ``(..., số hệ số)``.
+    """
+    model = MODELS.get(model, model)
+    jacobian = _JACOBIANS[model]
+    wavelength_nm, n = np.broadcast_arrays(np.asarray(wavelength_nm, dtype=float),
+                                           np.asarray(n, dtype=float))
+    batch, k = n.shape[:-1], n.shape[-1]
+    wavelength_nm = wavelength_nm.reshape(-1, k)
+    n = n.reshape(-1, k)
+    if sigma_n is None:
+        weight = np.ones_like(n)
+    else:
+        weight = 1 / np.broadcast_to(np.asarray(sigma_n, dtype=float), batch + (k,)).reshape(-1, k)
+
+    names = [f.name for f in fields(model)]
+    unknown = set(fixed) - set(names)
+    if unknown:
+        raise ValueError(f"{model.__name__} khong co he so: {', '.join(sorted(unknown))}")
+    free = np.array([name not in fixed for name in names])
+    p = int(free.sum())
+    if initial is None:
+        initial = [getattr(model(), name) for name in names]
+    params = np.array(np.broadcast_to(np.asarray(initial, dtype=float), (len(n), len(names))))
+
+    # Mô hình tuyến tính theo hệ số (Cauchy): một bước Gauss-Newton không
+    # damping cho nghiệm bình phương tối thiểu chính xác
+    linear = model in _LINEAR
+    current = _cost(jacobian, params, wavelength_nm, n, weight)
+    damping = np.full(len(n), 0.0 if linear else 1e-3)
+    diagonal = np.arange(p)
+    converged = np.zeros(len(n), dtype=bool)
+    iterations = np.zeros(len(n), dtype=int)
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        for _ in range(1 if linear else max_iter):
+            index = np.flatnonzero(~converged)
+            if index.size == 0:
+                break
+            w = weight[index]
+            model_n, jac = jacobian(params[index], wavelength_nm[index])
+            jw = jac[..., free] * w[..., None]
+            normal = _normal(jw)
+            gradient = (((n[index] - model_n) * w)[:, None, :] @ jw)[:, 0]
+
+            # Levenberg-Marquardt: nhận bước nếu chi phí giảm (giảm damping), nếu
+            # không thì tăng damping cho lần sau
+            scaled = normal.copy()
+            scaled[:, diagonal, diagonal] *= 1 + damping[index, None]
+            trial = params[index]
+            trial[:, free] += _solve(scaled, gradient)
+            trial_cost = _cost(jacobian, trial, wavelength_nm[index], n[index], w)
+            better = trial_cost <= current[index]
+
+            # Hội tụ khi chi phí gần như không còn giảm hoặc gradient triệt tiêu
+            stalled = current[index] - trial_cost <= tol * current[index]
+            params[index[better]] = trial[better]
+            current[index[better]] = trial_cost[better]
+            damping[index] = np.where(better, damping[index] / 10, damping[index] * 10)
+            iterations[index] += 1
+            converged[index] = linear | (better & stalled) | (np.abs(gradient) <= tol).all(axis=-1)
+
+        model_n, jac = jacobian(params, wavelength_nm)
+        residual = model_n - n
+        jw = jac[..., free] * weight[..., None]
+        covariance = _inverse(_normal(jw))
+        if sigma_n is None:
+            # Không có sai số đo: ước lượng phương sai từ phần dư (cần k > số hệ số)
+            scale = (residual ** 2).sum(axis=-1) / (k - p) if k > p else np.full(len(n), np.nan)
+            covariance = covariance * scale[:, None, None]
+        sigma = np.zeros_like(params)
+        sigma[:, free] = np.sqrt(covariance[:, diagonal, diagonal])
+        rms = np.sqrt((residual ** 2).mean(axis=-1))
+
+    converged &= np.isfinite(params).all(axis=-1)
+    shape = batch + (len(names),)
+    return ModelFit(params.reshape(shape), sigma.reshape(shape), converged.reshape(batch),
+                    rms.reshape(batch), iterations.reshape(batch))
+
+
+def model_from_params(model, params):
+    """Đối tượng mô hình (``CauchyModel``/``SellmeierModel``) từ một hàng hệ số"""
+    model = MODELS.get(model, model)
+    return model(*(float(value) for value in params))
+
+
+# ----------------------------------------------------------------------
+# Dòng lệnh
+# ----------------------------------------------------------------------
+def read_measurements(path):
+    """Đọc CSV đo đạc thành dict ``{cột: mảng}`` (ô trống = NaN; cột ``sample`` giữ dạng chuỗi)"""
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise ValueError(f"{path}: khong co du lieu")
+    columns = {}
+    for name in rows[0]:
+        key = name.strip()
+        values = [(row[name] or '').strip() for row in rows]
+        if key == 'sample':
+            columns[key] = values
+            continue
+        try:
+            columns[key] = np.array([float(v) if v else np.nan for v in values])
+        except ValueError as e:
+            raise ValueError(f"{path}: cot {key!r}: {e}") from None
+    return rows, columns
+
+
+def _fit_samples(columns, n2, sigma, model, fixed):
+    """Khớp mô hình cho từng mẫu (cột ``sample``); các mẫu cùng số bước sóng được khớp chung một lô"""
+    samples = columns.get('sample', ['all'] * len(n2))
+    groups = {}
+    for index, name in enumerate(samples):
+        if np.isfinite(n2[index]):
+            groups.setdefault(name, []).append(index)
+
+    by_size = {}
+    for name, index in groups.items():
+        by_size.setdefault(len(index), []).append((name, index))
+    results = []
+    for size, members in by_size.items():
+        index = np.array([index for _, index in members])
+        fit = fit_dispersion(columns['wavelength'][index], n2[index], model,
+                             sigma_n=sigma[index] if np.all(sigma[index] > 0) else None,
+                             fixed=fixed)
+        for i, (name, _) in enumerate(members):
+            results.append((name, size, fit.params[i], fit.sigma[i], bool(fit.converged[i]),
+                            float(fit.rms[i])))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Tim chiet suat n2 tu goc lech do duoc (bai toan nguoc, dang mang)")
+    parser.add_argument('table', help="CSV voi cot delta_min (hoac delta va theta1), A, "
+                                      "tuy chon n1, wavelength, sample")
+    parser.add_argument('-o', '--output', help="ghi CSV ket qua (them cot n2, sigma_n2, converged)")
+    parser.add_argument('--sigma-delta', type=float, default=0.0, help="sai so do delta (do)")
+    parser.add_argument('--sigma-A', type=float, default=0.0, help="sai so goc A (do)")
+    parser.add_argument('--sigma-theta1', type=float, default=0.0, help="sai so goc toi (do)")
+    parser.add_argument('--fit', choices=tuple(MODELS), help="khop mo hinh n(lambda) cho moi sample")
+    parser.add_argument('--fix', default='', help="he so giu co dinh khi khop, vd C1,C2,C3")
+    args = parser.parse_args(argv)
+
+    try:
+        rows, columns = read_measurements(args.table)
+        if 'A' not in columns or not ('delta_min' in columns or
+                                       {'delta', 'theta1'} <= columns.keys()):
+            raise ValueError("can cot A va delta_min (hoac delta, theta1)")
+        if args.fit and 'wavelength' not in columns:
+            raise ValueError("--fit can cot wavelength")
+    except (OSError, ValueError) as e:
+        print(f"Loi doc du lieu: {e}", file=sys.stderr)
+        return 1
+
+    n1 = columns.get('n1', 1.0)
+    start = time.perf_counter()
+    if 'delta_min' in columns:
+        result = index_from_min_deviation(columns['delta_min'], columns['A'], n1,
+                                          args.sigma_delta, args.sigma_A)
+    else:
+        result = index_from_deviation(columns['delta'], columns['theta1'], columns['A'], n1,
+                                      args.sigma_delta, args.sigma_theta1, args.sigma_A)
+    elapsed = time.perf_counter() - start
+    solved = int(result.converged.sum())
+    print(f"Da giai {len(rows):,} phep do trong {elapsed * 1000:.1f} ms: {solved:,} hop le, "
+          f"{len(rows) - solved:,} vo nghiem (sai lech tinh xuoi toi da "
+          f"{np.nanmax(np.abs(result.residual[result.converged]), initial=0):.1e} do)")
+
+    if args.output:
+        with open(args.output, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow([*rows[0].keys(), 'n2', 'sigma_n2', 'converged'])
+            for row, n2, sigma, ok in zip(rows, result.n2, result.sigma, result.converged):
+                writer.writerow([*row.values(), f"{n2:.10f}", f"{sigma:.3e}", int(ok)])
+        print(f"Da luu ket qua: {args.output}")
+
+    if args.fit:
+        fixed = tuple(name.strip() for name in args.fix.split(',') if name.strip())
+        names = [f.name for f in fields(MODELS[args.fit])]
+        try:
+            fits = _fit_samples(columns, result.n2, result.sigma, args.fit, fixed)
+        except ValueError as e:
+            print(f"Loi khop mo hinh: {e}", file=sys.stderr)
+            return 1
+        for name, size, params, sigma, ok, rms in fits:
+            values = ', '.join(f"{p}={v:.6g}±{s:.1g}" for p, v, s in zip(names, params, sigma))
+            print(f"{name}: {values} (rms {rms:.1e}, {size} buoc song"
+                  f"{'' if ok else ', CHUA HOI TU'})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""Mô phỏng Monte Carlo cường độ: chùm tia đa sắc, chia năng lượng theo Fresnel
+
+Mỗi tia mang một bước sóng lấy mẫu từ phổ nguồn. Tại mỗi mặt lăng kính tia
+được phản xạ với xác suất bằng hệ số Fresnel R (hoặc khúc xạ với xác suất
+1 - R), nên trung bình trên nhiều tia năng lượng được chia đúng theo Fresnel.
+Các tia thoát ra được thu trên một màn ảo thành histogram (vị trí x bước sóng).
+
+Số tia rất lớn (10⁸) được xử lý theo từng chunk kích thước cố định nên bộ nhớ
+không phụ thuộc tổng số tia; các chunk được chia cho một process pool và kết
+quả được cộng dồn ngay khi về, để có thể hiển thị ảnh tích lũy trực tiếp.
+
+Ví dụ::
+
+    python -m prism.montecarlo --rays 1e8 --workers 4 --live
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+
+import numpy as np
+
+from prism import raytrace
+from prism.dispersion import VISIBLE_RANGE, CauchyModel, wavelength_to_rgb
+
+# Số tia mỗi chunk mặc định (~40 MB bộ nhớ tạm cho mỗi worker)
+CHUNK_SIZE = 1 << 18
+
+
+@dataclass(frozen=True)
+class DetectorSetup:
+    """Lăng kính, nguồn sáng và màn thu của một lượt mô phỏng"""
+    n1: float = 1.0
+    n2: float = 1.5
+    theta1: float = 45.0
+    prism_angle: float = 60.0
+    dispersion_model: CauchyModel = CauchyModel()
+    height: float = 1.5
+    max_bounces: int = 10
+    # Chùm song song đi vào giữa mặt trái
+    beam_width: float = 0.2
+    # Phổ nguồn ((bước sóng nm...), (trọng số...)); None = phổ phẳng khả kiến
+    spectrum: tuple = None
+    # Màn thu: đoạn thẳng có tâm, pháp tuyến (độ, cùng hướng tia tới màn) và độ rộng
+    screen_center: tuple = (3.5, 0.0)
+    screen_angle: float = 0.0
+    screen_width: float = 8.0
+    screen_bins: int = 512
+    wavelength_bins: int = 74
+
+    @property
+    def shape(self):
+        """Shape của histogram (vị trí trên màn, bước sóng)"""
+        return (self.screen_bins, self.wavelength_bins)
+
+    def wavelength_edges(self):
+        return np.linspace(*VISIBLE_RANGE, self.wavelength_bins + 1)
+
+    def screen_edges(self):
+        return np.linspace(-self.screen_width / 2, self.screen_width / 2, self.screen_bins + 1)
+
+
+def sample_wavelengths(rng, count, spectrum=None):
+    """Lấy mẫu ``count`` bước sóng (nm) theo phổ nguồn (nghịch đảo hàm phân phối)"""
+    if spectrum is None:
+        return rng.uniform(*VISIBLE_RANGE, count)
+    wavelengths, weights = (np.asarray(values, dtype=float) for values in spectrum)
+    # Hàm phân phối tích lũy theo quy tắc hình thang trên bảng phổ
+    cdf = np.concatenate([[0.0], np.cumsum(0.5 * (weights[1:] + weights[:-1])
+                                           * np.diff(wavelengths))])
+    return np.interp(rng.random(count), cdf / cdf[-1], wavelengths)
+
+
+def detect(setup, positions, directions, escaped, wavelengths):
+    """Histogram (int64, ``setup.shape``) các tia thoát ra chạm màn thu"""
+    angle = np.radians(setup.screen_angle)
+    normal = np.array([np.cos(angle), np.sin(angle)])
+    tangent = np.array([-normal[1], normal[0]])
+    center = np.asarray(setup.screen_center, dtype=float)
+
+    facing = directions @ normal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((center - positions) @ normal) / facing
+    hit = escaped & (facing > 0) & (t > 0)
+
+    along = ((positions + t[:, None] * directions - center) @ tangent)[hit]
+    pos_bin = np.floor((along / setup.screen_width + 0.5) * setup.screen_bins).astype(np.int64)
+    low, high = VISIBLE_RANGE
+    wl_bin = np.floor((wavelengths[hit] - low) / (high - low)
+                      * setup.wavelength_bins).astype(np.int64)
+    wl_bin = np.minimum(wl_bin, setup.wavelength_bins - 1)
+
+    inside = (pos_bin >= 0) & (pos_bin < setup.screen_bins)
+    flat = pos_bin[inside] * setup.wavelength_bins + wl_bin[inside]
+    counts = np.bincount(flat, minlength=setup.screen_bins * setup.wavelength_bins)
+    return counts.reshape(setup.shape)
+
+
+def simulate_chunk(setup, count, seed):
+    """Dò ``count`` tia với bộ sinh số ngẫu nhiên ``seed``, trả về histogram trên màn"""
+    rng = np.random.default_rng(seed)
+    wavelengths = sample_wavelengths(rng, count, setup.spectrum)
+    n_inside = setup.dispersion_model.index(wavelengths, n_ref=setup.n2)
+
+    vertices = raytrace.prism_vertices(setup.prism_angle, setup.height)
+    direction = raytrace.incident_direction(setup.prism_angle, setup.theta1)
+    across = np.array([-direction[1], direction[0]])
+    impact = (vertices[0] + vertices[2]) / 2
+    offsets = (rng.random(count) - 0.5) * setup.beam_width
+    origins = impact - direction + offsets[:, None] * across
+
+    trace = raytrace.trace_rays(vertices, origins, direction, setup.n1, n_inside,
+                                max_bounces=setup.max_bounces, rng=rng, record_paths=False)
+    return detect(setup, trace.positions, trace.directions, trace.escaped, wavelengths)
+
+
+def _chunk_sizes(total_rays, chunk_size):
+    full, rest = divmod(total_rays, chunk_size)
+    return [chunk_size] * full + ([rest] if rest else [])
+
+
+def stream(setup, total_rays, chunk_size=CHUNK_SIZE, workers=None, seed=0):
+    """Chạy mô phỏng, sinh ``(rays_done, histogram)`` mỗi khi một chunk xong
+
+    ``histogram`` là mảng tích lũy dùng chung (được cộng dồn tại chỗ), không
+    phải bản sao. Mỗi chunk có seed riêng sinh từ ``seed`` nên kết quả cuối
+    cùng không phụ thuộc số worker hay thứ tự hoàn thành.
+    """
+    sizes = _chunk_sizes(int(total_rays), chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    histogram = np.zeros(setup.shape, dtype=np.int64)
+    done = 0
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for size, chunk_seed in zip(sizes, seeds):
+            histogram += simulate_chunk(setup, size, chunk_seed)
+            done += size
+            yield done, histogram
+        return
+
+    jobs = iter(zip(sizes, seeds))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Giới hạn số chunk đang chờ để bộ nhớ không tăng theo tổng số tia
+        pending = {}
+        try:
+            while True:
+                while len(pending) < 2 * workers:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    pending[pool.submit(simulate_chunk, setup, *job)] = job[0]
+                if not pending:
+                    break
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    histogram += future.result()
+                    done += pending.pop(future)
+                    yield done, histogram
+        finally:
+            # Dừng sớm (ví dụ đóng cửa sổ live): hủy các chunk chưa chạy
+            for future in pending:
+                future.cancel()
+
+
+def detector_image(histogram, setup):
+    """Màu (sRGB, N x 3) của ảnh trên màn thu, chuẩn hóa theo điểm sáng nhất"""
+    edges = setup.wavelength_edges()
+    rgb = wavelength_to_rgb(0.5 * (edges[1:] + edges[:-1]))
+    image = histogram @ rgb
+    peak = image.max()
+    return image / peak if peak > 0 else image
+
+
+class DetectorView:
+    """Ảnh trên màn thu (trên) và histogram vị trí x bước sóng (dưới)"""
+
+    def __init__(self, fig, setup):
+        self.fig = fig
+        self.setup = setup
+        ax_image, ax_hist = fig.subplots(2, 1, sharex=True,
+                                         gridspec_kw=dict(height_ratios=[1, 3]))
+        extent_x = (-setup.screen_width / 2, setup.screen_width / 2)
+
+        self.image = ax_image.imshow(np.zeros((1, setup.screen_bins, 3)), aspect='auto',
+                                     extent=(*extent_x, 0, 1), interpolation='nearest')
+        ax_image.set_yticks([])
+        self.title = ax_image.set_title('', color='white')
+
+        self.hist = ax_hist.imshow(np.zeros(setup.shape[::-1]), aspect='auto', origin='lower',
+                                   extent=(*extent_x, *VISIBLE_RANGE), cmap='inferno',
+                                   interpolation='nearest')
+        ax_hist.set_xlabel('Vị trí trên màn')
+        ax_hist.set_ylabel('Bước sóng (nm)')
+
+    def update(self, histogram, rays_done, total_rays, rate=None):
+        self.image.set_data(detector_image(histogram, self.setup)[None, :, :])
+        # Thang căn bậc hai để thấy được cả các tia phản xạ yếu
+        self.hist.set_data(np.sqrt(histogram.T))
+        self.hist.autoscale()
+        hits = int(histogram.sum())
+        text = f"{rays_done:,}/{total_rays:,} tia, {hits:,} tia tới màn"
+        if rate:
+            text += f" ({rate / 1e6:.2f} triệu tia/s)"
+        self.title.set_text(text)
+
+
+def run(setup, total_rays, chunk_size=CHUNK_SIZE, workers=None, seed=0, live=False,
+        refresh=0.25):
+    """Chạy hết mô phỏng, trả về histogram cuối cùng
+
+    ``live=True`` mở cửa sổ matplotlib và vẽ lại ảnh tích lũy tối đa mỗi
+    ``refresh`` giây; đóng cửa sổ sẽ dừng mô phỏng sớm.
+    """
+    view = None
+    if live:
+        import matplotlib.pyplot as plt
+        plt.style.use('dark_background')
+        fig = plt.figure(figsize=(10, 6))
+        fig.canvas.manager.set_window_title('Monte Carlo - man thu')
+        view = DetectorView(fig, setup)
+        plt.show(block=False)
+
+    start = time.perf_counter()
+    last_draw = 0.0
+    histogram = np.zeros(setup.shape, dtype=np.int64)
+    rays_done = 0
+    for rays_done, histogram in stream(setup, total_rays, chunk_size, workers, seed):
+        now = time.perf_counter()
+        if view is not None and now - last_draw >= refresh:
+            if not plt.fignum_exists(fig.number):
+                break
+            view.update(histogram, rays_done, total_rays, rays_done / (now - start))
+            plt.pause(0.001)
+            last_draw = time.perf_counter()
+
+    elapsed = time.perf_counter() - start
+    if view is not None and plt.fignum_exists(fig.number):
+        view.update(histogram, rays_done, total_rays, rays_done / elapsed if elapsed else None)
+        plt.show()
+    return histogram.copy(), rays_done, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Mo phong Monte Carlo cuong do (Fresnel) tren man thu")
+    parser.add_argument('--rays', type=float, default=1e7, help="tong so tia (vd 1e8)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="so process (mac dinh: so nhan CPU)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--n1', type=float, default=DetectorSetup.n1)
+    parser.add_argument('--n2', type=float, default=None,
+                        help=f"chiet suat tai 587.6 nm (mac dinh: {DetectorSetup.n2} hoac n_d cua --glass)")
+    parser.add_argument('--glass', help="thuy tinh trong danh muc (vd N-SF11)")
+    parser.add_argument('--theta1', type=float, default=DetectorSetup.theta1)
+    parser.add_argument('--A', type=float, default=DetectorSetup.prism_angle)
+    parser.add_argument('--beam-width', type=float, default=DetectorSetup.beam_width)
+    parser.add_argument('--live', action='store_true', help="hien thi anh tich luy truc tiep")
+    parser.add_argument('-o', '--output', help="luu histogram ra file .npz")
+    args = parser.parse_args(argv)
+
+    model, n2 = CauchyModel(), args.n2
+    if args.glass:
+        from prism.catalog import CatalogGlass, load_catalog
+        catalog = load_catalog()
+        if args.glass not in catalog:
+            print(f"Loi: khong co thuy tinh '{args.glass}' trong danh muc", file=sys.stderr)
+            return 1
+        model = CatalogGlass(catalog.names[catalog.row(args.glass)])
+        if n2 is None:
+            n2 = model.nd
+    if n2 is None:
+        n2 = DetectorSetup.n2
+
+    setup = DetectorSetup(n1=args.n1, n2=n2, theta1=args.theta1, prism_angle=args.A,
+                          dispersion_model=model, beam_width=args.beam_width)
+    histogram, rays_done, elapsed = run(setup, int(args.rays), args.chunk_size,
+                                        args.workers, args.seed, live=args.live)
+
+    rate = rays_done / elapsed if elapsed > 0 else float('inf')
+    print(f"Da mo phong {rays_done:,} tia trong {elapsed:.2f}s ({rate / 1e6:.2f} trieu tia/s), "
+          f"{int(histogram.sum()):,} tia toi man")
+    if args.output:
+        np.savez_compressed(args.output, histogram=histogram,
+                            screen_edges=setup.screen_edges(),
+                            wavelength_edges=setup.wavelength_edges())
+        print(f"Da luu histogram: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
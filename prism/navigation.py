@@ -0,0 +1,190 @@
+"""Zoom/pan cho ``ax_main`` vẽ lại bằng blitting
+
+Khi bắt đầu một lượt tương tác (lần cuộn đầu tiên hoặc nhấn chuột), phần tĩnh
+của figure (slider, nút, panel thông tin...) được vẽ một lần và lưu lại làm
+nền. Trong lúc pan/zoom chỉ ``ax_main`` được vẽ lại lên nền đó rồi blit ra màn
+hình. Các sự kiện cuộn dồn dập chỉ cập nhật giới hạn trục, còn việc vẽ được
+gộp lại tối đa một lần mỗi khung hình. Khi tương tác kết thúc, figure được vẽ
+lại đầy đủ một lần.
+"""
+from matplotlib.transforms import Bbox
+
+from prism.profiler import FrameProfiler
+
+
+class AxesNavigator:
+    """Zoom bằng con lăn chuột và pan bằng chuột trái trên một axes"""
+
+    # Khoảng thời gian một khung hình (ms) - các sự kiện cuộn trong khoảng này
+    # được gộp thành một lần vẽ
+    frame_interval = 16
+    # Sau bao lâu không cuộn (ms) thì coi như kết thúc lượt zoom
+    settle_delay = 150
+    # Lề (pixel) quanh axes để blit cả nhãn trục
+    blit_padding = 40
+
+    def __init__(self, ax, base_scale=2., profiler=None):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.base_scale = base_scale
+        self.profiler = profiler or FrameProfiler()
+
+        self.background = None
+        self.blit_bbox = None
+        self.dirty = False
+        self.press_data = None
+
+        # Thống kê: số sự kiện nhận được và số lần thực sự vẽ
+        self.event_count = 0
+        self.blit_count = 0
+
+        self.frame_timer = self.canvas.new_timer(interval=self.frame_interval)
+        self.frame_timer.single_shot = True
+        self.frame_timer.add_callback(self.flush)
+
+        self.settle_timer = self.canvas.new_timer(interval=self.settle_delay)
+        self.settle_timer.single_shot = True
+        self.settle_timer.add_callback(self.settle)
+
+        self.canvas.mpl_connect('scroll_event', self.on_scroll)
+        self.canvas.mpl_connect('button_press_event', self.on_press)
+        self.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        self.canvas.mpl_connect('button_release_event', self.on_release)
+
+    # ------------------------------------------------------------------
+    # Sự kiện chuột
+    # ------------------------------------------------------------------
+    def on_scroll(self, event):
+        """Zoom quanh vị trí con trỏ"""
+        if event.inaxes != self.ax:
+            return
+
+        if event.button == 'up':
+            scale_factor = 1 / self.base_scale
+        elif event.button == 'down':
+            scale_factor = self.base_scale
+        else:
+            return
+
+        self.event_count += 1
+        cur_xlim = self.ax.get_xlim()
+        cur_ylim = self.ax.get_ylim()
+        xdata = event.xdata
+        ydata = event.ydata
+
+        new_width = (cur_xlim[1] - cur_xlim[0]) * scale_factor
+        new_height = (cur_ylim[1] - cur_ylim[0]) * scale_factor
+
+        relx = (cur_xlim[1] - xdata)/(cur_xlim[1] - cur_xlim[0])
+        rely = (cur_ylim[1] - ydata)/(cur_ylim[1] - cur_ylim[0])
+
+        self.ax.set_xlim([xdata - new_width * (1-relx), xdata + new_width * (relx)])
+        self.ax.set_ylim([ydata - new_height * (1-rely), ydata + new_height * (rely)])
+
+        self.begin_interaction()
+        self.request_redraw()
+
+        # Lượt zoom kết thúc khi không còn sự kiện cuộn trong settle_delay
+        self.settle_timer.stop()
+        self.settle_timer.start()
+
+    def on_press(self, event):
+        if event.inaxes != self.ax or event.button != 1:  # Chỉ chuột trái
+            return
+
+        # Lưu vị trí theo pixel và phép biến đổi lúc nhấn để độ dịch chuyển
+        # không phụ thuộc vào giới hạn trục đang thay đổi
+        self.press_data = {
+            'x': event.x,
+            'y': event.y,
+            'xlim': self.ax.get_xlim(),
+            'ylim': self.ax.get_ylim(),
+            'inverse': self.ax.transData.inverted(),
+        }
+        # Thay đổi cursor khi kéo
+        self._set_cursor("fleur")
+        self.begin_interaction()
+
+    def on_motion(self, event):
+        if self.press_data is None:
+            return
+
+        self.event_count += 1
+        inverse = self.press_data['inverse']
+        x0, y0 = inverse.transform((self.press_data['x'], self.press_data['y']))
+        x1, y1 = inverse.transform((event.x, event.y))
+        dx = x1 - x0
+        dy = y1 - y0
+
+        xlim = self.press_data['xlim']
+        ylim = self.press_data['ylim']
+        self.ax.set_xlim(xlim[0] - dx, xlim[1] - dx)
+        self.ax.set_ylim(ylim[0] - dy, ylim[1] - dy)
+
+        self.request_redraw()
+
+    def on_release(self, event):
+        if self.press_data is None:
+            return
+
+        self.press_data = None
+        # Trở lại cursor bình thường
+        self._set_cursor("")
+        self.settle()
+
+    # ------------------------------------------------------------------
+    # Vẽ lại
+    # ------------------------------------------------------------------
+    def begin_interaction(self):
+        """Lưu nền tĩnh (mọi thứ trừ axes) nếu chưa có"""
+        if self.background is not None or not self.canvas.supports_blit:
+            return
+
+        self.ax.set_visible(False)
+        try:
+            self.canvas.draw()
+            self.background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        finally:
+            self.ax.set_visible(True)
+
+        renderer = self.canvas.get_renderer()
+        self.blit_bbox = Bbox.union([self.ax.bbox, self.ax.get_tightbbox(renderer)]).padded(
+            self.blit_padding)
+
+    def request_redraw(self):
+        """Đánh dấu cần vẽ lại; nhiều yêu cầu trong một khung hình gộp làm một"""
+        if self.dirty:
+            return
+        self.dirty = True
+        self.frame_timer.start()
+
+    def flush(self):
+        """Vẽ lại axes nếu có thay đổi đang chờ"""
+        if not self.dirty:
+            return
+        self.dirty = False
+
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+
+        with self.profiler.stage('blit'):
+            self.canvas.restore_region(self.background)
+            self.ax.figure.draw_artist(self.ax)
+            self.canvas.blit(self.blit_bbox)
+        self.blit_count += 1
+
+    def settle(self):
+        """Kết thúc lượt tương tác: bỏ nền đã lưu và vẽ lại đầy đủ một lần"""
+        self.frame_timer.stop()
+        self.settle_timer.stop()
+        self.dirty = False
+        self.background = None
+        self.blit_bbox = None
+        self.canvas.draw_idle()
+
+    def _set_cursor(self, cursor):
+        try:
+            self.canvas.get_tk_widget().configure(cursor=cursor)
+        except AttributeError:
+            pass  # Ignore nếu không phải tkinter backend
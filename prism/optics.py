@@ -0,0 +1,264 @@
+"""Hệ quang học nhiều phần tử: lăng kính, bản mặt song song và gương ở vị trí bất kỳ
+
+Trạng thái chùm tia nằm trong một mảng NumPy có cấu trúc (``RAY_DTYPE``: vị
+trí, hướng, bước sóng, cường độ, cờ còn sống) thay vì các dict theo từng tia.
+``OpticalSystem.trace`` cho chùm tia đi lần lượt qua từng phần tử và cập nhật
+mảng tại chỗ. Tia được xử lý theo các chunk kích thước cố định nên bộ nhớ tạm
+không phụ thuộc tổng số tia.
+
+Đo thông lượng::
+
+    python -m prism.optics --rays 1000000 --elements 20
+"""
+import argparse
+import math
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+
+import numpy as np
+
+from prism import raytrace
+from prism.dispersion import REFERENCE_WAVELENGTH, CauchyModel
+
+# Trạng thái một tia
+RAY_DTYPE = np.dtype([
+    ('pos', 'f8', (2,)),        # Vị trí
+    ('dir', 'f8', (2,)),        # Hướng (vector đơn vị)
+    ('wavelength', 'f8'),       # Bước sóng (nm)
+    ('intensity', 'f8'),        # Cường độ tương đối
+    ('alive', '?'),             # False khi tia bị kẹt trong phần tử
+])
+
+# Số tia mỗi chunk khi dò (vừa cache, nhanh nhất khi đo)
+CHUNK_SIZE = 1 << 13
+
+
+def make_rays(origins, directions, wavelengths=REFERENCE_WAVELENGTH, intensity=1.0):
+    """Tạo mảng tia ``RAY_DTYPE`` (các tham số được broadcast theo số tia)"""
+    origins = np.atleast_2d(np.asarray(origins, dtype=float))
+    directions = np.atleast_2d(np.asarray(directions, dtype=float))
+    count = max(len(origins), len(directions), np.size(wavelengths))
+
+    rays = np.empty(count, dtype=RAY_DTYPE)
+    rays['pos'] = origins
+    rays['dir'] = directions / np.hypot(directions[:, 0], directions[:, 1])[:, None]
+    rays['wavelength'] = wavelengths
+    rays['intensity'] = intensity
+    rays['alive'] = True
+    return rays
+
+
+def _place(points, x, y, rotation):
+    """Xoay (độ, quanh gốc cục bộ) rồi tịnh tiến các điểm cục bộ tới (x, y)"""
+    c, s = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+    return np.asarray(points, dtype=float) @ np.array([[c, s], [-s, c]]) + (x, y)
+
+
+@dataclass(frozen=True)
+class _Refractor:
+    """Phần tử khúc xạ dạng đa giác lồi; lớp con định nghĩa ``local_vertices``"""
+
+    def vertices(self):
+        """Các đỉnh trong hệ tọa độ chung (ngược chiều kim đồng hồ)"""
+        return _place(self.local_vertices(), self.x, self.y, self.rotation)
+
+    def interact(self, rays, n_medium, max_bounces, buffers=None):
+        """Cho các tia còn sống đi qua phần tử (cập nhật ``rays`` tại chỗ)
+
+        ``buffers`` (``raytrace.trace_buffers``, đủ chỗ cho ``len(rays)`` tia)
+        nhận kết quả dò thay cho các mảng cấp phát mới ở mỗi lần gọi.
+        """
+        index = np.flatnonzero(rays['alive'])
+        if index.size == 0:
+            return
+        n_inside = self.glass.index(rays['wavelength'][index], n_ref=self.n_ref)
+        trace = raytrace.trace_rays(self.vertices(), rays['pos'][index], rays['dir'][index],
+                                    n_medium, n_inside, max_bounces=max_bounces,
+                                    escape_length=0.0, record_paths=False, out=buffers)
+        # Tia không chạm phần tử giữ nguyên vị trí và hướng
+        rays['pos'][index] = trace.positions
+        rays['dir'][index] = trace.directions
+        rays['intensity'][index] *= trace.transmission
+        rays['alive'][index] = trace.escaped
+
+
+@dataclass(frozen=True)
+class Prism(_Refractor):
+    """Lăng kính cân góc đỉnh ``A``; ở ``rotation = 0`` đáy nằm ngang, đỉnh hướng lên"""
+    A: float = 60.0
+    height: float = 1.5
+    x: float = 0.0
+    y: float = 0.0
+    rotation: float = 0.0
+    glass: CauchyModel = CauchyModel()
+    n_ref: float = None     # Neo n(λ_d) (None = dùng nguyên mô hình)
+
+    def local_vertices(self):
+        return raytrace.prism_vertices(self.A, self.height)
+
+
+@dataclass(frozen=True)
+class Plate(_Refractor):
+    """Bản mặt song song dày ``thickness``, dài ``length`` (nằm ngang khi ``rotation = 0``)"""
+    thickness: float = 0.3
+    length: float = 2.0
+    x: float = 0.0
+    y: float = 0.0
+    rotation: float = 0.0
+    glass: CauchyModel = CauchyModel()
+    n_ref: float = None
+
+    def local_vertices(self):
+        half_l, half_t = self.length / 2, self.thickness / 2
+        return [[-half_l, -half_t], [half_l, -half_t], [half_l, half_t], [-half_l, half_t]]
+
+
+@dataclass(frozen=True)
+class Mirror:
+    """Gương phẳng hai mặt dài ``length`` (thẳng đứng khi ``rotation = 0``)"""
+    length: float = 2.0
+    x: float = 0.0
+    y: float = 0.0
+    rotation: float = 0.0
+    reflectivity: float = 1.0
+
+    def vertices(self):
+        half = self.length / 2
+        return _place([[0.0, -half], [0.0, half]], self.x, self.y, self.rotation)
+
+    def interact(self, rays, n_medium, max_bounces, buffers=None):
+        """Phản xạ các tia còn sống chạm gương (cập nhật ``rays`` tại chỗ)"""
+        index = np.flatnonzero(rays['alive'])
+        start, end = self.vertices()
+        edge = end - start
+        pos = rays['pos'][index]
+        dirs = rays['dir'][index]
+
+        rel = start - pos
+        denom = dirs[:, 0] * edge[1] - dirs[:, 1] * edge[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (rel[:, 0] * edge[1] - rel[:, 1] * edge[0]) / denom
+            s = (rel[:, 0] * dirs[:, 1] - rel[:, 1] * dirs[:, 0]) / denom
+        hit = (t > 0) & (s >= 0) & (s <= 1)
+        index, t = index[hit], t[hit]
+        dirs = dirs[hit]
+
+        normal = np.array([edge[1], -edge[0]]) / math.hypot(*edge)
+        rays['pos'][index] = pos[hit] + t[:, None] * dirs
+        rays['dir'][index] = dirs - 2 * (dirs @ normal)[:, None] * normal
+        rays['intensity'][index] *= self.reflectivity
+
+
+class OpticalSystem:
+    """Chuỗi phần tử quang học mà tia đi qua theo thứ tự"""
+
+    def __init__(self, elements, n_medium=1.0, max_bounces=10, chunk_size=CHUNK_SIZE):
+        self.elements = list(elements)
+        self.n_medium = n_medium
+        self.max_bounces = max_bounces
+        self.chunk_size = chunk_size
+        self.last_stats = None
+
+    def trace(self, rays):
+        """Dò ``rays`` (``RAY_DTYPE``) qua mọi phần tử, cập nhật tại chỗ và trả về ``rays``
+
+        Mỗi chunk đi hết chuỗi phần tử trước khi sang chunk sau, nên bộ nhớ tạm
+        chỉ phụ thuộc ``chunk_size``. Bộ đệm kết quả dò được cấp phát một lần
+        cho cả lượt và dùng lại cho mọi chunk x phần tử. Thống kê thông lượng
+        nằm trong ``last_stats``.
+        """
+        start = time.perf_counter()
+        buffers = raytrace.trace_buffers(min(self.chunk_size, len(rays)), self.max_bounces)
+        for begin in range(0, len(rays), self.chunk_size):
+            chunk = rays[begin:begin + self.chunk_size]
+            for element in self.elements:
+                element.interact(chunk, self.n_medium, self.max_bounces, buffers)
+        elapsed = time.perf_counter() - start
+
+        interactions = len(rays) * len(self.elements)
+        self.last_stats = {
+            "rays": len(rays),
+            "elements": len(self.elements),
+            "seconds": elapsed,
+            "ns_per_ray_element": 1e9 * elapsed / interactions if interactions else 0.0,
+            "ray_elements_per_s": interactions / elapsed if elapsed > 0 else float('inf'),
+        }
+        return rays
+
+
+def demo_train(count=20, spacing=3.0, n_design=1.5):
+    """Chuỗi ``count`` phần tử đặt nối tiếp dọc theo tia chính
+
+    Mỗi phần tử được đặt cách điểm ra của phần tử trước ``spacing`` theo hướng
+    tia chính: lăng kính ở góc lệch cực tiểu (với ``n_design``), bản mặt nghiêng
+    20° và cứ 4 phần tử lại có một gương 45°.
+    """
+    elements = []
+    pos, angle = np.zeros(2), 0.0
+    for i in range(count):
+        direction = raytrace.unit_vectors(angle)
+        target = pos + spacing * direction
+        kind = i % 4
+        if kind == 3:
+            element = Mirror(length=4.0, x=target[0], y=target[1], rotation=angle + 45)
+        elif kind == 1:
+            element = Plate(thickness=0.4, length=4.0, x=target[0], y=target[1],
+                            rotation=angle - 70)
+        else:
+            # Tia chính đi vào giữa mặt trái với góc tới cho góc lệch cực tiểu
+            A, height = 60.0, 3.0
+            theta1 = math.degrees(math.asin(n_design * math.sin(math.radians(A / 2))))
+            rotation = angle - theta1 + A / 2
+            left, _, apex = raytrace.prism_vertices(A, height)
+            offset = _place([(left + apex) / 2], 0.0, 0.0, rotation)[0]
+            element = Prism(A=A, height=height, x=target[0] - offset[0],
+                            y=target[1] - offset[1], rotation=rotation, n_ref=n_design)
+        elements.append(element)
+
+        chief = make_rays(target - direction, direction)
+        element.interact(chief, 1.0, 10)
+        pos = chief['pos'][0]
+        angle = math.degrees(math.atan2(chief['dir'][0, 1], chief['dir'][0, 0]))
+    return OpticalSystem(elements)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Do thong luong do tia qua he quang hoc nhieu phan tu")
+    parser.add_argument('--rays', type=float, default=1e6)
+    parser.add_argument('--elements', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--memory', action='store_true',
+                        help="do them bo nho tam toi da (chay lai mot lan voi tracemalloc)")
+    args = parser.parse_args(argv)
+
+    count = int(args.rays)
+    system = demo_train(args.elements)
+    system.chunk_size = args.chunk_size
+    origins, directions = raytrace.parallel_beam((0.0, 0.0), 0.0, 0.5, count)
+    wavelengths = np.linspace(400.0, 700.0, count)
+    rays = make_rays(origins, directions, wavelengths)
+    system.trace(rays)
+    stats = system.last_stats
+    alive = rays['alive']
+    print(f"{stats['rays']:,} tia x {stats['elements']} phan tu: {stats['seconds']:.2f}s, "
+          f"{stats['ns_per_ray_element']:.0f} ns/tia/phan tu "
+          f"({stats['ray_elements_per_s'] / 1e6:.1f} trieu tia-phan tu/s)")
+    print(f"Tia con song: {alive.mean():.1%}, cuong do trung binh: "
+          f"{rays['intensity'][alive].mean() if alive.any() else 0:.3f}")
+
+    if args.memory:
+        # tracemalloc làm chậm việc dò nên chỉ đo ở lượt riêng
+        rays = make_rays(origins, directions, wavelengths)
+        tracemalloc.start()
+        system.trace(rays)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"Bo nho tam toi da: {peak / 2**20:.1f} MB (mang tia: {rays.nbytes / 2**20:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""Lõi vật lý dạng mảng (NumPy) cho tia sáng qua lăng kính
+
+``solve_prism_batch`` giải hàng triệu bộ (n1, n2, θ1, A) trong một lần gọi.
+``snell_law`` và ``prism_ray`` là giao diện một tia: cùng thứ tự phép tính và
+cùng các ufunc ``np.sin``/``np.arcsin`` gọi trên số thực (không qua bộ đệm,
+broadcast hay chia luồng), nên kết quả vô hướng và kết quả mảng trùng khớp
+từng bit mà mỗi lần gọi chỉ mất vài micro giây.
+"""
+import math
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Mã trạng thái cho từng tia
+RAY_OK = 0
+RAY_TIR_ENTRY = 1   # Phản xạ toàn phần tại mặt vào
+RAY_NO_EXIT = 2     # Tia không đến mặt ra
+RAY_TIR_EXIT = 3    # Phản xạ toàn phần tại mặt ra
+
+STATUS_MESSAGES = {
+    RAY_TIR_ENTRY: "Phản xạ toàn phần tại mặt vào",
+    RAY_NO_EXIT: "Tia không đến mặt ra",
+    RAY_TIR_EXIT: "Phản xạ toàn phần tại mặt ra",
+}
+
+# Số tia xử lý mỗi lượt - đủ nhỏ để các mảng tạm nằm trong cache
+CHUNK_SIZE = 1 << 14
+
+# Bảng tra 0 -> 0.0, 1 -> NaN dùng để "đánh dấu" tia bị chặn
+_NAN_WHERE = np.array([0.0, np.nan])
+
+PrismRays = namedtuple('PrismRays', ['r1', 'r2', 'theta2', 'delta', 'status'])
+PrismRays.__doc__ = """Kết quả giải nhiều tia (góc tính bằng độ, NaN khi tia bị chặn)"""
+
+
+def _snell_into(ratio, theta_in, out, tir, scratch):
+    """Kernel Snell ghi thẳng vào ``out``/``tir`` (không cấp phát mảng mới)"""
+    np.absolute(theta_in, out=out)
+    np.radians(out, out=out)
+    np.sin(out, out=out)
+    np.multiply(ratio, out, out=out)
+
+    # Phản xạ toàn phần khi |sin| > 1 (arcsin trả về NaN ở các tia này)
+    np.absolute(out, out=scratch)
+    np.greater(scratch, 1, out=tir)
+
+    np.arcsin(out, out=out)
+    np.degrees(out, out=out)
+
+    # Giữ dấu của góc tới
+    np.copysign(out, theta_in, out=out)
+
+
+# np.radians/np.degrees là phép nhân với đúng các hằng số này
+_RADIANS = math.pi / 180.0
+_DEGREES = 180.0 / math.pi
+
+
+def _snell_scalar(ratio, theta_in):
+    """``_snell_into`` cho một tia (số thực); trả về ``(theta_out, tir)``"""
+    sine = ratio * float(np.sin(abs(theta_in) * _RADIANS))
+    if abs(sine) > 1:
+        return math.nan, True
+    return math.copysign(float(np.arcsin(sine)) * _DEGREES, theta_in), False
+
+
+def _solve_scalar(n1, n2, theta1, A):
+    """Giải một tia theo đúng các bước của ``_solve_range``; trả về ``(r1, r2, theta2, delta, status)``"""
+    nan = math.nan
+    r1, tir = _snell_scalar(n1 / n2, theta1)
+    if tir:
+        return nan, nan, nan, nan, RAY_TIR_ENTRY
+    r2 = A - r1
+    if r2 < 0:
+        return r1, r2, nan, nan, RAY_NO_EXIT
+    # 0.0 + r2 như phép cộng mặt nạ NaN của bản mảng (chuẩn hóa -0.0)
+    theta2, tir = _snell_scalar(n2 / n1, 0.0 + r2)
+    if tir:
+        return r1, r2, nan, nan, RAY_TIR_EXIT
+    return r1, r2, theta2, theta1 + theta2 - A, RAY_OK
+
+
+def _as_flat(values, shape):
+    """Trả về số thực (nếu chỉ có 1 phần tử) hoặc mảng 1 chiều đã broadcast"""
+    values = np.asarray(values, dtype=float)
+    if values.size == 1:
+        return values.reshape(())
+    return np.broadcast_to(values, shape).reshape(-1)
+
+
+def _chunk(values, start, stop):
+    return values if values.ndim == 0 else values[start:stop]
+
+
+def snell_law_batch(n1, n2, theta1):
+    """Định luật Snell cho mảng góc tới (độ)
+
+    Trả về ``(theta2, tir)``: ``theta2`` là NaN ở những tia phản xạ toàn phần,
+    ``tir`` là mặt nạ bool của các tia đó.
+    """
+    n1, n2, theta1 = np.broadcast_arrays(
+        np.asarray(n1, dtype=float), np.asarray(n2, dtype=float),
+        np.asarray(theta1, dtype=float))
+
+    theta2 = np.empty(theta1.shape)
+    tir = np.empty(theta1.shape, dtype=bool)
+    with np.errstate(invalid='ignore'):
+        _snell_into(n1 / n2, theta1, theta2, tir, np.empty(theta1.shape))
+    return theta2, tir
+
+
+def _solve_range(inputs, outputs, begin, end):
+    """Giải các tia trong đoạn [begin, end) theo từng lượt ``CHUNK_SIZE`` tia"""
+    n1, n2, theta1, A = inputs
+    r1, r2, theta2, delta, status = outputs
+
+    # Bộ đệm tạm dùng lại cho mọi lượt
+    chunk = min(end - begin, CHUNK_SIZE)
+    ratio = np.empty(chunk)
+    scratch = np.empty(chunk)
+    r2_in = np.empty(chunk)
+    tir_entry = np.empty(chunk, dtype=bool)
+    tir_exit = np.empty(chunk, dtype=bool)
+    no_exit = np.empty(chunk, dtype=bool)
+    flag = np.empty(chunk, dtype=np.int8)
+
+    with np.errstate(invalid='ignore'):
+        for start in range(begin, end, CHUNK_SIZE):
+            stop = min(start + CHUNK_SIZE, end)
+            m = stop - start
+            n1_c, n2_c = _chunk(n1, start, stop), _chunk(n2, start, stop)
+            theta1_c, A_c = _chunk(theta1, start, stop), _chunk(A, start, stop)
+            r1_c, r2_c = r1[start:stop], r2[start:stop]
+            theta2_c, delta_c = theta2[start:stop], delta[start:stop]
+            status_c = status[start:stop]
+
+            # Bước 1: Khúc xạ tại mặt vào
+            np.divide(n1_c, n2_c, out=ratio[:m])
+            _snell_into(ratio[:m], theta1_c, r1_c, tir_entry[:m], scratch[:m])
+
+            # Bước 2: Góc tới tại mặt ra (r1 là NaN ở các tia phản xạ tại mặt
+            # vào, và NaN < 0 là False nên chúng không bị đếm lại)
+            np.subtract(A_c, r1_c, out=r2_c)
+            np.less(r2_c, 0, out=no_exit[:m])
+
+            # Tia không đến mặt ra được đưa vào bước 3 dưới dạng NaN, nhờ đó
+            # theta2/delta tự thành NaN mà không cần gán theo mặt nạ (chậm)
+            _NAN_WHERE.take(no_exit[:m].view(np.uint8), out=r2_in[:m])
+            np.add(r2_in[:m], r2_c, out=r2_in[:m])
+
+            # Bước 3: Khúc xạ tại mặt ra
+            np.divide(n2_c, n1_c, out=ratio[:m])
+            _snell_into(ratio[:m], r2_in[:m], theta2_c, tir_exit[:m], scratch[:m])
+
+            # Bước 4: Góc lệch
+            np.add(theta1_c, theta2_c, out=delta_c)
+            np.subtract(delta_c, A_c, out=delta_c)
+
+            # Ba mặt nạ loại trừ nhau nên mã trạng thái là tổng có trọng số
+            np.multiply(no_exit[:m].view(np.int8), RAY_NO_EXIT, out=status_c)
+            np.multiply(tir_exit[:m].view(np.int8), RAY_TIR_EXIT, out=flag[:m])
+            np.add(status_c, flag[:m], out=status_c)
+            np.multiply(tir_entry[:m].view(np.int8), RAY_TIR_ENTRY, out=flag[:m])
+            np.add(status_c, flag[:m], out=status_c)
+
+
+def solve_prism_batch(n1, n2, theta1, A, workers=None):
+    """Giải đường đi của nhiều tia qua lăng kính cùng lúc
+
+    ``n1``, ``n2``, ``theta1`` và ``A`` (độ) là số hoặc mảng broadcast được với
+    nhau. Kết quả là ``PrismRays`` với các mảng cùng shape; ``status`` nhận các
+    giá trị ``RAY_*``.
+
+    Các ufunc của NumPy nhả GIL nên mảng lớn được chia cho ``workers`` luồng
+    (mặc định: số nhân CPU). Mỗi tia luôn đi qua cùng một kernel, vì vậy kết
+    quả không phụ thuộc vào cách chia.
+    """
+    if all(np.ndim(v) == 0 for v in (n1, n2, theta1, A)):
+        # Một tia: bỏ qua broadcast, bộ đệm tạm và chia luồng
+        r1, r2, theta2, delta, status = _solve_scalar(float(n1), float(n2), float(theta1), float(A))
+        return PrismRays(np.array(r1), np.array(r2), np.array(theta2), np.array(delta),
+                         np.array(status, dtype=np.int8))
+
+    shape = np.broadcast_shapes(np.shape(n1), np.shape(n2),
+                                np.shape(theta1), np.shape(A))
+    size = int(np.prod(shape))
+    inputs = tuple(_as_flat(v, shape) for v in (n1, n2, theta1, A))
+    outputs = (np.empty(size), np.empty(size), np.empty(size), np.empty(size),
+               np.empty(size, dtype=np.int8))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Không chia nhỏ hơn vài lượt mỗi luồng - chi phí luồng sẽ lấn át
+    workers = max(1, min(workers, size // (4 * CHUNK_SIZE)))
+
+    if workers == 1:
+        _solve_range(inputs, outputs, 0, size)
+    else:
+        bounds = np.linspace(0, size, workers + 1).astype(int)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs = [pool.submit(_solve_range, inputs, outputs, begin, end)
+                    for begin, end in zip(bounds[:-1], bounds[1:])]
+            for job in jobs:
+                job.result()
+
+    return PrismRays(*(values.reshape(shape) for values in outputs))
+
+
+def snell_law(n1, n2, theta1):
+    """Định luật Snell cho một tia (độ); trả về None khi phản xạ toàn phần"""
+    theta2, tir = _snell_scalar(float(n1) / float(n2), float(theta1))
+    if tir:
+        return None
+    return theta2
+
+
+def prism_ray(n1, n2, theta1, A):
+    """Tính toán một tia qua lăng kính, trả về dict như ``calculate_prism_ray``"""
+    r1, r2, theta2, delta, status = _solve_scalar(float(n1), float(n2), float(theta1), float(A))
+    if status != RAY_OK:
+        return {"error": STATUS_MESSAGES[status]}
+
+    return {
+        "theta1": theta1,       # Góc tới
+        "r1": r1,               # Góc khúc xạ tại mặt vào
+        "r2": r2,               # Góc tới tại mặt ra
+        "theta2": theta2,       # Góc ra
+        "delta": delta          # Góc lệch
+    }
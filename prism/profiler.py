@@ -0,0 +1,155 @@
+"""Đo thời gian từng giai đoạn của một khung hình
+
+``FrameProfiler.stage(name)`` là context manager bao quanh một giai đoạn
+(``draw_prism``, ``draw_single_ray``, vẽ canvas...). Khi profiler tắt, nó trả
+về một context rỗng dùng chung nên gần như không tốn chi phí. Khi bật, mỗi
+giai đoạn được ghi vào:
+
+- cửa sổ trượt ``window`` lần đo gần nhất cho từng giai đoạn (để hiển thị
+  overlay FPS/ms trên canvas);
+- dòng thời gian các sự kiện, xuất được ra file JSON định dạng Chrome Trace
+  Event (mở bằng chrome://tracing hoặc https://ui.perfetto.dev).
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+# Context rỗng dùng chung khi profiler tắt
+_NULL = nullcontext()
+
+
+class _Stage:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class FrameProfiler:
+    """Thống kê thời gian theo giai đoạn + dòng thời gian để xuất trace"""
+
+    # Các giai đoạn đánh dấu kết thúc một khung hình (dùng để tính FPS)
+    frame_stages = ('canvas.draw', 'blit')
+
+    def __init__(self, window=120, max_events=200_000):
+        self.enabled = False
+        self.window = window
+        self.stats = {}
+        self.events = deque(maxlen=max_events)
+        self.frame_times = deque(maxlen=window)
+        self._origin = time.perf_counter()
+        self.overlay = None
+
+    def stage(self, name):
+        """Context manager đo giai đoạn ``name`` (không làm gì khi profiler tắt)"""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def record(self, name, start, end):
+        """Ghi một lần đo (giây, theo ``time.perf_counter``)"""
+        samples = self.stats.get(name)
+        if samples is None:
+            samples = self.stats[name] = deque(maxlen=self.window)
+        samples.append((end - start) * 1000)
+        self.events.append((name, start, end, threading.get_ident()))
+        if name in self.frame_stages:
+            self.frame_times.append(end)
+
+    def wrap(self, name, func):
+        """Bọc ``func`` để mỗi lần gọi được đo như giai đoạn ``name``"""
+        def wrapper(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def instrument_canvas(self, canvas):
+        """Đo mọi lần vẽ đầy đủ canvas (kể cả ``draw_idle`` của backend)"""
+        canvas.draw = self.wrap('canvas.draw', canvas.draw)
+
+    def reset(self):
+        self.stats.clear()
+        self.events.clear()
+        self.frame_times.clear()
+
+    def fps(self):
+        """Số khung hình/giây trong cửa sổ gần nhất"""
+        if len(self.frame_times) < 2:
+            return 0.0
+        span = self.frame_times[-1] - self.frame_times[0]
+        return (len(self.frame_times) - 1) / span if span > 0 else 0.0
+
+    def summary(self):
+        """``{giai đoạn: {"mean_ms", "median_ms", "max_ms", "count"}}`` trong cửa sổ"""
+        result = {}
+        for name, samples in self.stats.items():
+            values = np.fromiter(samples, dtype=float)
+            result[name] = {
+                "mean_ms": float(values.mean()),
+                "median_ms": float(np.median(values)),
+                "max_ms": float(values.max()),
+                "count": len(values),
+            }
+        return result
+
+    # ------------------------------------------------------------------
+    # Overlay trên canvas
+    # ------------------------------------------------------------------
+    def attach_overlay(self, fig):
+        """Tạo (ẩn) ô chữ overlay ở góc trên bên trái figure"""
+        self.overlay = fig.text(0.005, 0.995, '', ha='left', va='top', fontsize=8,
+                                family='monospace', color='lime', zorder=10,
+                                bbox=dict(boxstyle="round", facecolor="black", alpha=0.6))
+        self.overlay.set_visible(False)
+        return self.overlay
+
+    def update_overlay(self):
+        """Cập nhật nội dung overlay theo thống kê hiện tại"""
+        if self.overlay is None:
+            return
+        self.overlay.set_visible(self.enabled)
+        if not self.enabled:
+            return
+        lines = [f"FPS {self.fps():5.1f}"]
+        for name, stat in self.summary().items():
+            lines.append(f"{name:22s} {stat['median_ms']:7.2f} ms (max {stat['max_ms']:.1f})")
+        self.overlay.set_text('\n'.join(lines))
+
+    # ------------------------------------------------------------------
+    # Xuất trace
+    # ------------------------------------------------------------------
+    def chrome_trace(self):
+        """Dòng thời gian dạng Chrome Trace Event (dict)"""
+        pid = os.getpid()
+        events = [{
+            "name": name,
+            "cat": name.split('.')[0],
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": pid,
+            "tid": tid,
+        } for name, start, end, tid in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_trace(self, path):
+        """Ghi dòng thời gian ra ``path`` (JSON), trả về số sự kiện"""
+        trace = self.chrome_trace()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(trace, f)
+        return len(trace["traceEvents"])
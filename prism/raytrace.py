@@ -0,0 +1,252 @@
+"""Dò tia hình học 2D chính xác qua lăng kính (đa giác lồi)
+
+Mỗi tia được giao với các cạnh của đa giác, khúc xạ theo định luật Snell dạng
+vector hoặc phản xạ toàn phần, rồi tiếp tục cho đến khi thoát ra ngoài hoặc đạt
+giới hạn số lần va chạm. Mọi phép tính thực hiện trên mảng cho cả chùm tia cùng
+lúc - không có vòng lặp Python theo từng tia.
+"""
+import math
+from collections import namedtuple
+
+import numpy as np
+
+TraceResult = namedtuple('TraceResult', [
+    'points',       # (N, max_bounces + 2, 2) các điểm của đường đi, phần thừa là NaN
+                    # (None khi không ghi đường đi)
+    'counts',       # (N,) số điểm hợp lệ của mỗi tia
+    'faces',        # (N, max_bounces + 1) chỉ số cạnh tại mỗi va chạm, phần thừa là -1
+    'positions',    # (N, 2) điểm va chạm cuối cùng (hoặc gốc nếu tia không va chạm)
+    'directions',   # (N, 2) hướng cuối cùng
+    'escaped',      # (N,) True nếu tia đã thoát khỏi lăng kính
+    'reflections',  # (N,) số lần phản xạ (toàn phần hoặc Fresnel)
+    'transmission', # (N,) tỉ lệ năng lượng còn lại trên đường đi (tích các 1 - R)
+])
+TraceResult.__doc__ = """Kết quả dò một chùm tia"""
+
+# Chỉ số cạnh của ``prism_vertices`` (cạnh i nối đỉnh i với đỉnh i+1)
+FACE_BASE = 0
+FACE_EXIT = 1     # Mặt phải
+FACE_ENTRY = 2    # Mặt trái
+
+
+def prism_vertices(A, height=1.5):
+    """3 đỉnh lăng kính cân với đỉnh ở trên (thứ tự ngược chiều kim đồng hồ)"""
+    base_half = height * math.tan(math.radians(A) / 2)
+    return np.array([
+        [-base_half, 0.0],    # Trái dưới
+        [base_half, 0.0],     # Phải dưới
+        [0.0, height],        # Đỉnh trên
+    ])
+
+
+def unit_vectors(angles_deg):
+    """Vector đơn vị (N, 2) theo góc (độ, tính từ trục x)"""
+    angles = np.radians(np.asarray(angles_deg, dtype=float))
+    return np.stack([np.cos(angles), np.sin(angles)], axis=-1)
+
+
+def incident_direction(A, theta1):
+    """Hướng tia tới tạo góc θ₁ với pháp tuyến mặt trái (phía dưới pháp tuyến)
+
+    Pháp tuyến hướng vào trong của mặt trái làm với trục x góc -A/2, nên tia
+    tới có góc θ₁ - A/2; quy ước dấu trùng với ``solve_prism_batch`` (r2 = A - r1).
+    """
+    return unit_vectors(np.asarray(theta1, dtype=float) - np.asarray(A, dtype=float) / 2)
+
+
+def parallel_beam(center, angle_deg, width, count):
+    """Chùm ``count`` tia song song rộng ``width``, đi qua ``center`` theo góc ``angle_deg``"""
+    direction = unit_vectors(angle_deg)
+    across = np.array([-direction[1], direction[0]])
+    offsets = np.linspace(-width / 2, width / 2, count) if count > 1 else np.zeros(1)
+    origins = np.asarray(center, dtype=float) + offsets[:, None] * across
+    return origins, np.broadcast_to(direction, origins.shape).copy()
+
+
+def diverging_beam(origin, angle_deg, spread_deg, count):
+    """Chùm ``count`` tia phân kỳ từ ``origin``, mở rộng ``spread_deg`` quanh ``angle_deg``"""
+    angles = angle_deg + (np.linspace(-spread_deg / 2, spread_deg / 2, count)
+                          if count > 1 else np.zeros(1))
+    directions = unit_vectors(angles)
+    return np.broadcast_to(np.asarray(origin, dtype=float), directions.shape).copy(), directions
+
+
+def _cross(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def fresnel_reflectance(n_from, n_to, cos_i, cos_t):
+    """Hệ số phản xạ Fresnel cho ánh sáng không phân cực (trung bình R_s và R_p)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = (n_from * cos_i - n_to * cos_t) / (n_from * cos_i + n_to * cos_t)
+        rp = (n_from * cos_t - n_to * cos_i) / (n_from * cos_t + n_to * cos_i)
+    return 0.5 * (rs * rs + rp * rp)
+
+
+def trace_buffers(count, max_bounces=10, record_paths=False):
+    """Bộ đệm kết quả cho ``trace_rays(..., out=...)`` đủ cho tối đa ``count`` tia
+
+    Cấp phát một lần rồi dùng lại cho mọi lần dò (ví dụ mọi chunk x mọi phần
+    tử trong ``OpticalSystem.trace``) thay vì mỗi lần gọi lại tạo mảng mới.
+    """
+    return TraceResult(
+        np.empty((count, max_bounces + 2, 2)) if record_paths else None,
+        np.empty(count, dtype=np.int64),
+        np.empty((count, max_bounces + 1), dtype=np.int64),
+        np.empty((count, 2)),
+        np.empty((count, 2)),
+        np.empty(count, dtype=bool),
+        np.empty(count, dtype=np.int64),
+        np.empty(count),
+    )
+
+
+def trace_rays(vertices, origins, directions, n_outside, n_inside,
+               max_bounces=10, escape_length=2.0, rng=None, record_paths=True, out=None):
+    """Dò chùm tia qua đa giác lồi ``vertices`` (ngược chiều kim đồng hồ)
+
+    ``origins``/``directions`` có shape (N, 2) hoặc (2,); ``n_outside`` và
+    ``n_inside`` là số hoặc mảng (N,) (ví dụ chiết suất theo bước sóng). Tia
+    thoát ra được kéo dài thêm ``escape_length`` để vẽ. Mỗi tia có tối đa
+    ``max_bounces`` lần va chạm với mặt lăng kính.
+
+    Khi có ``rng`` (``numpy.random.Generator``), tại mỗi mặt tia bị phản xạ với
+    xác suất bằng hệ số Fresnel R thay vì luôn khúc xạ - mô phỏng Monte Carlo
+    việc chia năng lượng giữa tia phản xạ và tia khúc xạ. Khi không có ``rng``,
+    ``transmission`` nhân thêm 1 - R tại mỗi lần khúc xạ (năng lượng nhánh phản
+    xạ bị bỏ qua). ``record_paths=False``
+    bỏ qua mảng đường đi (tiết kiệm bộ nhớ cho chùm rất lớn).
+
+    ``out`` (kết quả ``trace_buffers`` với cùng ``max_bounces``, đủ chỗ cho N
+    tia) nhận kết quả thay cho các mảng mới; khi đó giá trị trả về là các view
+    độ dài N của ``out``.
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    origins = np.atleast_2d(np.asarray(origins, dtype=float))
+    directions = np.atleast_2d(np.asarray(directions, dtype=float))
+    origins, directions = np.broadcast_arrays(origins, directions)
+    count = len(origins)
+
+    n_outside = np.broadcast_to(np.asarray(n_outside, dtype=float), (count,))
+    n_inside = np.broadcast_to(np.asarray(n_inside, dtype=float), (count,))
+
+    # Cạnh i đi từ vertices[i] tới vertices[i+1]; pháp tuyến hướng ra ngoài
+    edge_start = vertices
+    edge_vec = np.roll(vertices, -1, axis=0) - vertices
+    edge_len = np.hypot(edge_vec[:, 0], edge_vec[:, 1])
+    normals = np.stack([edge_vec[:, 1], -edge_vec[:, 0]], axis=-1) / edge_len[:, None]
+
+    if out is None:
+        out = trace_buffers(count, max_bounces, record_paths)
+    elif out.faces.shape[1] != max_bounces + 1 or (record_paths and out.points is None):
+        raise ValueError("bo dem out khong khop max_bounces/record_paths")
+    points = None
+    if record_paths:
+        points = out.points[:count]
+        points.fill(np.nan)
+        points[:, 0] = origins
+    counts = out.counts[:count]
+    counts.fill(1)
+    faces = out.faces[:count]
+    faces.fill(-1)
+    escaped = out.escaped[:count]
+    escaped.fill(False)
+    reflections = out.reflections[:count]
+    reflections.fill(0)
+    transmission = out.transmission[:count]
+    transmission.fill(1.0)
+    final_dirs = out.directions[:count]
+    np.divide(directions, np.hypot(directions[:, 0], directions[:, 1])[:, None], out=final_dirs)
+    final_pos = out.positions[:count]
+    final_pos[:] = origins
+
+    # Trạng thái của các tia còn đang được dò (nén lại sau mỗi bước)
+    active = np.arange(count)
+    pos = origins.copy()
+    dirs = final_dirs.copy()
+    # Tia có thể bắt đầu bên trong lăng kính (điểm nằm bên trái mọi cạnh)
+    inside = (_cross(edge_vec[None, :, :], pos[:, None, :] - edge_start[None, :, :]) > 0).all(axis=1)
+    last_edge = np.full(count, -1)
+
+    for bounce in range(max_bounces + 1):
+        if active.size == 0:
+            break
+
+        # Giao tia với từng cạnh: pos + t*dirs = edge_start + s*edge_vec, giữ t nhỏ nhất
+        t_hit = np.full(active.size, np.inf)
+        edge = np.full(active.size, -1)
+        for e, ((ax, ay), (ex, ey)) in enumerate(zip(edge_start, edge_vec)):
+            rx = ax - pos[:, 0]
+            ry = ay - pos[:, 1]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                denom = dirs[:, 0] * ey - dirs[:, 1] * ex
+                t = (rx * ey - ry * ex) / denom
+                s = (rx * dirs[:, 1] - ry * dirs[:, 0]) / denom
+            # Đa giác lồi: tia không thể gặp lại chính cạnh vừa rời đi
+            closer = (t > 0) & (s >= 0) & (s <= 1) & (t < t_hit) & (last_edge != e)
+            t_hit[closer] = t[closer]
+            edge[closer] = e
+        hit = edge >= 0
+
+        if bounce == max_bounces:
+            # Hết lượt: tia chưa thoát dừng lại ở điểm va chạm cuối cùng
+            hit[:] = False
+            leaving = ~inside
+        else:
+            leaving = ~hit
+
+        # Tia thoát: kéo dài thêm escape_length để vẽ
+        done = ~hit
+        if done.any():
+            rays = active[done]
+            exits = leaving[done]
+            if record_paths:
+                ends = pos[done][exits] + escape_length * dirs[done][exits]
+                points[rays[exits], counts[rays[exits]]] = ends
+            counts[rays[exits]] += 1
+            escaped[rays] = exits & ~inside[done]
+            final_pos[rays] = pos[done]
+            final_dirs[rays] = dirs[done]
+
+        # Tia va chạm: ghi điểm, rồi khúc xạ hoặc phản xạ
+        rays = active[hit]
+        pos = pos[hit] + t_hit[hit, None] * dirs[hit]
+        dirs = dirs[hit]
+        edge = edge[hit]
+        inside = inside[hit]
+        if record_paths:
+            points[rays, counts[rays]] = pos
+        faces[rays, bounce] = edge
+        counts[rays] += 1
+
+        normal = normals[edge]
+        cos_out = np.einsum('ij,ij->i', dirs, normal)
+        # Pháp tuyến quay về phía tia tới
+        facing = np.where(cos_out > 0, -1.0, 1.0)[:, None] * normal
+        cos_i = np.abs(cos_out)
+
+        n_from = np.where(inside, n_inside[rays], n_outside[rays])
+        n_to = np.where(inside, n_outside[rays], n_inside[rays])
+        eta = n_from / n_to
+        k = 1 - eta ** 2 * (1 - cos_i ** 2)
+        reflect = k < 0   # Phản xạ toàn phần
+        cos_t = np.sqrt(np.maximum(k, 0))
+        reflectance = fresnel_reflectance(n_from, n_to, cos_i, cos_t)
+        if rng is not None:
+            # Phản xạ một phần: chọn nhánh phản xạ với xác suất R
+            reflect |= rng.random(rays.size) < reflectance
+        else:
+            transmission[rays] *= np.where(reflect, 1.0, 1.0 - reflectance)
+
+        refracted = eta[:, None] * dirs + (eta * cos_i - cos_t)[:, None] * facing
+        reflected = dirs + 2 * cos_i[:, None] * facing
+        dirs = np.where(reflect[:, None], reflected, refracted)
+        dirs /= np.hypot(dirs[:, 0], dirs[:, 1])[:, None]
+
+        inside = np.where(reflect, inside, ~inside)
+        reflections[rays] += reflect
+        last_edge = edge
+        active = rays
+
+    return TraceResult(points, counts, faces, final_pos, final_dirs, escaped, reflections,
+                       transmission)
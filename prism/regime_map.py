@@ -0,0 +1,437 @@
+"""Bản đồ chế độ tia trên không gian tham số (θ₁, A, n₁, n₂)
+
+``sample_grid`` giải ``solve_prism_batch`` trên lưới tích Descartes 2D/3D bất kỳ.
+``RegimeMap`` chia mặt phẳng hai tham số thành kim tự tháp tile (mức ``L`` có
+2^L x 2^L tile, mỗi tile ``tile_size`` x ``tile_size`` điểm): chỉ các tile
+nằm trong khung nhìn, ở mức đủ mịn cho số pixel hiển thị, được tính - song song
+trên một thread pool (các ufunc của NumPy nhả GIL) - và giữ trong LRU cache.
+Trong lúc tile mịn đang tính, vùng đó được lấp bằng tile thô hơn đã có sẵn.
+
+``RegimeMapView`` vẽ heatmap δ, tô các vùng phản xạ toàn phần tại mặt vào/mặt
+ra và "tia không đến mặt ra" kèm đường biên, và tự tinh chỉnh khi khung nhìn
+thay đổi (zoom/pan bằng ``AxesNavigator``)::
+
+    python -m prism.regime_map --n2 1.5 --size 4096 -o map.png
+    python -m prism.regime_map --x theta1 --y n2 --A 60 --show
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from prism import physics
+
+# Tham số của solve_prism_batch và miền mặc định khi làm trục bản đồ
+PARAMS = ('n1', 'n2', 'theta1', 'A')
+DEFAULT_RANGES = {'theta1': (0.0, 90.0), 'A': (0.0, 90.0), 'n1': (1.0, 2.5), 'n2': (1.0, 2.5)}
+DEFAULT_VALUES = {'n1': 1.0, 'n2': 1.5, 'theta1': 45.0, 'A': 60.0}
+SYMBOLS = {'theta1': 'θ₁', 'A': 'A', 'n1': 'n₁', 'n2': 'n₂'}
+AXIS_LABELS = {'theta1': 'Góc tới θ₁ (°)', 'A': 'Góc lăng kính A (°)',
+               'n1': 'n₁ (môi trường)', 'n2': 'n₂ (lăng kính)'}
+
+# Màu (RGBA) tô các vùng tia bị chặn
+REGIME_COLORS = {
+    physics.RAY_TIR_ENTRY: (1.0, 0.30, 0.43, 0.55),
+    physics.RAY_NO_EXIT: (0.55, 0.55, 0.60, 0.55),
+    physics.RAY_TIR_EXIT: (1.0, 0.65, 0.15, 0.55),
+}
+# Mã trạng thái của vùng chưa tính
+STATUS_UNKNOWN = -1
+
+Tile = namedtuple('Tile', ['delta', 'status'])
+Tile.__doc__ = """Kết quả một tile: δ (float32, NaN khi tia bị chặn) và mã RAY_* (int8)"""
+
+MapRegion = namedtuple('MapRegion', ['delta', 'status', 'extent', 'level', 'complete'])
+MapRegion.__doc__ = """Ảnh ghép các tile phủ khung nhìn
+
+``extent`` = (xmin, xmax, ymin, ymax) theo kiểu ``imshow(origin='lower')``;
+``complete`` là False khi còn tile đang tính (vùng đó tạm lấy từ tile thô hơn).
+"""
+
+
+def sample_grid(workers=None, **params):
+    """Giải trên lưới tích Descartes của các tham số ``n1, n2, theta1, A``
+
+    Mỗi tham số là số hoặc mảng 1 chiều; các mảng lần lượt chiếm các trục của
+    kết quả theo thứ tự truyền vào, ví dụ ``sample_grid(n2=n2, A=a, theta1=t,
+    n1=1.0)`` cho ``PrismRays`` shape ``(len(n2), len(a), len(t))``.
+    """
+    missing = [name for name in PARAMS if name not in params]
+    if missing:
+        raise TypeError(f"thieu tham so: {', '.join(missing)}")
+    axes = [name for name, value in params.items() if np.ndim(value) == 1]
+    values = {}
+    for name in PARAMS:
+        value = np.asarray(params[name], dtype=float)
+        if value.ndim == 1:
+            shape = [1] * len(axes)
+            shape[axes.index(name)] = -1
+            value = value.reshape(shape)
+        values[name] = value
+    return physics.solve_prism_batch(values['n1'], values['n2'], values['theta1'],
+                                     values['A'], workers=workers)
+
+
+class RegimeMap:
+    """Kim tự tháp tile của δ và mã trạng thái trên mặt phẳng (``x``, ``y``)"""
+
+    def __init__(self, x='theta1', y='A', xrange=None, yrange=None, fixed=None,
+                 tile_size=256, max_level=10, cache_tiles=400, workers=None):
+        if x not in PARAMS or y not in PARAMS or x == y:
+            raise ValueError(f"truc ban do khong hop le: x={x!r}, y={y!r}")
+        self.x = x
+        self.y = y
+        self.xrange = tuple(xrange or DEFAULT_RANGES[x])
+        self.yrange = tuple(yrange or DEFAULT_RANGES[y])
+        self.fixed = {**DEFAULT_VALUES, **(fixed or {})}
+        self.tile_size = tile_size
+        self.max_level = max_level
+        self.cache_tiles = cache_tiles
+        self.workers = workers or os.cpu_count() or 1
+
+        self._cache = OrderedDict()
+        self._pending = {}
+        self._pool = None
+        # Thống kê
+        self.computed = 0
+        self.hits = 0
+
+    # ------------------------------------------------------------------
+    # Tile
+    # ------------------------------------------------------------------
+    def tile_bounds(self, level, ix, iy):
+        """``(x0, x1, y0, y1)`` của tile"""
+        count = 1 << level
+        (xa, xb), (ya, yb) = self.xrange, self.yrange
+        wx, wy = (xb - xa) / count, (yb - ya) / count
+        return xa + ix * wx, xa + (ix + 1) * wx, ya + iy * wy, ya + (iy + 1) * wy
+
+    def compute_tile(self, key):
+        """Tính tile ``(level, ix, iy)`` (tại tâm các ô, không dùng cache)"""
+        x0, x1, y0, y1 = self.tile_bounds(*key)
+        centers = (np.arange(self.tile_size) + 0.5) / self.tile_size
+        # y là trục 0 (hàng) để khớp imshow
+        axes = {self.y: y0 + (y1 - y0) * centers, self.x: x0 + (x1 - x0) * centers}
+        fixed = {name: value for name, value in self.fixed.items() if name not in axes}
+        rays = sample_grid(workers=1, **axes, **fixed)
+        return Tile(rays.delta.astype(np.float32), rays.status)
+
+    def level_for(self, xlim, ylim, pixels):
+        """Mức thô nhất có ít nhất một điểm mẫu mỗi pixel trên cả hai trục"""
+        level = 0
+        for span, full, count in ((xlim, self.xrange, pixels[0]),
+                                  (ylim, self.yrange, pixels[1])):
+            width = abs(span[1] - span[0])
+            if width <= 0 or count <= 0:
+                continue
+            needed = count * (full[1] - full[0]) / (width * self.tile_size)
+            if needed > 1:
+                level = max(level, math.ceil(math.log2(needed)))
+        return min(level, self.max_level)
+
+    def tiles_for(self, level, xlim, ylim):
+        """Chỉ số ``(ix0, ix1, iy0, iy1)`` (nửa mở) của các tile giao khung nhìn"""
+        count = 1 << level
+
+        def index_range(lim, full):
+            lo, hi = sorted(lim)
+            scale = count / (full[1] - full[0])
+            start = int(np.clip(math.floor((lo - full[0]) * scale), 0, count - 1))
+            stop = int(np.clip(math.ceil((hi - full[0]) * scale), start + 1, count))
+            return start, stop
+
+        return (*index_range(xlim, self.xrange), *index_range(ylim, self.yrange))
+
+    def request(self, keys):
+        """Gửi các tile chưa có và chưa đang tính vào thread pool"""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        for key in keys:
+            if key not in self._cache and key not in self._pending:
+                self._pending[key] = self._pool.submit(self.compute_tile, key)
+
+    def collect(self, wait=False):
+        """Đưa các tile đã tính xong vào cache; trả về số tile còn đang tính"""
+        for key, future in list(self._pending.items()):
+            if wait or future.done():
+                self._store(key, future.result())
+                del self._pending[key]
+        return len(self._pending)
+
+    def _store(self, key, tile):
+        self._cache[key] = tile
+        self.computed += 1
+        while len(self._cache) > self.cache_tiles:
+            # Bỏ tile dùng lâu nhất, nhưng luôn giữ tile mức 0 làm nền
+            oldest = next(k for k in self._cache if k[0] > 0)
+            del self._cache[oldest]
+
+    def get(self, key):
+        """Tile trong cache (None nếu chưa có)"""
+        tile = self._cache.get(key)
+        if tile is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+        return tile
+
+    def _fallback(self, key):
+        """Phần tương ứng của tile tổ tiên gần nhất đã có, phóng to (lân cận gần nhất)"""
+        level, ix, iy = key
+        for up in range(1, level + 1):
+            parent = self._cache.get((level - up, ix >> up, iy >> up))
+            sub = self.tile_size >> up
+            if parent is None or sub == 0:
+                continue
+            mask = (1 << up) - 1
+            ox, oy = (ix & mask) * sub, (iy & mask) * sub
+            factor = 1 << up
+            return Tile(*(np.repeat(np.repeat(values[oy:oy + sub, ox:ox + sub], factor, 0),
+                                    factor, 1) for values in parent))
+        return None
+
+    # ------------------------------------------------------------------
+    # Vùng hiển thị
+    # ------------------------------------------------------------------
+    def region(self, xlim, ylim, pixels, wait=True):
+        """Ảnh ghép các tile phủ khung nhìn ``xlim`` x ``ylim`` hiển thị trên ``pixels``
+
+        ``wait=False`` không chờ tile mới: vùng còn thiếu lấy từ tile thô hơn
+        (hoặc để trống) và ``complete`` là False; gọi lại sau khi ``collect()``.
+        """
+        # Tile gốc luôn có sẵn để làm nền cho các vùng chưa tính
+        if (0, 0, 0) not in self._cache:
+            self._store((0, 0, 0), self.compute_tile((0, 0, 0)))
+
+        level = self.level_for(xlim, ylim, pixels)
+        ix0, ix1, iy0, iy1 = self.tiles_for(level, xlim, ylim)
+        keys = [(level, ix, iy) for iy in range(iy0, iy1) for ix in range(ix0, ix1)]
+        self.request(keys)
+        self.collect(wait=wait)
+
+        size = self.tile_size
+        delta = np.full(((iy1 - iy0) * size, (ix1 - ix0) * size), np.nan, dtype=np.float32)
+        status = np.full(delta.shape, STATUS_UNKNOWN, dtype=np.int8)
+        complete = True
+        for level_, ix, iy in keys:
+            tile = self.get((level_, ix, iy))
+            if tile is None:
+                complete = False
+                tile = self._fallback((level_, ix, iy))
+                if tile is None:
+                    continue
+            rows = slice((iy - iy0) * size, (iy - iy0 + 1) * size)
+            cols = slice((ix - ix0) * size, (ix - ix0 + 1) * size)
+            delta[rows, cols] = tile.delta
+            status[rows, cols] = tile.status
+
+        x0, _, y0, _ = self.tile_bounds(level, ix0, iy0)
+        _, x1, _, y1 = self.tile_bounds(level, ix1 - 1, iy1 - 1)
+        return MapRegion(delta, status, (x0, x1, y0, y1), level, complete)
+
+    def pending(self):
+        return len(self._pending)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        self._pending.clear()
+
+
+def regime_overlay(status):
+    """Ảnh RGBA tô các vùng tia bị chặn (trong suốt ở vùng hợp lệ và chưa tính)"""
+    table = np.zeros((256, 4))
+    for code, color in REGIME_COLORS.items():
+        table[code] = color
+    return table[status.view(np.uint8)]
+
+
+class RegimeMapView:
+    """Heatmap δ + vùng/biên chế độ tia trên ``ax``, tự tinh chỉnh khi khung nhìn đổi"""
+
+    # Sau bao lâu kể từ lần đổi khung nhìn cuối (ms) thì tính lại
+    refine_delay = 150
+    # Chu kỳ kiểm tra các tile đang tính (ms)
+    poll_interval = 50
+
+    def __init__(self, ax, regime_map, cmap='viridis'):
+        self.ax = ax
+        self.map = regime_map
+        self.canvas = ax.figure.canvas
+        self.region = None
+        self.boundaries = []
+
+        extent = (*regime_map.xrange, *regime_map.yrange)
+        common = dict(origin='lower', extent=extent, aspect='auto', interpolation='nearest')
+        self.delta_image = ax.imshow(np.full((1, 1), np.nan), cmap=cmap, zorder=1, **common)
+        self.regime_image = ax.imshow(np.zeros((1, 1, 4)), zorder=2, **common)
+        ax.figure.colorbar(self.delta_image, ax=ax, label='Góc lệch δ (°)')
+        self.marker, = ax.plot([], [], '+', color='white', markersize=14,
+                               markeredgewidth=2, zorder=4)
+
+        names = {physics.RAY_TIR_ENTRY: 'Phản xạ toàn phần tại mặt vào',
+                 physics.RAY_NO_EXIT: 'Tia không đến mặt ra',
+                 physics.RAY_TIR_EXIT: 'Phản xạ toàn phần tại mặt ra'}
+        handles = [ax.plot([], [], color=REGIME_COLORS[code][:3], linewidth=6,
+                           label=label)[0] for code, label in names.items()]
+        ax.legend(handles=handles, loc='upper right', fontsize=8, framealpha=0.8)
+
+        ax.set_xlim(*regime_map.xrange)
+        ax.set_ylim(*regime_map.yrange)
+        ax.set_xlabel(AXIS_LABELS[regime_map.x])
+        ax.set_ylabel(AXIS_LABELS[regime_map.y])
+        fixed = ', '.join(f"{SYMBOLS[name]} = {regime_map.fixed[name]:g}" for name in PARAMS
+                          if name not in (regime_map.x, regime_map.y))
+        ax.set_title(f"Chế độ tia ({fixed})")
+
+        self.refine_timer = self.canvas.new_timer(interval=self.refine_delay)
+        self.refine_timer.single_shot = True
+        self.refine_timer.add_callback(self.refresh)
+        self.poll_timer = self.canvas.new_timer(interval=self.poll_interval)
+        self.poll_timer.add_callback(self.poll)
+        ax.callbacks.connect('xlim_changed', self._on_limits_changed)
+        ax.callbacks.connect('ylim_changed', self._on_limits_changed)
+
+    def _on_limits_changed(self, ax):
+        self.refine_timer.stop()
+        self.refine_timer.start()
+
+    def pixels(self):
+        """Kích thước (pixel) của axes trên canvas"""
+        return max(1, int(self.ax.bbox.width)), max(1, int(self.ax.bbox.height))
+
+    def refresh(self, wait=False):
+        """Tính (hoặc lấy từ cache) các tile của khung nhìn hiện tại rồi vẽ lại"""
+        region = self.map.region(self.ax.get_xlim(), self.ax.get_ylim(), self.pixels(),
+                                 wait=wait)
+        self.show(region)
+        if region.complete:
+            self.poll_timer.stop()
+        else:
+            self.poll_timer.start()
+        self.canvas.draw_idle()
+
+    def poll(self):
+        """Vẽ lại khi có tile mới tính xong"""
+        before = self.map.pending()
+        if self.map.collect() < before:
+            self.refresh()
+
+    def show(self, region):
+        """Cập nhật heatmap, lớp tô vùng và đường biên theo ``region``"""
+        self.region = region
+        self.delta_image.set_data(region.delta)
+        self.delta_image.set_extent(region.extent)
+        if np.isfinite(region.delta).any():
+            self.delta_image.set_clim(np.nanmin(region.delta), np.nanmax(region.delta))
+        self.regime_image.set_data(regime_overlay(region.status))
+        self.regime_image.set_extent(region.extent)
+
+        for contour in self.boundaries:
+            contour.remove()
+        self.boundaries = []
+        for code, color in REGIME_COLORS.items():
+            mask = region.status == code
+            if mask.any() and not mask.all():
+                self.boundaries.append(self.ax.contour(
+                    mask.view(np.int8), levels=[0.5], colors=[color[:3]], linewidths=1.2,
+                    origin='lower', extent=region.extent, zorder=3))
+
+    def set_marker(self, x, y):
+        """Đánh dấu điểm (x, y) hiện tại trên bản đồ"""
+        self.marker.set_data([x], [y])
+
+    def close(self):
+        """Dừng các timer và thread pool của bản đồ (gọi khi đóng cửa sổ; gọi lại được)"""
+        self.refine_timer.stop()
+        self.poll_timer.stop()
+        self.map.shutdown()
+
+
+def show_map(regime_map, marker=None):
+    """Mở cửa sổ bản đồ (pyplot) với zoom/pan; trả về ``(fig, view, navigator)``
+
+    Đóng cửa sổ sẽ dừng timer và thread pool của ``regime_map`` (``view.close``).
+    """
+    import matplotlib.pyplot as plt
+    from prism.navigation import AxesNavigator
+
+    fig = plt.figure(figsize=(10, 8), facecolor='#1a1a2e')
+    ax = fig.add_subplot()
+    view = RegimeMapView(ax, regime_map)
+    if marker is not None:
+        view.set_marker(*marker)
+    navigator = AxesNavigator(ax)
+    fig.canvas.mpl_connect('close_event', lambda event: view.close())
+    view.refresh(wait=True)
+    fig.show()
+    return fig, view, navigator
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Ban do che do tia (delta, phan xa toan phan...) tren khong gian tham so")
+    parser.add_argument('--x', choices=PARAMS, default='theta1', help="tham so truc ngang")
+    parser.add_argument('--y', choices=PARAMS, default='A', help="tham so truc doc")
+    for name in PARAMS:
+        parser.add_argument(f'--{name}', type=float, default=DEFAULT_VALUES[name],
+                            help="gia tri co dinh (khi khong phai truc)")
+    parser.add_argument('--size', type=int, default=4096,
+                        help="so diem moi truc khi tinh ca ban do (mac dinh 4096)")
+    parser.add_argument('--tile-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="so luong tinh tile (mac dinh: so nhan CPU)")
+    parser.add_argument('-o', '--output', help="luu anh ban do (png/svg/pdf)")
+    parser.add_argument('--show', action='store_true', help="mo cua so tuong tac (zoom/pan)")
+    args = parser.parse_args(argv)
+
+    fixed = {name: getattr(args, name) for name in PARAMS}
+    # Mức đủ cho --size điểm mỗi trục, cộng thêm 4 mức (x16) để zoom
+    full_level = max(0, math.ceil(math.log2(max(1.0, args.size / args.tile_size))))
+    regime_map = RegimeMap(args.x, args.y, fixed=fixed, tile_size=args.tile_size,
+                           max_level=full_level + 4, workers=args.workers)
+
+    start = time.perf_counter()
+    full = regime_map.region(regime_map.xrange, regime_map.yrange, (args.size, args.size))
+    elapsed = time.perf_counter() - start
+    points = full.delta.size
+    counts = np.bincount(full.status.view(np.uint8).ravel(), minlength=4)[:4] / points
+    print(f"{full.delta.shape[1]}x{full.delta.shape[0]} diem ({regime_map.computed} tile) "
+          f"trong {elapsed:.2f}s ({points / elapsed / 1e6:.1f} trieu diem/s)")
+    print(f"Ti le: hop le {counts[physics.RAY_OK]:.1%}, PXTP mat vao {counts[physics.RAY_TIR_ENTRY]:.1%}, "
+          f"khong den mat ra {counts[physics.RAY_NO_EXIT]:.1%}, "
+          f"PXTP mat ra {counts[physics.RAY_TIR_EXIT]:.1%}")
+
+    if args.output:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        from prism.scene import apply_style
+
+        apply_style()
+        fig = Figure(figsize=(10, 8), facecolor='#1a1a2e')
+        FigureCanvasAgg(fig)
+        view = RegimeMapView(fig.add_subplot(), regime_map)
+        view.show(full)
+        fig.savefig(args.output, dpi=150, facecolor=fig.get_facecolor(), edgecolor='none')
+        print(f"Da luu ban do: {args.output}")
+
+    if args.show:
+        import matplotlib.pyplot as plt
+        from prism.scene import apply_style
+
+        apply_style()
+        marker = (fixed[args.x], fixed[args.y])
+        window = show_map(regime_map, marker)
+        plt.show()
+        del window
+    regime_map.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
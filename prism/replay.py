@@ -0,0 +1,515 @@
+"""Ghi lại và phát lại thao tác người dùng để đo độ trễ tương tác
+
+``SessionRecorder`` ghi các sự kiện chuột/bàn phím thô của figure (nhấn, kéo,
+nhả, cuộn, phím) kèm thời điểm; vị trí được chuẩn hóa theo kích thước figure.
+Vì là sự kiện thô nên khi phát lại chúng đi qua đúng các handler như khi dùng
+thật: slider, nút Reset/Tán sắc/Bình thường, ô nhập thủy tinh,
+``AxesNavigator`` (zoom/pan) và ``UpdateScheduler``.
+
+Khi phát lại, ứng dụng chạy headless (Agg) với các timer của canvas được thay
+bằng timer chạy theo đồng hồ của bộ phát lại, nên việc gộp khung hình giống
+hệt lúc ghi. Ở tốc độ ``max`` các khoảng chờ được bỏ qua (đồng hồ nhảy tới
+thời điểm kế tiếp) nhưng thứ tự sự kiện/timer vẫn như cũ. Độ trễ của một sự
+kiện là thời gian từ lúc gửi sự kiện đến khi khung hình phản ánh nó vẽ xong.
+
+Ví dụ::
+
+    python -m prism.replay record phien.log           # dùng ứng dụng, đóng cửa sổ để lưu
+    python -m prism.replay synth nang.log --seconds 30 # phiên "nặng" tổng hợp
+    python -m prism.replay play phien.log --speed max -o replay.json
+    python -m prism.benchmark compare baseline.json replay.json
+"""
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+
+# Phiên bản định dạng file phiên
+FORMAT_VERSION = 1
+
+InputEvent = namedtuple('InputEvent', ['t', 'kind', 'x', 'y', 'button', 'key'])
+InputEvent.__doc__ = """Một sự kiện đã ghi: thời điểm (s), loại (press, motion, release,
+scroll, key), vị trí chuẩn hóa 0..1 theo figure, nút chuột và phím (hoặc None)"""
+
+_MPL_EVENTS = {
+    'press': 'button_press_event',
+    'motion': 'motion_notify_event',
+    'release': 'button_release_event',
+    'scroll': 'scroll_event',
+    'key': 'key_press_event',
+}
+
+# Phím không phát lại: F3 ghi file trace, F4 mở cửa sổ mới
+SKIPPED_KEYS = ('f3', 'f4')
+
+
+def save_session(path, events, size):
+    """Ghi các ``InputEvent`` ra file văn bản gọn, mỗi dòng một sự kiện"""
+    with open(path, 'w', encoding='utf-8') as f:
+        header = {"version": FORMAT_VERSION, "size": list(size)}
+        f.write(f"# prism-session {json.dumps(header)}\n")
+        for event in events:
+            button = '-' if event.button is None else event.button
+            key = '' if event.key is None else f' {json.dumps(event.key)}'
+            f.write(f"{event.t:.4f} {event.kind} {event.x:.5f} {event.y:.5f} {button}{key}\n")
+
+
+def load_session(path):
+    """Đọc file phiên, trả về ``(events, size)``"""
+    events = []
+    size = None
+    with open(path, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            line = line.rstrip('\n')
+            if line.startswith('# prism-session '):
+                size = tuple(json.loads(line[len('# prism-session '):])["size"])
+                continue
+            if not line or line.startswith('#'):
+                continue
+            try:
+                t, kind, x, y, button, *key = line.split(' ', 5)
+                if kind not in _MPL_EVENTS:
+                    raise ValueError(kind)
+                if button == '-':
+                    button = None
+                elif button.isdigit():
+                    button = int(button)
+                events.append(InputEvent(float(t), kind, float(x), float(y), button,
+                                         json.loads(key[0]) if key else None))
+            except ValueError:
+                raise ValueError(f"dong {number}: su kien khong hop le") from None
+    return events, size
+
+
+class SessionRecorder:
+    """Ghi sự kiện đầu vào của ``canvas``; chuyển động chuột chỉ ghi khi đang giữ nút
+
+    Backend GUI (Tk, Qt...) báo nút đang giữ khi kéo qua ``event.buttons`` chứ
+    không qua ``event.button``; backend không có ``buttons`` thì dựa vào trạng
+    thái nhấn/nhả do recorder tự theo dõi.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.events = []
+        self.start = time.perf_counter()
+        self._held = None
+        self._ids = [canvas.mpl_connect(name, self._record) for name in _MPL_EVENTS.values()]
+
+    def _record(self, event):
+        kind = next(key for key, name in _MPL_EVENTS.items() if name == event.name)
+        button = getattr(event, 'button', None)
+        if button is not None and not isinstance(button, str):
+            button = int(button)    # MouseButton -> số
+        if kind == 'press':
+            self._held = button
+        elif kind == 'release':
+            self._held = None
+        elif kind == 'motion':
+            buttons = getattr(event, 'buttons', None)
+            if button is None and buttons:
+                button = min(int(b) for b in buttons)
+            if button is None:
+                button = self._held
+            if button is None:
+                return
+        width, height = self.canvas.get_width_height()
+        self.events.append(InputEvent(time.perf_counter() - self.start, kind,
+                                      event.x / width, event.y / height, button,
+                                      event.key if kind == 'key' else None))
+
+    def stop(self):
+        for cid in self._ids:
+            self.canvas.mpl_disconnect(cid)
+        self._ids = []
+
+    def save(self, path):
+        save_session(path, self.events, self.canvas.get_width_height())
+        return len(self.events)
+
+
+# ----------------------------------------------------------------------
+# Phát lại
+# ----------------------------------------------------------------------
+
+class ReplayClock:
+    """Đồng hồ của bộ phát lại: thời gian thực cộng phần thời gian chờ được bỏ qua"""
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.offset = 0.0
+        self.timers = []
+
+    def now(self):
+        return time.perf_counter() + self.offset
+
+    def wait_until(self, moment):
+        delay = moment - self.now()
+        if delay <= 0:
+            return
+        if self.realtime:
+            time.sleep(delay)
+        else:
+            self.offset += delay
+
+    def next_timer(self):
+        """Timer đang chạy đến hạn sớm nhất (hoặc None)"""
+        active = [timer for timer in self.timers if timer.due is not None]
+        return min(active, key=lambda timer: timer.due, default=None)
+
+
+def _timer_class():
+    from matplotlib.backend_bases import TimerBase
+
+    class ReplayTimer(TimerBase):
+        """Timer của canvas chạy theo ``ReplayClock`` thay vì vòng lặp GUI"""
+
+        def __init__(self, clock, interval=None, callbacks=None):
+            self.clock = clock
+            self.due = None
+            super().__init__(interval=interval, callbacks=callbacks)
+            clock.timers.append(self)
+
+        def _timer_start(self):
+            self.due = self.clock.now() + self.interval / 1000
+
+        def _timer_stop(self):
+            self.due = None
+
+        def _timer_set_interval(self):
+            if self.due is not None:
+                self._timer_start()
+
+        def fire(self):
+            # Single-shot: dừng trước khi gọi để callback có thể khởi động lại
+            self.due = None if self.single_shot else self.due + self.interval / 1000
+            self._on_timer()
+
+    return ReplayTimer
+
+
+@contextmanager
+def _replay_timers(clock):
+    """Trong khối ``with``, mọi ``canvas.new_timer`` tạo timer của ``clock``"""
+    from matplotlib.backend_bases import FigureCanvasBase
+
+    timer_cls = _timer_class()
+    original = FigureCanvasBase.new_timer
+    FigureCanvasBase.new_timer = lambda canvas, interval=None, callbacks=None: timer_cls(
+        clock, interval, callbacks)
+    try:
+        yield
+    finally:
+        FigureCanvasBase.new_timer = original
+
+
+def create_app(clock):
+    """``SimplePrismSimulator`` headless (Agg) với timer chạy theo ``clock``"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import main
+    with _replay_timers(clock):
+        return main.SimplePrismSimulator()
+
+
+class Replayer:
+    """Phát lại các sự kiện đã ghi trên một ứng dụng headless và đo độ trễ"""
+
+    def __init__(self, app, clock):
+        self.app = app
+        self.clock = clock
+        self.canvas = app.fig.canvas
+        self.frames = 0
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+        # Axes -> nhóm sự kiện trong báo cáo
+        self.targets = {app.ax_main: 'main'}
+        for name in ('n1', 'n2', 'theta', 'prism_angle'):
+            self.targets[getattr(app, f'slider_{name}').ax] = 'slider'
+        for name in ('reset', 'dispersion', 'normal', 'curve', 'screenshot'):
+            self.targets[getattr(app, f'btn_{name}').ax] = 'button'
+        self.targets[app.text_glass.ax] = 'textbox'
+        self.skip_axes = {app.btn_screenshot.ax}    # Mở hộp thoại lưu file
+
+        self.latencies = {}
+        self.no_frame = 0
+        self.skipped = 0
+        self._pending = []
+        self._drag_group = None
+        self._skip_drag = False
+
+    def _on_draw(self, event):
+        self.frames += 1
+
+    def _frame_count(self):
+        return self.frames + self.app.navigator.blit_count
+
+    def _group(self, event, mpl_event):
+        target = self.targets.get(mpl_event.inaxes, 'other')
+        if event.kind == 'key':
+            return 'textbox' if target == 'textbox' else 'key'
+        if event.kind == 'scroll':
+            return 'zoom' if target == 'main' else 'other'
+        if event.kind == 'press':
+            self._drag_group = 'pan' if target == 'main' else target
+            return self._drag_group
+        return self._drag_group or 'other'
+
+    def _make_event(self, event):
+        from matplotlib.backend_bases import KeyEvent, MouseEvent
+
+        width, height = self.canvas.get_width_height()
+        x, y = event.x * width, event.y * height
+        name = _MPL_EVENTS[event.kind]
+        if event.kind == 'key':
+            return KeyEvent(name, self.canvas, event.key, x, y)
+        if event.kind == 'scroll':
+            step = 1 if event.button == 'up' else -1
+            return MouseEvent(name, self.canvas, x, y, button=event.button, step=step)
+        if event.kind == 'motion':
+            # Như backend GUI: nút đang giữ nằm trong ``buttons``; ``button`` giữ lại
+            # cho các handler chỉ đọc ``event.button`` (Slider)
+            buttons = [event.button] if isinstance(event.button, int) else None
+            return MouseEvent(name, self.canvas, x, y, button=event.button, buttons=buttons)
+        return MouseEvent(name, self.canvas, x, y, button=event.button)
+
+    def _settle_frames(self, before):
+        """Gán độ trễ cho các sự kiện đang chờ nếu vừa có khung hình mới"""
+        if self._frame_count() == before or not self._pending:
+            return
+        now = self.clock.now()
+        for group, sent in self._pending:
+            self.latencies.setdefault(group, []).append(now - sent)
+        self._pending = []
+
+    def _run_timers(self, until):
+        """Chạy các timer đến hạn trước thời điểm ``until`` (None = đến khi hết)"""
+        while True:
+            timer = self.clock.next_timer()
+            if timer is None or (until is not None and timer.due > until):
+                return
+            self.clock.wait_until(timer.due)
+            before = self._frame_count()
+            timer.fire()
+            self._settle_frames(before)
+
+    def dispatch(self, event):
+        mpl_event = self._make_event(event)
+        if event.kind == 'press':
+            self._skip_drag = mpl_event.inaxes in self.skip_axes
+        skip = self._skip_drag or (event.kind == 'key' and event.key in SKIPPED_KEYS)
+        if event.kind == 'release':
+            self._skip_drag = False
+        if skip:
+            self.skipped += 1
+            return
+
+        group = self._group(event, mpl_event)
+        before = self._frame_count()
+        sent = self.clock.now()
+        self.canvas.callbacks.process(mpl_event.name, mpl_event)
+
+        if self._frame_count() != before:
+            # Handler tự vẽ ngay (ví dụ lưu nền khi bắt đầu pan)
+            self._pending.append((group, sent))
+            self._settle_frames(before)
+        elif self.clock.next_timer() is not None:
+            self._pending.append((group, sent))
+        else:
+            self.no_frame += 1      # Sự kiện không gây vẽ lại
+
+    def run(self, events, speed=1.0):
+        """Phát lại ``events``; ``speed`` là hệ số tốc độ (None = tối đa)"""
+        self.clock.realtime = speed is not None
+        scale = 1.0 / speed if speed else 1.0
+        start = self.clock.now()
+        wall = time.perf_counter()
+        for event in events:
+            moment = start + event.t * scale
+            self._run_timers(moment)
+            self.clock.wait_until(moment)
+            self.dispatch(event)
+        self._run_timers(None)
+        return time.perf_counter() - wall
+
+
+def report(replayer, events, wall_time, speed):
+    """Kết quả theo định dạng của ``prism.benchmark`` (so sánh bằng ``compare``)"""
+    from prism.benchmark import _metric, environment
+
+    results = {}
+    everything = []
+    for group, samples in sorted(replayer.latencies.items()):
+        samples = np.array(samples) * 1000
+        everything.append(samples)
+        results[f"replay.{group}.p50_ms"] = _metric(np.median(samples), 'ms', 'lower')
+        results[f"replay.{group}.p99_ms"] = _metric(np.percentile(samples, 99), 'ms', 'lower')
+    if everything:
+        samples = np.concatenate(everything)
+        results["replay.all.p50_ms"] = _metric(np.median(samples), 'ms', 'lower')
+        results["replay.all.p90_ms"] = _metric(np.percentile(samples, 90), 'ms', 'lower')
+        results["replay.all.p99_ms"] = _metric(np.percentile(samples, 99), 'ms', 'lower')
+        results["replay.all.max_ms"] = _metric(samples.max(), 'ms', 'lower')
+    results["replay.frames"] = _metric(replayer.frames, 'frames', 'lower')
+    results["replay.wall_s"] = _metric(wall_time, 's', 'lower')
+
+    meta = environment()
+    meta.update({"events": len(events), "speed": speed or 'max',
+                 "no_frame": replayer.no_frame, "skipped": replayer.skipped,
+                 "counts": {group: len(samples)
+                            for group, samples in replayer.latencies.items()},
+                 "scheduler": replayer.app.scheduler.stats()})
+    return {"meta": meta, "results": results}
+
+
+def synthesize(app, seconds=20.0, seed=0, rate=60.0):
+    """Phiên "nặng" tổng hợp: kéo slider, cuộn zoom dồn dập, pan, bấm nút, chọn thủy tinh
+
+    Vị trí được tính từ layout của ``app`` nên file sinh ra phát lại được trên
+    cùng layout. ``rate`` là số sự kiện chuột mỗi giây khi kéo.
+    """
+    rng = np.random.default_rng(seed)
+    canvas = app.fig.canvas
+    width, height = canvas.get_width_height()
+    events = []
+    t = 0.0
+    dt = 1.0 / rate
+
+    def center(ax, fx=0.5, fy=0.5):
+        x, y = ax.transAxes.transform((fx, fy))
+        return x / width, y / height
+
+    def add(kind, x, y, button=None, key=None):
+        events.append(InputEvent(round(t, 4), kind, x, y, button, key))
+
+    typed = ''
+    sliders = [app.slider_n1, app.slider_n2, app.slider_theta, app.slider_prism_angle]
+    buttons = [app.btn_dispersion, app.btn_normal, app.btn_reset, app.btn_curve]
+    while t < seconds:
+        action = rng.choice(['slider', 'zoom', 'pan', 'button', 'glass'], p=[.4, .2, .2, .15, .05])
+        if action == 'slider':
+            ax = sliders[rng.integers(len(sliders))].ax
+            path = np.clip(rng.uniform(0.1, 0.9) + np.cumsum(rng.normal(0, 0.03, 60)), 0, 1)
+            add('press', *center(ax, path[0]), button=1)
+            for position in path[1:]:
+                t += dt
+                add('motion', *center(ax, position), button=1)
+            add('release', *center(ax, path[-1]), button=1)
+        elif action == 'zoom':
+            x, y = center(app.ax_main, *rng.uniform(0.3, 0.7, 2))
+            for _ in range(rng.integers(5, 20)):
+                t += dt / 2
+                add('scroll', x, y, button=str(rng.choice(['up', 'down'])))
+        elif action == 'pan':
+            fx, fy = rng.uniform(0.3, 0.7, 2)
+            add('press', *center(app.ax_main, fx, fy), button=1)
+            for step in range(60):
+                t += dt
+                add('motion', *center(app.ax_main, fx + 0.2 * np.sin(step / 10),
+                                      fy + 0.1 * np.cos(step / 10)), button=1)
+            add('release', *center(app.ax_main, fx, fy), button=1)
+        elif action == 'button':
+            ax = buttons[rng.integers(len(buttons))].ax
+            add('press', *center(ax), button=1)
+            t += 0.08
+            add('release', *center(ax), button=1)
+        else:
+            ax = app.text_glass.ax
+            add('press', *center(ax), button=1)
+            add('release', *center(ax), button=1)
+            name = str(rng.choice(['N-SF11', 'N-BK7', 'F2']))
+            # Xóa tên cũ trong ô rồi gõ tên mới
+            for key in ['backspace'] * len(typed) + list(name) + ['enter']:
+                t += 0.1
+                add('key', *center(ax), key=key)
+            typed = name
+            # Bấm ra ngoài để thôi nhập
+            add('press', *center(app.ax_info), button=1)
+            add('release', *center(app.ax_info), button=1)
+        t += rng.uniform(0.2, 0.8)
+    return events
+
+
+def _cmd_record(args):
+    import matplotlib.pyplot as plt
+    import main
+
+    app = main.SimplePrismSimulator()
+    recorder = SessionRecorder(app.fig.canvas)
+    print("Dang ghi thao tac - dong cua so de luu", file=sys.stderr)
+    plt.show()
+    recorder.stop()
+    count = recorder.save(args.session)
+    print(f"Da luu {count} su kien: {args.session}")
+    return 0
+
+
+def _cmd_synth(args):
+    app = create_app(ReplayClock())
+    events = synthesize(app, args.seconds, args.seed)
+    save_session(args.session, events, app.fig.canvas.get_width_height())
+    print(f"Da luu {len(events)} su kien ({events[-1].t:.1f}s): {args.session}")
+    return 0
+
+
+def _cmd_play(args):
+    try:
+        events, size = load_session(args.session)
+    except (OSError, ValueError) as e:
+        print(f"Loi: {e}", file=sys.stderr)
+        return 1
+    speed = None if args.speed == 'max' else float(args.speed)
+
+    clock = ReplayClock()
+    app = create_app(clock)
+    if size and tuple(size) != app.fig.canvas.get_width_height():
+        print(f"Canh bao: phien ghi voi figure {size[0]}x{size[1]}, hien tai "
+              "{}x{} - vi tri duoc co gian".format(*app.fig.canvas.get_width_height()),
+              file=sys.stderr)
+    replayer = Replayer(app, clock)
+    wall = replayer.run(events, speed)
+    result = report(replayer, events, wall, speed)
+
+    for name, metric in result["results"].items():
+        print(f"  {name:32s} {metric['value']:12.2f} {metric['unit']}")
+    meta = result["meta"]
+    print(f"{meta['events']} su kien, {meta['no_frame']} khong gay ve lai, "
+          f"{meta['skipped']} bo qua, {wall:.2f}s")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Da luu ket qua: {args.output}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m prism.replay', description="Ghi va phat lai thao tac, do do tre")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_record = sub.add_parser('record', help="mo ung dung va ghi thao tac")
+    p_record.add_argument('session')
+    p_record.set_defaults(func=_cmd_record)
+
+    p_synth = sub.add_parser('synth', help="sinh mot phien nang tong hop")
+    p_synth.add_argument('session')
+    p_synth.add_argument('--seconds', type=float, default=20.0)
+    p_synth.add_argument('--seed', type=int, default=0)
+    p_synth.set_defaults(func=_cmd_synth)
+
+    p_play = sub.add_parser('play', help="phat lai headless va do do tre")
+    p_play.add_argument('session')
+    p_play.add_argument('--speed', default='1', help="he so toc do hoac 'max'")
+    p_play.add_argument('-o', '--output', help="luu ket qua JSON (dinh dang benchmark)")
+    p_play.set_defaults(func=_cmd_play)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,484 @@
+"""Cảnh vẽ lăng kính theo kiểu giữ nguyên artist (retained mode)
+
+Mọi artist (lăng kính, các tia, nhãn góc, hộp δ, panel thông tin) được tạo một
+lần trong ``PrismScene.__init__``. Mỗi khung hình sau đó chỉ cập nhật dữ liệu
+bằng ``set_data`` / ``set_xy`` / ``set_text``; chú thích (legend) và panel
+thông tin chỉ được dựng lại khi nội dung thực sự thay đổi.
+"""
+from dataclasses import dataclass
+
+import matplotlib.style
+import matplotlib.patches as patches
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from prism import physics, raytrace, skew
+from prism.deviation import DeviationEngine
+from prism.dispersion import CauchyModel, wavelength_grid, wavelength_to_rgb
+from prism.profiler import FrameProfiler
+
+
+@dataclass(frozen=True)
+class SceneState:
+    """Toàn bộ tham số quyết định nội dung một khung hình"""
+    n1: float = 1.0             # Không khí
+    n2: float = 1.5             # Lăng kính
+    theta1: float = 45.0        # Góc tới (độ)
+    prism_angle: float = 60.0   # Góc lăng kính
+    show_dispersion: bool = False
+    show_angles: bool = True
+    show_curve: bool = False    # Inset đường cong δ(θ₁)
+    # Mô hình chiết suất n(λ), được neo vào n2 tại λ_d (hoặc ``CatalogGlass``)
+    dispersion_model: CauchyModel = CauchyModel()
+    # Góc nghiêng (độ) của tia tới ra khỏi mặt tiết diện; khác 0 thì dò tia xiên 3D
+    tilt: float = 0.0
+
+
+def apply_style():
+    """Áp dụng style tối của ứng dụng cho các figure tạo sau đó"""
+    matplotlib.style.use('dark_background')
+    # Tắt toolbar TRƯỚC khi tạo figure
+    matplotlib.rcParams['toolbar'] = 'None'
+
+
+def create_scene_figure(figsize=(14, 7.5)):
+    """Figure off-screen (Agg) chỉ gồm vùng mô phỏng và panel thông tin
+
+    Không dùng pyplot nên không cần màn hình hay Tk. Trả về ``(fig, scene)``.
+    """
+    fig = Figure(figsize=figsize, facecolor='#1a1a2e')
+    FigureCanvasAgg(fig)
+    fig.suptitle('MO PHONG LANG KINH CHINH XAC',
+                 fontsize=16, fontweight='bold', color='white', y=0.95)
+
+    gs = fig.add_gridspec(1, 2, width_ratios=[3, 1], wspace=0.2)
+
+    ax_main = fig.add_subplot(gs[0, 0])
+    ax_main.set_facecolor('#16213e')
+
+    ax_info = fig.add_subplot(gs[0, 1])
+    ax_info.set_facecolor('#1a1a2e')
+    ax_info.axis('off')
+
+    return fig, PrismScene(ax_main, ax_info)
+
+
+class SpectrumCollection(LineCollection):
+    """Một LineCollection chứa đường đi của cả phổ (đoạn trong lăng kính + tia ra)
+
+    Hàng trăm tia gần như trùng nhau trên màn hình, nên khi vẽ các tia liên
+    tiếp có điểm cuối cách nhau dưới ``min_spacing`` pixel (và cùng số điểm gấp
+    khúc) được gộp thành một nét (trung bình tọa độ và màu). Số nét vẽ vì vậy tỉ
+    lệ với độ rộng thực của quạt trên màn hình chứ không phải số bước sóng, và
+    tự tăng lên khi phóng to.
+    """
+
+    # Khoảng cách tối thiểu (pixel) giữa hai nét được vẽ riêng
+    min_spacing = 0.5
+    # Độ trong suốt của đoạn trong lăng kính
+    internal_alpha = 0.6
+
+    def __init__(self, **kwargs):
+        super().__init__([], capstyle='round', **kwargs)
+        self.exit_linewidth = 1.5
+        self._points = np.zeros((0, 2, 2))
+        self._counts = np.zeros(0, dtype=int)
+        self._colors = np.zeros((0, 4))
+
+    def set_rays(self, points, counts, colors):
+        """Đặt đường đi ``points[i, :counts[i]]`` (kết quả ``trace_rays``) và màu ``colors[i]``"""
+        self._points = np.asarray(points, dtype=float)
+        self._counts = np.asarray(counts)
+        self._colors = np.asarray(colors, dtype=float)
+        self.stale = True
+
+    def _merged_rays(self):
+        """Gộp các tia liên tiếp có điểm cuối gần nhau trên màn hình"""
+        points, counts, colors = self._points, self._counts, self._colors
+        if len(points) < 2:
+            return points, counts, colors
+
+        ends = points[np.arange(len(points)), counts - 1]
+        ends_px = self.get_transform().transform(ends)
+        travel = np.concatenate([[0.0], np.cumsum(np.hypot(*np.diff(ends_px, axis=0).T))])
+        group = (travel // self.min_spacing).astype(int)
+        # Chỉ gộp các đường có cùng số điểm để trung bình tọa độ có nghĩa
+        boundary = (group[1:] != group[:-1]) | (counts[1:] != counts[:-1])
+        starts = np.flatnonzero(np.concatenate([[True], boundary]))
+        sizes = np.diff(np.append(starts, len(points)))
+        return (np.add.reduceat(points, starts) / sizes[:, None, None],
+                counts[starts],
+                np.add.reduceat(colors, starts) / sizes[:, None])
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        points, counts, colors = self._merged_rays()
+
+        internal, internal_colors = [], []
+        exits, exit_colors = [], []
+        for count in np.unique(counts):
+            selected = counts == count
+            # Điểm 0 là gốc tia tới (vẽ riêng), điểm cuối là tia ra
+            if count >= 4:
+                internal.extend(points[selected, 1:count - 1])
+                internal_colors.append(colors[selected])
+            exits.extend(points[selected, count - 2:count])
+            exit_colors.append(colors[selected])
+
+        internal_colors = np.concatenate(internal_colors) if internal else np.zeros((0, 4))
+        internal_colors[:, 3] = self.internal_alpha
+        linewidths = np.full(len(internal) + len(exits), self.exit_linewidth)
+        linewidths[:len(internal)] = 2.0
+
+        self.set_segments(internal + exits)
+        self.set_color(np.vstack([internal_colors, *exit_colors]))
+        self.set_linewidths(linewidths)
+        super().draw(renderer)
+
+
+class PrismScene:
+    """Các artist của vùng mô phỏng (``ax_main``) và panel thông tin (``ax_info``)"""
+
+    # Chiều cao lăng kính (đơn vị tùy ý) và chiều dài theo trục z khi dò tia xiên
+    height = 1.5
+    length = 3.0
+    # Độ dài đoạn tia tới trước mặt vào, và số lần va chạm tối đa khi dò tia
+    ray_length = 2.0
+    max_bounces = 10
+
+    default_xlim = (-3, 4)
+    default_ylim = (-1.5, 2.5)
+
+    def __init__(self, ax_main, ax_info, wavelengths=None, profiler=None):
+        self.ax_main = ax_main
+        self.ax_info = ax_info
+        # Đo thời gian từng giai đoạn của update() (mặc định tắt)
+        self.profiler = profiler or FrameProfiler()
+        self.state = None
+        self._legend_key = None
+        self.deviation = DeviationEngine()
+        self._shown_curve = None
+
+        # Toàn bộ phổ (đoạn trong lăng kính + tia ra của mọi bước sóng) là một
+        # LineCollection duy nhất
+        self.spectrum_lines = SpectrumCollection()
+        self.set_spectrum(wavelength_grid() if wavelengths is None else wavelengths)
+
+        self.setup_axes()
+        self.create_artists()
+
+    def setup_axes(self):
+        """Thiết lập axes một lần duy nhất"""
+        self.reset_view()
+        self.ax_main.set_aspect('equal')
+        self.ax_main.grid(True, alpha=0.3)
+        self.ax_main.set_facecolor('#16213e')
+        self.ax_main.set_xlabel('X (đơn vị tùy ý)', color='white')
+        self.ax_main.set_ylabel('Y (đơn vị tùy ý)', color='white')
+
+        self.ax_info.set_xlim(0, 1)
+        self.ax_info.set_ylim(0, 1)
+        self.ax_info.axis('off')
+
+    def reset_view(self):
+        """Đưa khung nhìn về mặc định"""
+        self.ax_main.set_xlim(*self.default_xlim)
+        self.ax_main.set_ylim(*self.default_ylim)
+
+    def create_artists(self):
+        """Tạo tất cả artist (ẩn hoặc rỗng) để các khung hình sau chỉ cập nhật"""
+        ax = self.ax_main
+
+        # Lăng kính
+        self.prism_patch = patches.Polygon([[0, 0], [0, 0], [0, 0]], closed=True,
+                                           facecolor='lightblue', alpha=0.3,
+                                           edgecolor='cyan', linewidth=3)
+        ax.add_patch(self.prism_patch)
+        self.prism_outline, = ax.plot([], [], 'cyan', linewidth=3, label='Lăng kính')
+
+        # Chế độ đơn sắc
+        self.incident_line, = ax.plot([], [], 'red', linewidth=3, label='Tia tới', alpha=0.9)
+        self.internal_line, = ax.plot([], [], 'orange', linewidth=3,
+                                      label='Tia trong lăng kính', alpha=0.9)
+        self.exit_line, = ax.plot([], [], 'lime', linewidth=3, label='Tia ra', alpha=0.9)
+
+        self.angle_texts = {
+            "theta1": ax.text(0, 0, '', color='red', fontsize=10, fontweight='bold', clip_on=True),
+            "r1": ax.text(0, 0, '', color='orange', fontsize=10, fontweight='bold', clip_on=True),
+            "r2": ax.text(0, 0, '', color='orange', fontsize=9, fontweight='bold', clip_on=True),
+            "theta2": ax.text(0, 0, '', color='lime', fontsize=10, fontweight='bold', clip_on=True),
+        }
+        self.delta_text = ax.text(1.2, -1.0, '', color='yellow', fontsize=12, fontweight='bold',
+                                  clip_on=True,
+                                  bbox=dict(boxstyle="round", facecolor="blue", alpha=0.7))
+        self.error_text = ax.text(0, -0.5, '', ha='center', fontsize=12, color='red',
+                                  fontweight='bold', clip_on=True,
+                                  bbox=dict(boxstyle="round", facecolor="yellow", alpha=0.8))
+
+        self.single_artists = [self.incident_line, self.internal_line, self.exit_line,
+                               *self.angle_texts.values(), self.delta_text, self.error_text]
+
+        # Chế độ tán sắc
+        self.white_line, = ax.plot([], [], 'white', linewidth=4,
+                                   label='Tia tới (trắng)', alpha=0.8)
+        ax.add_collection(self.spectrum_lines, autolim=False)
+        self.dispersion_title = ax.text(0, 2.2, 'TAN SAC ANH SANG', ha='center', fontsize=12,
+                                        color='white', fontweight='bold', clip_on=True,
+                                        bbox=dict(boxstyle="round", facecolor="purple", alpha=0.7))
+
+        self.dispersion_artists = [self.white_line, self.spectrum_lines, self.dispersion_title]
+
+        # Các artist có thể xuất hiện trong chú thích (chế độ đơn sắc)
+        self.legend_artists = [self.prism_outline, self.incident_line,
+                               self.internal_line, self.exit_line]
+
+        # Inset đường cong δ(θ₁) ở góc trên bên trái của ax_main
+        self.curve_ax = ax.inset_axes([0.02, 0.56, 0.34, 0.40])
+        self.curve_ax.set_facecolor('#0f1830')
+        self.curve_ax.set_xlim(0, 90)
+        self.curve_ax.tick_params(labelsize=7, length=2, pad=1)
+        self.curve_ax.grid(True, alpha=0.2)
+        self.curve_line, = self.curve_ax.plot([], [], color='yellow', linewidth=1.5)
+        self.curve_min_marker, = self.curve_ax.plot([], [], 'o', color='cyan', markersize=4)
+        self.curve_point, = self.curve_ax.plot([], [], 'o', color='red', markersize=5)
+        self.curve_title = self.curve_ax.set_title('', fontsize=8, color='white', pad=2)
+        self.curve_ax.set_visible(False)
+
+        # Panel thông tin
+        self.info_text = self.ax_info.text(
+            0.05, 0.95, '', transform=self.ax_info.transAxes,
+            fontsize=10, color='white', verticalalignment='top',
+            bbox=dict(boxstyle="round,pad=0.5", facecolor="navy", alpha=0.8))
+
+        for artist in self.single_artists + self.dispersion_artists:
+            artist.set_visible(False)
+
+    def set_spectrum(self, wavelengths):
+        """Đặt các bước sóng (nm) được vẽ trong chế độ tán sắc"""
+        self.wavelengths = np.asarray(wavelengths, dtype=float)
+        rgb = wavelength_to_rgb(self.wavelengths)
+        # Màu RGBA của tia ra (alpha 0.9); đoạn trong lăng kính dùng cùng màu, mờ hơn
+        self.exit_colors = np.column_stack([rgb, np.full(len(rgb), 0.9)])
+        # Nhiều bước sóng thì nét mảnh hơn để quạt màu không bị bết
+        self.spectrum_lines.exit_linewidth = 3.0 if len(rgb) <= 16 else 1.5
+
+    @staticmethod
+    def _set_visible(artists, visible):
+        for artist in artists:
+            artist.set_visible(visible)
+
+    def trace(self, state, n_inside, escape_length):
+        """Dò tia tới (vào giữa mặt trái với góc θ₁) qua lăng kính hiện tại
+
+        ``n_inside`` là số hoặc mảng chiết suất - mỗi giá trị là một tia. Khi
+        ``state.tilt`` khác 0 tia được dò 3D qua lăng kính dài ``length``;
+        ``points`` là hình chiếu lên mặt xy, ``directions`` giữ nguyên 3D.
+        """
+        n_inside = np.atleast_1d(n_inside)
+        if state.tilt:
+            direction = skew.skew_direction(state.prism_angle, state.theta1, state.tilt)
+            impact = skew.entry_point(state.prism_angle, self.height)
+            planes = skew.prism_planes(state.prism_angle, self.height, self.length)
+            direction = np.broadcast_to(direction, (len(n_inside), 3))
+            trace = skew.trace_skew(planes, impact - self.ray_length * direction, direction,
+                                    state.n1, n_inside, max_bounces=self.max_bounces,
+                                    escape_length=escape_length)
+            return trace._replace(points=skew.project_xy(trace.points))
+
+        direction = raytrace.incident_direction(state.prism_angle, state.theta1)
+        impact = (self.vertices[0] + self.vertices[2]) / 2
+        direction = np.broadcast_to(direction, (len(n_inside), 2))
+        return raytrace.trace_rays(self.vertices, impact - self.ray_length * direction,
+                                   direction, state.n1, n_inside,
+                                   max_bounces=self.max_bounces, escape_length=escape_length)
+
+    def update(self, state):
+        """Cập nhật cảnh theo ``state`` (SceneState)"""
+        self.state = state
+        stage = self.profiler.stage
+
+        with stage('draw_prism'):
+            self.draw_prism(state)
+
+        if state.show_dispersion:
+            self._set_visible(self.single_artists, False)
+            with stage('draw_dispersed_rays'):
+                self.draw_dispersed_rays(state)
+        else:
+            self._set_visible(self.dispersion_artists, False)
+            with stage('draw_single_ray'):
+                self.draw_single_ray(state)
+
+        with stage('draw_deviation_curve'):
+            self.draw_deviation_curve(state)
+        with stage('draw_info_panel'):
+            self.draw_info_panel(state)
+        with stage('update_legend'):
+            self.update_legend(state)
+
+    def draw_prism(self, state):
+        """Cập nhật lăng kính tam giác cân"""
+        self.vertices = raytrace.prism_vertices(state.prism_angle, self.height)
+
+        self.prism_patch.set_xy(self.vertices)
+
+        # Viền
+        closed = np.vstack([self.vertices, self.vertices[:1]])
+        self.prism_outline.set_data(closed[:, 0], closed[:, 1])
+
+        return self.vertices
+
+    def draw_single_ray(self, state):
+        """Cập nhật tia sáng đơn màu theo đường đi dò được"""
+        result = physics.prism_ray(state.n1, state.n2, state.theta1, state.prism_angle)
+        trace = self.trace(state, state.n2, escape_length=2.0)
+        path = trace.points[0, :trace.counts[0]]
+
+        # 1. Tia tới, 2. các đoạn trong lăng kính (kể cả phản xạ), 3. tia ra
+        self.incident_line.set_data(path[:2, 0], path[:2, 1])
+        if trace.escaped[0]:
+            self.internal_line.set_data(path[1:-1, 0], path[1:-1, 1])
+            self.exit_line.set_data(path[-2:, 0], path[-2:, 1])
+        else:
+            self.internal_line.set_data(path[1:, 0], path[1:, 1])
+            self.exit_line.set_data([], [])
+        self._set_visible([self.incident_line, self.internal_line, self.exit_line], True)
+
+        # Nhãn góc chỉ đúng khi tia đi thẳng từ mặt trái sang mặt phải
+        direct = (trace.counts[0] == 4 and trace.faces[0, 0] == raytrace.FACE_ENTRY
+                  and trace.faces[0, 1] == raytrace.FACE_EXIT)
+
+        if state.tilt:
+            # Tia xiên: θ₁/r₁/r₂/θ₂ của công thức 2D không còn đúng; δ là góc 3D
+            # giữa hướng tới và hướng ra
+            self._set_visible(self.angle_texts.values(), False)
+            self.error_text.set_text("Tia không ra qua mặt bên phải")
+            self.error_text.set_visible(not direct)
+            if direct:
+                incident = skew.skew_direction(state.prism_angle, state.theta1, state.tilt)
+                delta = skew.deviation(incident, trace.directions[0])
+                self.delta_text.set_text(f'Góc lệch δ = {delta:.1f}° (3D)')
+            self.delta_text.set_visible(direct)
+            return
+
+        if "error" in result:
+            # Vẫn vẽ đường đi thực, kèm thông báo lỗi thay cho nhãn góc
+            self._set_visible([*self.angle_texts.values(), self.delta_text], False)
+            self.error_text.set_text(result["error"])
+            self.error_text.set_visible(True)
+            return
+        self.error_text.set_visible(False)
+
+        (impact_x, impact_y), (exit_x, exit_y) = path[1], path[2]
+
+        # Thông tin góc
+        texts = self.angle_texts
+        self._set_visible(texts.values(), state.show_angles and direct)
+        if state.show_angles and direct:
+            texts["theta1"].set_position((impact_x-0.3, impact_y+0.15))
+            texts["theta1"].set_text(f'θ₁={result["theta1"]:.1f}°')
+            texts["r1"].set_position((impact_x+0.1, impact_y-0.15))
+            texts["r1"].set_text(f'r₁={result["r1"]:.1f}°')
+            texts["r2"].set_position((exit_x-0.2, exit_y-0.15))
+            texts["r2"].set_text(f'r₂={result["r2"]:.1f}°')
+            texts["theta2"].set_position((exit_x+0.15, exit_y+0.1))
+            texts["theta2"].set_text(f'θ₂={result["theta2"]:.1f}°')
+
+        # Góc lệch
+        self.delta_text.set_text(f'Góc lệch δ = {result["delta"]:.1f}°')
+        self.delta_text.set_visible(direct)
+
+    def draw_dispersed_rays(self, state):
+        """Cập nhật tia sáng tán sắc - mỗi bước sóng được dò riêng với n(λ) neo vào n2"""
+        n_spectrum = state.dispersion_model.index(self.wavelengths, n_ref=state.n2)
+        trace = self.trace(state, n_spectrum, escape_length=2.5)
+
+        # Tia tới trắng (chung cho tất cả màu)
+        incident = trace.points[0, :2]
+        self.white_line.set_data(incident[:, 0], incident[:, 1])
+        self.white_line.set_visible(True)
+
+        self.spectrum_lines.set_rays(trace.points, trace.counts, self.exit_colors)
+        self.spectrum_lines.set_visible(len(trace.counts) > 0)
+
+        # Chú thích tán sắc
+        self.dispersion_title.set_visible(True)
+
+    def draw_deviation_curve(self, state):
+        """Cập nhật inset δ(θ₁); đường cong lấy từ cache của DeviationEngine"""
+        self.curve_ax.set_visible(state.show_curve)
+        if not state.show_curve:
+            return
+
+        curve = self.deviation.curve(state.n1, state.n2, state.prism_angle)
+        if curve is not self._shown_curve:
+            self._shown_curve = curve
+            self.curve_line.set_data(curve.theta1, curve.delta)
+            if np.isfinite(curve.delta).any():
+                low, high = np.nanmin(curve.delta), np.nanmax(curve.delta)
+                pad = max(0.1 * (high - low), 1.0)
+                self.curve_ax.set_ylim(low - pad, high + pad)
+            if curve.delta_min is None:
+                self.curve_min_marker.set_data([], [])
+                self.curve_title.set_text('δ(θ₁)')
+            else:
+                self.curve_min_marker.set_data([curve.theta1_min], [curve.delta_min])
+                self.curve_title.set_text(
+                    f'δ(θ₁)  δmin={curve.delta_min:.1f}° tại θ₁={curve.theta1_min:.1f}°')
+
+        # Điểm hiện tại
+        rays = physics.solve_prism_batch(state.n1, state.n2, state.theta1, state.prism_angle)
+        if rays.status == physics.RAY_OK:
+            self.curve_point.set_data([state.theta1], [float(rays.delta)])
+        else:
+            self.curve_point.set_data([], [])
+
+    def draw_info_panel(self, state):
+        """Cập nhật panel thông tin bên phải (chỉ khi nội dung đổi)"""
+        # Thông số hiện tại (kèm tên thủy tinh nếu chọn từ danh mục)
+        glass = getattr(state.dispersion_model, 'name', None)
+        material = f"\nvat lieu: {glass}" if glass and state.show_dispersion else ""
+        tilt = f"\ntilt = {state.tilt:.0f} do (tia xien 3D)" if state.tilt else ""
+        info_text = f"""
+THAM SO:
+n1 = {state.n1:.2f}
+n2 = {state.n2:.2f}{material}
+theta1 = {state.theta1:.1f} do
+A = {state.prism_angle:.1f} do{tilt}
+
+DINH LUAT SNELL:
+n1 x sin(theta1) = n2 x sin(theta2)
+
+TAN SAC:
+Chi so khuc xa phu thuoc
+buoc song anh sang
+-> Tach thanh cac mau
+
+PHAN XA TOAN PHAN:
+Xay ra khi:
+sin(theta) > n2/n1
+        """
+
+        if info_text != self.info_text.get_text():
+            self.info_text.set_text(info_text)
+
+    def update_legend(self, state):
+        """Dựng lại chú thích khi tập artist hiển thị thay đổi"""
+        if state.show_dispersion:
+            handles = []
+        else:
+            handles = [artist for artist in self.legend_artists if artist.get_visible()]
+
+        key = tuple(handle.get_label() for handle in handles)
+        if key == self._legend_key:
+            return
+        self._legend_key = key
+
+        legend = self.ax_main.get_legend()
+        if legend is not None:
+            legend.remove()
+        if handles:
+            self.ax_main.legend(handles=handles, loc='upper right', framealpha=0.8, fontsize=9)
@@ -0,0 +1,68 @@
+"""Bộ lập lịch gộp các yêu cầu cập nhật từ slider/nút bấm
+
+Mỗi lần slider thay đổi chỉ đánh dấu "cần vẽ lại". Việc tính toán + vẽ thực sự
+chạy tối đa một lần mỗi khung hình và luôn đọc giá trị mới nhất, nên một lần kéo
+nhanh không còn xếp hàng hàng chục lần vẽ đã lỗi thời.
+"""
+from contextlib import contextmanager
+
+
+class UpdateScheduler:
+    """Gộp các yêu cầu ``request()`` thành tối đa một lần ``render()`` mỗi khung hình"""
+
+    # Khoảng thời gian một khung hình (ms)
+    frame_interval = 16
+
+    def __init__(self, canvas, render):
+        self.render = render
+        self.pending = False
+        self._batch_depth = 0
+
+        # Bộ đếm: số yêu cầu, số yêu cầu bị gộp (bỏ qua), số lần vẽ
+        self.requested = 0
+        self.dropped = 0
+        self.rendered = 0
+
+        self.timer = canvas.new_timer(interval=self.frame_interval)
+        self.timer.single_shot = True
+        self.timer.add_callback(self.flush)
+
+    def request(self, val=None):
+        """Yêu cầu vẽ lại (dùng trực tiếp làm callback ``on_changed``)"""
+        self.requested += 1
+        if self.pending:
+            # Đã có một khung hình đang chờ - nó sẽ đọc giá trị mới nhất
+            self.dropped += 1
+            return
+        self.pending = True
+        if self._batch_depth == 0:
+            self.timer.start()
+
+    @contextmanager
+    def batch(self):
+        """Gộp mọi yêu cầu bên trong khối ``with`` thành đúng một khung hình"""
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self.pending:
+                self.timer.start()
+
+    def flush(self):
+        """Vẽ ngay nếu có yêu cầu đang chờ"""
+        if not self.pending or self._batch_depth:
+            return
+        self.timer.stop()
+        self.pending = False
+        self.rendered += 1
+        self.render()
+
+    def stats(self):
+        """Bộ đếm hiện tại dạng dict"""
+        return {
+            "requested": self.requested,
+            "dropped": self.dropped,
+            "rendered": self.rendered,
+            "pending": self.pending,
+        }
@@ -0,0 +1,557 @@
+"""Dịch vụ tính toán cục bộ cho các công cụ khác (JSON theo dòng qua Unix socket/stdio)
+
+Mỗi yêu cầu là một dòng JSON ``{"id": ..., "op": ..., <tham số>}``; mỗi phản
+hồi là một dòng ``{"id": ..., "ok": true, "result": ...}`` hoặc
+``{"id": ..., "ok": false, "error": "..."}``. Các op:
+
+- ``rays``: ``solve_prism_batch`` - ``n1, n2, theta1, A`` là số hoặc mảng;
+- ``deviation``: δ_min và các góc tới hạn (``"curve": true`` để lấy cả δ(θ₁));
+- ``index``: n(λ) của thủy tinh trong danh mục (``glass``, ``wavelength``);
+- ``inverse``: n₂ từ ``delta_min`` và ``A`` (tùy chọn ``n1``, ``sigma_delta``);
+- ``render``: ảnh PNG/SVG/PDF của cảnh (base64, hoặc ghi ra ``path``);
+- ``ping``, ``stats``.
+
+Mảng trong yêu cầu và phản hồi mặc định là list JSON (NaN -> null). Với
+``"encoding": "base64"`` các mảng kết quả được trả về dạng
+``{"dtype": "<f8", "shape": [...], "data": "<base64>"}`` (``decode_array``) -
+nhanh hơn nhiều lần so với in từng số thực; mảng đầu vào nhận được cả hai dạng.
+
+Front end asyncio đọc liên tục nên client có thể gửi nhiều yêu cầu mà không
+chờ (pipelining); phản hồi có thể về không theo thứ tự, ghép bằng ``id``. Mỗi
+kết nối có tối đa ``max_inflight`` yêu cầu đang xử lý - quá số đó service
+ngừng đọc và bộ đệm socket đầy sẽ chặn client (backpressure). Tính toán chạy
+trên thread pool (NumPy nhả GIL) dùng chung cache δ(θ₁) và danh mục thủy
+tinh; render chạy trên process pool riêng giữ sẵn figure giữa các lần gọi.
+
+Ví dụ::
+
+    python -m prism.service serve --socket /tmp/prism.sock
+    python -m prism.service load --requests 20000 --concurrency 64 --batch 100
+"""
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from prism import physics
+from prism.deviation import DeviationEngine
+
+# Độ dài tối đa một dòng yêu cầu/phản hồi (byte); StreamReader đọc trước tối
+# đa 2 lần giá trị này trước khi tạm ngừng đọc socket
+LINE_LIMIT = 4 << 20
+
+# Số yêu cầu đang xử lý tối đa trên mỗi kết nối
+MAX_INFLIGHT = 64
+
+
+class ServiceError(Exception):
+    """Service trả về lỗi cho một yêu cầu"""
+
+
+def encode_array(values):
+    """Mảng NumPy -> dict JSON chứa dữ liệu nhị phân base64"""
+    values = np.ascontiguousarray(values)
+    return {"dtype": values.dtype.str, "shape": list(values.shape),
+            "data": base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def decode_array(value):
+    """Ngược lại của ``encode_array``; list hoặc số được chuyển thẳng thành mảng"""
+    if isinstance(value, dict):
+        data = base64.b64decode(value['data'])
+        return np.frombuffer(data, dtype=value['dtype']).reshape(value['shape'])
+    return np.asarray([np.nan if v is None else v for v in value] if isinstance(value, list)
+                      else value, dtype=float)
+
+
+def _array(request, name, default=None):
+    value = request.get(name, default)
+    if value is None:
+        raise ValueError(f"thieu tham so '{name}'")
+    if isinstance(value, dict):
+        return decode_array(value).astype(float, copy=False)
+    return np.asarray(value, dtype=float)
+
+
+def _output(request, values, dtype=float):
+    """Mảng kết quả theo ``encoding`` của yêu cầu"""
+    values = np.asarray(values, dtype=dtype)
+    if request.get('encoding') == 'base64' and values.ndim:
+        return encode_array(values)
+    if values.dtype != float:
+        return values.tolist()
+    # NaN không hợp lệ trong JSON chuẩn -> null
+    if values.ndim == 0:
+        value = float(values)
+        return None if value != value else value
+    return [None if value != value else value for value in values.tolist()]
+
+
+def op_rays(service, request):
+    rays = physics.solve_prism_batch(_array(request, 'n1', 1.0), _array(request, 'n2', 1.5),
+                                     _array(request, 'theta1'), _array(request, 'A', 60.0),
+                                     workers=1)
+    return {"r1": _output(request, rays.r1), "r2": _output(request, rays.r2),
+            "theta2": _output(request, rays.theta2), "delta": _output(request, rays.delta),
+            "status": _output(request, rays.status, np.int8)}
+
+
+def op_deviation(service, request):
+    curve = service.engine.curve(float(request.get('n1', 1.0)), float(request.get('n2', 1.5)),
+                                 float(request.get('A', 60.0)))
+    result = {"theta1_min": curve.theta1_min, "delta_min": curve.delta_min,
+              "cutoffs": curve.cutoffs}
+    if request.get('curve'):
+        result["theta1"] = _output(request, curve.theta1)
+        result["delta"] = _output(request, curve.delta)
+    return result
+
+
+def op_index(service, request):
+    from prism.catalog import load_catalog
+    catalog = load_catalog(request.get('catalog'))
+    glass = request.get('glass')
+    if glass is None:
+        raise ValueError("thieu tham so 'glass'")
+    return {"n": _output(request, catalog.index(glass, _array(request, 'wavelength')))}
+
+
+def op_inverse(service, request):
+    from prism.inverse import index_from_min_deviation
+    result = index_from_min_deviation(_array(request, 'delta_min'), _array(request, 'A'),
+                                      _array(request, 'n1', 1.0),
+                                      sigma_delta=float(request.get('sigma_delta', 0.0)))
+    return {"n2": _output(request, result.n2), "sigma": _output(request, result.sigma),
+            "converged": _output(request, result.converged, bool)}
+
+
+def op_ping(service, request):
+    return {"pid": os.getpid()}
+
+
+def op_stats(service, request):
+    return service.stats()
+
+
+OPS = {
+    'rays': op_rays,
+    'deviation': op_deviation,
+    'index': op_index,
+    'inverse': op_inverse,
+    'ping': op_ping,
+    'stats': op_stats,
+}
+
+
+def render(request):
+    """Render một cảnh trong process render, trả về ảnh base64 (hoặc đường dẫn đã ghi)"""
+    from prism.export import ExportJob, render_job
+    from prism.scene import SceneState
+
+    model = SceneState.dispersion_model
+    if request.get('glass'):
+        from prism.catalog import CatalogGlass
+        model = CatalogGlass(request['glass'])
+    state = SceneState(n1=float(request.get('n1', SceneState.n1)),
+                       n2=float(request.get('n2', SceneState.n2)),
+                       theta1=float(request.get('theta1', SceneState.theta1)),
+                       prism_angle=float(request.get('A', SceneState.prism_angle)),
+                       show_dispersion=request.get('mode', 'single') == 'dispersion',
+                       dispersion_model=model,
+                       tilt=float(request.get('tilt', SceneState.tilt)))
+    fmt = request.get('format', 'png')
+    dpi = int(request.get('dpi', 100))
+
+    if request.get('path'):
+        return {"path": render_job(ExportJob(request['path'], state, dpi=dpi, format=fmt))}
+    with tempfile.TemporaryDirectory() as directory:
+        path = render_job(ExportJob(os.path.join(directory, f'scene.{fmt}'), state,
+                                    dpi=dpi, format=fmt))
+        with open(path, 'rb') as f:
+            data = f.read()
+    return {"format": fmt, "data": base64.b64encode(data).decode('ascii')}
+
+
+class PrismService:
+    """Front end asyncio và các pool tính toán phía sau"""
+
+    def __init__(self, workers=None, render_workers=1, max_inflight=MAX_INFLIGHT):
+        self.workers = workers or os.cpu_count() or 1
+        self.render_workers = render_workers
+        self.max_inflight = max_inflight
+        self.engine = DeviationEngine()
+        self.requests = 0
+        self.errors = 0
+        self.inflight = 0
+        self.connections = 0
+        self.started = time.time()
+
+        self._threads = ThreadPoolExecutor(max_workers=self.workers,
+                                           thread_name_prefix='prism-service')
+        self._renderer = None
+
+    def _render_pool(self):
+        if self._renderer is None:
+            # spawn: process render không kế thừa vòng lặp sự kiện và các luồng
+            self._renderer = ProcessPoolExecutor(
+                max_workers=self.render_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._renderer
+
+    def stats(self):
+        info = self.engine.cache_info()
+        return {"requests": self.requests, "errors": self.errors, "inflight": self.inflight,
+                "connections": self.connections, "uptime": time.time() - self.started,
+                "deviation_cache": {"hits": info.hits, "misses": info.misses,
+                                    "size": info.currsize}}
+
+    async def dispatch(self, request):
+        """Kết quả của một yêu cầu (đã giải mã); lỗi được ném ra"""
+        op = request.get('op')
+        loop = asyncio.get_running_loop()
+        if op == 'render':
+            return await loop.run_in_executor(self._render_pool(), render, request)
+        handler = OPS.get(op)
+        if handler is None:
+            raise ValueError(f"op khong hop le '{op}' (chon: {', '.join([*OPS, 'render'])})")
+        return await loop.run_in_executor(self._threads, handler, self, request)
+
+    async def _respond(self, line, writer, lock, window):
+        request_id = None
+        try:
+            self.inflight += 1
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("yeu cau phai la mot object JSON")
+                request_id = request.get('id')
+                response = {"id": request_id, "ok": True,
+                            "result": await self.dispatch(request)}
+            except Exception as e:
+                self.errors += 1
+                message = e.args[0] if isinstance(e, KeyError) and e.args else e
+                response = {"id": request_id, "ok": False,
+                            "error": f"{type(e).__name__}: {message}"}
+            finally:
+                self.requests += 1
+                self.inflight -= 1
+
+            data = json.dumps(response, ensure_ascii=False, separators=(',', ':')).encode()
+            async with lock:
+                writer.write(data + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            window.release()
+
+    async def handle(self, reader, writer):
+        """Phục vụ một kết nối đến khi client đóng"""
+        self.connections += 1
+        window = asyncio.Semaphore(self.max_inflight)
+        lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                # Đủ max_inflight yêu cầu đang xử lý thì ngừng đọc (backpressure)
+                await window.acquire()
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    window.release()
+                    break           # Dòng dài quá LINE_LIMIT - đóng kết nối
+                if not line:
+                    window.release()
+                    break
+                if not line.strip():
+                    window.release()
+                    continue
+                task = asyncio.create_task(self._respond(line, writer, lock, window))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            # Trả lời nốt các yêu cầu đã nhận trước khi đóng
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    async def serve_unix(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(self.handle, path, limit=LINE_LIMIT)
+        print(f"Dang phuc vu tai {path}", file=sys.stderr, flush=True)
+        try:
+            async with server:
+                await _until_stopped()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+    async def serve_stdio(self):
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+        if stat.S_ISFIFO(mode) or stat.S_ISSOCK(mode) or stat.S_ISCHR(mode):
+            loop = asyncio.get_running_loop()
+            reader = asyncio.StreamReader(limit=LINE_LIMIT)
+            await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+        else:
+            # File thường (``serve --stdio < yeu_cau.ndjson``): pipe transport không nhận
+            reader = _StdinReader()
+        await self.handle(reader, _StdoutWriter())
+
+    def shutdown(self):
+        self._threads.shutdown(wait=True)
+        if self._renderer is not None:
+            self._renderer.shutdown(wait=True)
+            self._renderer = None
+
+
+class _StdinReader:
+    """Đọc từng dòng stdin là file thường trong thread (thay cho pipe transport)
+
+    Chỉ đọc khi ``handle`` gọi ``readline`` nên vẫn giữ backpressure theo
+    ``max_inflight``; dòng dài quá ``LINE_LIMIT`` gây ``ValueError`` như
+    ``StreamReader``.
+    """
+
+    async def readline(self):
+        loop = asyncio.get_running_loop()
+        line = await loop.run_in_executor(None, sys.stdin.buffer.readline, LINE_LIMIT + 1)
+        if len(line) > LINE_LIMIT:
+            raise ValueError("dong yeu cau dai qua LINE_LIMIT")
+        return line
+
+
+class _StdoutWriter:
+    """Ghi phản hồi ra stdout (có thể là file thường, không dùng được pipe transport)
+
+    Ghi đồng bộ: khi pipe đầu ra đầy, vòng lặp sự kiện dừng lại và không đọc
+    thêm yêu cầu - cũng là backpressure.
+    """
+
+    def write(self, data):
+        sys.stdout.buffer.write(data)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+
+async def _until_stopped():
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    await stop.wait()
+
+
+class Client:
+    """Client đồng bộ đơn giản qua Unix socket (mỗi lần gọi chờ phản hồi)"""
+
+    def __init__(self, path):
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(path)
+        self._file = self._socket.makefile('rwb')
+        self._next_id = 0
+
+    def call(self, op, **params):
+        """Gửi một yêu cầu, trả về ``result``; lỗi của service thành ``ServiceError``"""
+        self._next_id += 1
+        request = {"id": self._next_id, "op": op, **params}
+        self._file.write(json.dumps(request).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("service da dong ket noi")
+        response = json.loads(line)
+        if not response['ok']:
+            raise ServiceError(response['error'])
+        return response['result']
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def make_requests(op, count, batch=100, seed=0, encoding='json'):
+    """Các dòng yêu cầu (bytes) ngẫu nhiên nhưng tái lập được cho bộ tạo tải"""
+    rng = np.random.default_rng(seed)
+    lines = []
+    for i in range(count):
+        if op == 'rays':
+            request = {"op": op, "n2": float(rng.uniform(1.3, 1.9)),
+                       "theta1": rng.uniform(0, 85, batch).round(4).tolist(),
+                       "A": float(rng.uniform(30, 60))}
+        elif op == 'deviation':
+            # Tập tham số nhỏ lặp lại để cache δ(θ₁) có tác dụng
+            request = {"op": op, "n2": round(float(rng.uniform(1.3, 1.9)), 2),
+                       "A": float(rng.integers(30, 61))}
+        elif op == 'render':
+            request = {"op": op, "theta1": float(rng.uniform(20, 80)), "dpi": 50}
+        else:
+            request = {"op": op}
+        request["id"] = i
+        if encoding != 'json':
+            request["encoding"] = encoding
+        lines.append(json.dumps(request).encode() + b'\n')
+    return lines
+
+
+async def _drive(path, requests, depth, latencies, errors):
+    """Gửi ``requests`` (``(id, dòng)``) qua một kết nối, giữ tối đa ``depth``
+    yêu cầu chưa có phản hồi"""
+    reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+    window = asyncio.Semaphore(depth)
+    sent = {}
+
+    async def receive():
+        for _ in range(len(requests)):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError("service da dong ket noi")
+            response = json.loads(line)
+            latencies.append(time.perf_counter() - sent.pop(response['id']))
+            if not response['ok']:
+                errors.append(response['error'])
+            window.release()
+
+    receiver = asyncio.create_task(receive())
+    for request_id, line in requests:
+        await window.acquire()
+        sent[request_id] = time.perf_counter()
+        writer.write(line)
+        await writer.drain()
+    await receiver
+    writer.close()
+
+
+async def load(path, lines, concurrency=64, connections=4):
+    """Chạy bộ tạo tải, trả về ``(elapsed, latencies (s), errors)``"""
+    connections = max(1, min(connections, concurrency))
+    depth = max(1, concurrency // connections)
+    requests = list(enumerate(lines))
+    parts = [requests[i::connections] for i in range(connections)]
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(_drive(path, part, depth, latencies, errors)
+                           for part in parts if part))
+    return time.perf_counter() - start, np.array(latencies), errors
+
+
+def _start_local(workers):
+    """Khởi động một service cục bộ trên socket tạm, trả về ``(process, path)``"""
+    path = os.path.join(tempfile.mkdtemp(prefix='prism-'), 'service.sock')
+    command = [sys.executable, '-m', 'prism.service', 'serve', '--socket', path]
+    if workers:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise RuntimeError("khong khoi dong duoc service")
+        time.sleep(0.05)
+    return process, path
+
+
+def _cmd_serve(args):
+    service = PrismService(args.workers, args.render_workers, args.max_inflight)
+    try:
+        if args.stdio:
+            asyncio.run(service.serve_stdio())
+        else:
+            asyncio.run(service.serve_unix(args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.shutdown()
+    return 0
+
+
+def _cmd_load(args):
+    lines = make_requests(args.op, args.requests, args.batch, args.seed, args.encoding)
+    process, path = None, args.socket
+    if path is None:
+        process, path = _start_local(args.workers)
+    try:
+        # Làm nóng (cache, import, figure render) trước khi đo
+        asyncio.run(load(path, lines[:args.warmup], args.concurrency, args.connections))
+        elapsed, latencies, errors = asyncio.run(
+            load(path, lines, args.concurrency, args.connections))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    count = len(latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000
+    print(f"{count:,} yeu cau '{args.op}' trong {elapsed:.2f}s: {count / elapsed:,.0f} yeu cau/s"
+          + (f", {count * args.batch / elapsed / 1e6:.2f} trieu tia/s" if args.op == 'rays'
+             else ''))
+    print(f"do tre (ms): p50 {p50:.2f}  p90 {p90:.2f}  p99 {p99:.2f}  "
+          f"max {latencies.max() * 1000:.2f}")
+    if errors:
+        print(f"{len(errors)} loi, vd: {errors[0]}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m prism.service', description="Dich vu tinh toan lang kinh cuc bo")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="chay service")
+    where = serve.add_mutually_exclusive_group(required=True)
+    where.add_argument('--socket', help="duong dan Unix socket")
+    where.add_argument('--stdio', action='store_true', help="doc stdin, ghi stdout")
+    serve.add_argument('--workers', type=int, default=None,
+                       help="so luong tinh toan (mac dinh: so nhan CPU)")
+    serve.add_argument('--render-workers', type=int, default=1)
+    serve.add_argument('--max-inflight', type=int, default=MAX_INFLIGHT,
+                       help="so yeu cau dang xu ly toi da moi ket noi")
+    serve.set_defaults(func=_cmd_serve)
+
+    loadgen = commands.add_parser('load', help="bo tao tai: do yeu cau/s va do tre")
+    loadgen.add_argument('--socket', help="service dang chay (mac dinh: tu khoi dong mot service)")
+    loadgen.add_argument('--op', choices=['rays', 'deviation', 'render', 'ping'], default='rays')
+    loadgen.add_argument('--requests', type=int, default=10000)
+    loadgen.add_argument('--batch', type=int, default=100, help="so tia moi yeu cau 'rays'")
+    loadgen.add_argument('--encoding', choices=['json', 'base64'], default='json',
+                         help="dang mang trong phan hoi")
+    loadgen.add_argument('--concurrency', type=int, default=64,
+                         help="tong so yeu cau chua co phan hoi")
+    loadgen.add_argument('--connections', type=int, default=4)
+    loadgen.add_argument('--warmup', type=int, default=200)
+    loadgen.add_argument('--workers', type=int, default=None,
+                         help="so luong tinh toan cua service tu khoi dong")
+    loadgen.add_argument('--seed', type=int, default=0)
+    loadgen.set_defaults(func=_cmd_load)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,498 @@
+"""Dò tia xiên 3D qua lăng kính tam giác có chiều dài hữu hạn
+
+Các module khác chỉ xét tia nằm trong mặt phẳng tiết diện (tia kinh tuyến). Ở
+đây lăng kính là khối lăng trụ: tiết diện ``raytrace.prism_vertices`` kéo dài
+theo trục z từ -length/2 đến length/2, gồm 3 mặt bên và 2 mặt đáy. Tia có
+hướng 3D bất kỳ (chùm nghiêng, chùm hội tụ/phân kỳ) được khúc xạ theo định
+luật Snell dạng vector, phản xạ toàn phần khi cần, nên góc lệch và tán sắc của
+tia xiên khác với công thức 2D đúng như thực tế.
+
+Khối lồi được mô tả bằng các mặt phẳng ``n·x = d`` (pháp tuyến hướng ra
+ngoài); giao tia với khối là t vào lớn nhất / t ra nhỏ nhất qua 5 mặt, tính
+trên cả chùm cùng lúc - không có vòng lặp Python theo từng tia. Kết quả chiếu lên mặt
+phẳng xy là đúng hình vẽ 2D quen thuộc; điểm chạm trên màn vuông góc với tia
+chính cho ra giản đồ vết (spot diagram).
+
+Ví dụ::
+
+    python -m prism.skew --rays 2e6 --tilt 15                  # thong luong, delta 3D
+    python -m prism.skew --tilt 20 --spread 3 --glass N-SF11 --spot spot.png
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from prism import physics, raytrace
+from prism.dispersion import VISIBLE_RANGE, CauchyModel, wavelength_to_rgb
+
+# Chỉ số mặt của ``prism_planes``: 3 mặt bên giữ chỉ số cạnh của ``raytrace``
+FACE_BASE = raytrace.FACE_BASE
+FACE_EXIT = raytrace.FACE_EXIT
+FACE_ENTRY = raytrace.FACE_ENTRY
+FACE_BACK = 3     # Mặt đáy z = -length/2
+FACE_FRONT = 4    # Mặt đáy z = +length/2
+
+# Số tia mỗi chunk khi dò chùm lớn (vừa cache, nhanh nhất khi đo)
+CHUNK_SIZE = 1 << 14
+
+# Khoảng cách tối thiểu tới mặt vào, tránh tia vừa rời mặt bị tính là chạm lại
+_EPS = 1e-12
+
+
+def prism_planes(A, height=1.5, length=3.0):
+    """Các mặt phẳng của lăng kính: ``(normals (5, 3), offsets (5,))``
+
+    Điểm x nằm trong lăng kính khi ``normals @ x <= offsets`` với mọi mặt.
+    """
+    vertices = raytrace.prism_vertices(A, height)
+    edges = np.roll(vertices, -1, axis=0) - vertices
+    sides = np.stack([edges[:, 1], -edges[:, 0]], axis=-1)
+    sides /= np.hypot(sides[:, 0], sides[:, 1])[:, None]
+
+    normals = np.zeros((5, 3))
+    normals[:3, :2] = sides
+    normals[FACE_BACK, 2] = -1.0
+    normals[FACE_FRONT, 2] = 1.0
+    offsets = np.empty(5)
+    offsets[:3] = np.einsum('ij,ij->i', sides, vertices)
+    offsets[3:] = length / 2
+    return normals, offsets
+
+
+def skew_direction(A, theta1, tilt=0.0):
+    """Hướng tia tới (..., 3): góc θ₁ trong mặt tiết diện, nghiêng ``tilt`` độ ra khỏi nó
+
+    Với ``tilt = 0`` trùng với ``raytrace.incident_direction`` (thêm z = 0).
+    """
+    planar = raytrace.incident_direction(A, theta1)
+    tilt = np.radians(np.asarray(tilt, dtype=float))
+    planar, tilt = np.broadcast_arrays(planar, tilt[..., None])
+    return np.concatenate([np.cos(tilt) * planar, np.sin(tilt[..., :1])], axis=-1)
+
+
+def entry_point(A, height=1.5):
+    """Tâm mặt vào (z = 0) - điểm tia chính chạm lăng kính"""
+    vertices = raytrace.prism_vertices(A, height)
+    return np.append((vertices[0] + vertices[2]) / 2, 0.0)
+
+
+def _basis(direction):
+    # Hai vector đơn vị vuông góc với ``direction``: u nằm ngang (z = 0), v hướng lên theo z
+    d = np.asarray(direction, dtype=float)
+    u = np.array([-d[1], d[0], 0.0])
+    if np.hypot(u[0], u[1]) < 1e-12:
+        u = np.array([1.0, 0.0, 0.0])
+    u /= np.linalg.norm(u)
+    return u, np.cross(d, u)
+
+
+def skew_beam(A, theta1, tilt, count, spread=0.0, width=0.0, height=1.5, distance=2.0,
+              rng=None):
+    """Chùm ``count`` tia quanh tia chính (θ₁, ``tilt``) nhắm vào tâm mặt vào
+
+    Hướng tia phân bố đều trong nón nửa góc ``spread`` (độ), gốc tia phân bố
+    đều trong đĩa đường kính ``width`` vuông góc với tia chính, cách tâm mặt vào
+    ``distance``. Trả về ``(origins, directions)`` shape (count, 3).
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    chief = skew_direction(A, theta1, tilt)
+    u, v = _basis(chief)
+
+    def disk(radius):
+        if radius <= 0:
+            return np.zeros((count, 1)), np.zeros((count, 1))
+        r = radius * np.sqrt(rng.random(count))
+        phi = 2 * np.pi * rng.random(count)
+        return (r * np.cos(phi))[:, None], (r * np.sin(phi))[:, None]
+
+    a, b = disk(math.tan(math.radians(spread)))
+    directions = chief + a * u + b * v
+    directions /= np.linalg.norm(directions, axis=1)[:, None]
+    x, y = disk(width / 2)
+    origins = entry_point(A, height) - distance * chief + x * u + y * v
+    return origins, directions
+
+
+def _dot(normal, x, y, z):
+    # Bỏ qua thành phần 0 của pháp tuyến (mặt bên không có z, mặt đáy chỉ có z)
+    terms = [c * v for c, v in zip(normal, (x, y, z)) if c != 0]
+    return sum(terms[1:], terms[0])
+
+
+def trace_skew(planes, origins, directions, n_outside, n_inside,
+               max_bounces=10, escape_length=2.0, rng=None, record_paths=True):
+    """Dò chùm tia 3D qua khối lồi ``planes`` (kết quả ``prism_planes``)
+
+    Tham số và kết quả như ``raytrace.trace_rays`` nhưng tọa độ có 3 thành
+    phần: ``origins``/``directions`` shape (N, 3) hoặc (3,), ``points`` shape
+    (N, max_bounces + 2, 3); ``faces`` dùng chỉ số ``FACE_*`` của module này.
+
+    Bên trong, mỗi thành phần x/y/z là một mảng 1D riêng và các mặt được xét
+    lần lượt (chỉ 5 mặt) nên mọi phép tính là phép toán liên tục trên mảng dài
+    N. Khối lồi nên tia đã ra ngoài sau một va chạm không thể chạm lại: tia
+    được kết thúc ngay thay vì chờ thêm một lượt giao như bản 2D.
+    """
+    normals, offsets = (np.asarray(p, dtype=float) for p in planes)
+    origins = np.atleast_2d(np.asarray(origins, dtype=float))
+    directions = np.atleast_2d(np.asarray(directions, dtype=float))
+    origins, directions = np.broadcast_arrays(origins, directions)
+    count = len(origins)
+
+    n_outside = np.broadcast_to(np.asarray(n_outside, dtype=float), (count,))
+    n_inside = np.broadcast_to(np.asarray(n_inside, dtype=float), (count,))
+
+    points = None
+    if record_paths:
+        points = np.full((count, max_bounces + 2, 3), np.nan)
+        points[:, 0] = origins
+    counts = np.ones(count, dtype=np.int64)
+    faces = np.full((count, max_bounces + 1), -1, dtype=np.int64)
+    escaped = np.zeros(count, dtype=bool)
+    reflections = np.zeros(count, dtype=np.int64)
+    transmission = np.ones(count)
+    final_pos = origins.copy()
+    final_dirs = np.empty((count, 3))
+
+    active = np.arange(count)
+    px, py, pz = (origins[:, i].copy() for i in range(3))
+    dx, dy, dz = (directions[:, i].copy() for i in range(3))
+    length = np.sqrt(dx * dx + dy * dy + dz * dz)
+    dx /= length
+    dy /= length
+    dz /= length
+    final_dirs[:] = np.stack([dx, dy, dz], axis=-1)
+    inside = np.ones(count, dtype=bool)
+    for normal, offset in zip(normals, offsets):
+        inside &= _dot(normal, px, py, pz) < offset
+
+    def finish(rays, out, x, y, z, ux, uy, uz):
+        # Kết thúc các tia ``rays``; tia ở ngoài (``out``) được kéo dài để vẽ
+        final_pos[rays] = np.stack([x, y, z], axis=-1)
+        final_dirs[rays] = np.stack([ux, uy, uz], axis=-1)
+        escaped[rays] = out
+        if record_paths and out.any():
+            leaving = rays[out]
+            points[leaving, counts[leaving]] = np.stack(
+                [x[out] + escape_length * ux[out], y[out] + escape_length * uy[out],
+                 z[out] + escape_length * uz[out]], axis=-1)
+        counts[rays[out]] += 1
+
+    for bounce in range(max_bounces + 1):
+        if active.size == 0:
+            break
+
+        # Tia đi ra khỏi mặt (cos > 0) rời khối tại t nhỏ nhất; tia đi vào mặt
+        # (cos < 0) chỉ ở trong khối sau t lớn nhất (Kay-Kajiya cho khối lồi)
+        t_leave = np.full(active.size, np.inf)
+        t_enter = np.full(active.size, -np.inf)
+        leave_face = np.zeros(active.size, dtype=np.int64)
+        enter_face = np.zeros(active.size, dtype=np.int64)
+        missed = np.zeros(active.size, dtype=bool)
+        # Từ lượt thứ hai hầu hết tia đều ở trong khối: chỉ cần mặt ra
+        entering = not inside.all()
+        for e, (normal, offset) in enumerate(zip(normals, offsets)):
+            cos = _dot(normal, dx, dy, dz)
+            gap = offset - _dot(normal, px, py, pz)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = gap / cos
+            closer = (cos > 0) & (t < t_leave)
+            np.copyto(t_leave, t, where=closer)
+            np.copyto(leave_face, e, where=closer)
+            if entering:
+                farther = (cos < 0) & (t > t_enter)
+                np.copyto(t_enter, t, where=farther)
+                np.copyto(enter_face, e, where=farther)
+                # Tia song song và nằm ngoài một mặt không bao giờ chạm khối
+                missed |= (cos == 0) & (gap < 0)
+
+        hit = inside | ((t_enter > _EPS) & (t_enter < t_leave) & ~missed)
+        if bounce == max_bounces:
+            # Hết lượt: tia còn trong lăng kính dừng ở điểm va chạm cuối cùng
+            hit[:] = False
+
+        if not hit.all():
+            done = ~hit
+            finish(active[done], ~inside[done], px[done], py[done], pz[done],
+                   dx[done], dy[done], dz[done])
+            if bounce == max_bounces:
+                break
+            active, inside = active[hit], inside[hit]
+            px, py, pz, dx, dy, dz = (v[hit] for v in (px, py, pz, dx, dy, dz))
+            t_leave, t_enter = t_leave[hit], t_enter[hit]
+            leave_face, enter_face = leave_face[hit], enter_face[hit]
+
+        rays = active
+        t_hit = np.where(inside, t_leave, t_enter)
+        face = np.where(inside, leave_face, enter_face)
+        px += t_hit * dx
+        py += t_hit * dy
+        pz += t_hit * dz
+        if record_paths:
+            points[rays, counts[rays]] = np.stack([px, py, pz], axis=-1)
+        faces[rays, bounce] = face
+        counts[rays] += 1
+
+        # Snell dạng vector - cùng công thức với ``raytrace.trace_rays``
+        nx, ny, nz = normals[face].T
+        cos_out = dx * nx + dy * ny + dz * nz
+        sign = np.where(cos_out > 0, -1.0, 1.0)
+        cos_i = np.abs(cos_out)
+
+        n_from = np.where(inside, n_inside[rays], n_outside[rays])
+        n_to = np.where(inside, n_outside[rays], n_inside[rays])
+        eta = n_from / n_to
+        k = 1 - eta ** 2 * (1 - cos_i ** 2)
+        reflect = k < 0
+        cos_t = np.sqrt(np.maximum(k, 0))
+        reflectance = raytrace.fresnel_reflectance(n_from, n_to, cos_i, cos_t)
+        if rng is not None:
+            reflect |= rng.random(rays.size) < reflectance
+        else:
+            transmission[rays] *= np.where(reflect, 1.0, 1.0 - reflectance)
+
+        # Phản xạ: d + 2cos_i·f; khúc xạ: η·d + (η·cos_i - cos_t)·f (f quay về phía tia tới)
+        scale = np.where(reflect, 1.0, eta)
+        along = sign * np.where(reflect, 2 * cos_i, eta * cos_i - cos_t)
+        dx = scale * dx + along * nx
+        dy = scale * dy + along * ny
+        dz = scale * dz + along * nz
+        length = np.sqrt(dx * dx + dy * dy + dz * dz)
+        dx /= length
+        dy /= length
+        dz /= length
+
+        inside = np.where(reflect, inside, ~inside)
+        reflections[rays] += reflect
+
+        # Tia đã ra ngoài khối lồi không gặp lại mặt nào
+        if not inside.all():
+            out = ~inside
+            finish(rays[out], out[out], px[out], py[out], pz[out], dx[out], dy[out], dz[out])
+            px, py, pz, dx, dy, dz = (v[inside] for v in (px, py, pz, dx, dy, dz))
+            rays, inside = rays[inside], inside[inside]
+        active = rays
+
+    return raytrace.TraceResult(points, counts, faces, final_pos, final_dirs, escaped,
+                                reflections, transmission)
+
+
+def deviation(incident, outgoing):
+    """Góc lệch 3D (độ) giữa hướng tia tới và tia ra"""
+    incident = np.asarray(incident, dtype=float)
+    outgoing = np.asarray(outgoing, dtype=float)
+    cos = np.sum(incident * outgoing, axis=-1) / (
+        np.linalg.norm(incident, axis=-1) * np.linalg.norm(outgoing, axis=-1))
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def project_xy(points):
+    """Chiếu đường đi 3D lên mặt phẳng tiết diện - dùng được với các hàm vẽ 2D"""
+    return np.asarray(points)[..., :2]
+
+
+def screen_coordinates(positions, directions, center, normal):
+    """Điểm chạm của các tia trên màn phẳng qua ``center``, pháp tuyến ``normal``
+
+    Trả về ``(coords (N, 2), valid (N,))``: tọa độ theo trục ngang u (song song
+    mặt xy) và trục v của màn; ``valid`` là False với tia không đi tới màn.
+    """
+    positions = np.asarray(positions, dtype=float)
+    directions = np.asarray(directions, dtype=float)
+    normal = np.asarray(normal, dtype=float) / np.linalg.norm(normal)
+    u, v = _basis(normal)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((center - positions) @ normal) / (directions @ normal)
+    valid = np.isfinite(t) & (t > 0)
+    hits = positions + np.where(valid, t, 0.0)[:, None] * directions - center
+    return np.stack([hits @ u, hits @ v], axis=-1), valid
+
+
+def plot_spot(ax, coords, wavelengths, max_points=50_000):
+    """Vẽ giản đồ vết lên ``ax``, tô màu theo bước sóng
+
+    Chùm rất lớn được lấy mẫu đều còn tối đa ``max_points`` điểm.
+    """
+    step = max(1, len(coords) // max_points)
+    coords, wavelengths = coords[::step], np.asarray(wavelengths)[::step]
+    ax.scatter(coords[:, 0], coords[:, 1], s=1, c=wavelength_to_rgb(wavelengths),
+               linewidths=0, alpha=0.6)
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.grid(True, alpha=0.3)
+    ax.set_xlabel('u (ngang)', color='white')
+    ax.set_ylabel('v', color='white')
+
+
+def plot_projection(ax, result, A, height, wavelengths, max_rays=300):
+    """Vẽ hình chiếu xy của đường đi (tối đa ``max_rays`` tia) cùng tiết diện lăng kính"""
+    import matplotlib.patches as patches
+    from matplotlib.collections import LineCollection
+
+    vertices = raytrace.prism_vertices(A, height)
+    ax.add_patch(patches.Polygon(vertices, closed=True, facecolor='lightblue', alpha=0.3,
+                                 edgecolor='cyan', linewidth=2))
+    step = max(1, len(result.counts) // max_rays)
+    paths = project_xy(result.points[::step])
+    segments = [path[:count] for path, count in zip(paths, result.counts[::step])]
+    colors = wavelength_to_rgb(np.asarray(wavelengths)[::step])
+    ax.add_collection(LineCollection(segments, colors=colors, linewidths=0.8, alpha=0.7))
+    ax.autoscale_view()
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.set_facecolor('#16213e')
+    ax.grid(True, alpha=0.3)
+    ax.set_xlabel('X (đơn vị tùy ý)', color='white')
+    ax.set_ylabel('Y (đơn vị tùy ý)', color='white')
+
+
+def trace_chunks(planes, origins, directions, n_outside, n_inside, chunk_size=CHUNK_SIZE,
+                 workers=None, **kwargs):
+    """``trace_skew`` cho chùm lớn theo từng chunk (không ghi đường đi)
+
+    Trả về ``(positions, directions, escaped, transmission)`` của cả chùm. Các
+    chunk độc lập và ghi vào các đoạn rời nhau của mảng kết quả, nên được chia
+    cho ``workers`` luồng (mặc định: số nhân CPU) như ``solve_prism_batch``.
+    """
+    count = len(origins)
+    n_outside = np.broadcast_to(np.asarray(n_outside, dtype=float), (count,))
+    n_inside = np.broadcast_to(np.asarray(n_inside, dtype=float), (count,))
+    positions = np.empty((count, 3))
+    final = np.empty((count, 3))
+    escaped = np.empty(count, dtype=bool)
+    transmission = np.empty(count)
+
+    def run(begin):
+        part = slice(begin, begin + chunk_size)
+        result = trace_skew(planes, origins[part], directions[part], n_outside[part],
+                            n_inside[part], record_paths=False, **kwargs)
+        positions[part] = result.positions
+        final[part] = result.directions
+        escaped[part] = result.escaped
+        transmission[part] = result.transmission
+
+    starts = range(0, count, chunk_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or len(starts) < 2:
+        for begin in starts:
+            run(begin)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(run, starts))
+    return positions, final, escaped, transmission
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Do tia xien 3D qua lang kinh co chieu dai huu han")
+    parser.add_argument('--rays', type=float, default=1e6)
+    parser.add_argument('--n1', type=float, default=1.0)
+    parser.add_argument('--n2', type=float, default=None,
+                        help="chiet suat tai 587.6 nm (mac dinh: 1.5 hoac n_d cua --glass)")
+    parser.add_argument('--glass', help="thuy tinh trong danh muc (vd N-SF11)")
+    parser.add_argument('--theta1', type=float, default=45.0, help="goc toi trong tiet dien (do)")
+    parser.add_argument('--A', type=float, default=60.0)
+    parser.add_argument('--tilt', type=float, default=0.0,
+                        help="goc nghieng cua tia chinh ra khoi tiet dien (do)")
+    parser.add_argument('--spread', type=float, default=1.0, help="nua goc non cua chum (do)")
+    parser.add_argument('--width', type=float, default=0.2, help="duong kinh chum")
+    parser.add_argument('--height', type=float, default=1.5)
+    parser.add_argument('--length', type=float, default=3.0, help="chieu dai lang kinh (truc z)")
+    parser.add_argument('--screen', type=float, default=5.0,
+                        help="khoang cach tu diem ra cua tia chinh toi man")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="so luong (mac dinh: so nhan CPU)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--spot', help="luu hinh chieu xy va gian do vet ra file anh")
+    args = parser.parse_args(argv)
+
+    model, n2 = CauchyModel(), args.n2
+    if args.glass:
+        from prism.catalog import CatalogGlass, load_catalog
+        catalog = load_catalog()
+        if args.glass not in catalog:
+            print(f"Loi: khong co thuy tinh '{args.glass}' trong danh muc", file=sys.stderr)
+            return 1
+        model = CatalogGlass(catalog.names[catalog.row(args.glass)])
+        if n2 is None:
+            n2 = model.nd
+    if n2 is None:
+        n2 = 1.5
+
+    planes = prism_planes(args.A, args.height, args.length)
+
+    # Tia chính tại λ_d: góc lệch 3D so với công thức 2D
+    chief_dir = skew_direction(args.A, args.theta1, args.tilt)
+    chief = trace_skew(planes, entry_point(args.A, args.height) - 2.0 * chief_dir, chief_dir,
+                       args.n1, n2, record_paths=False)
+    planar = physics.solve_prism_batch(args.n1, n2, args.theta1, args.A)
+    print(f"Tia chinh (tilt = {args.tilt:g} do): delta 3D = "
+          + (f"{deviation(chief_dir, chief.directions[0]):.4f} do" if chief.escaped[0]
+             else "tia khong thoat ra")
+          + (f", delta 2D = {float(planar.delta):.4f} do" if planar.status == physics.RAY_OK
+             else ", cong thuc 2D: tia khong qua mat ra"))
+
+    count = int(args.rays)
+    rng = np.random.default_rng(args.seed)
+    origins, directions = skew_beam(args.A, args.theta1, args.tilt, count, args.spread,
+                                    args.width, args.height, rng=rng)
+    wavelengths = rng.uniform(*VISIBLE_RANGE, count)
+    n_inside = model.index(wavelengths, n_ref=n2)
+
+    start = time.perf_counter()
+    positions, exit_dirs, escaped, transmission = trace_chunks(
+        planes, origins, directions, args.n1, n_inside, args.chunk_size, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"Da do {count:,} tia trong {elapsed:.2f}s ({count / elapsed / 1e6:.2f} trieu tia/s), "
+          f"thoat ra {escaped.mean():.1%}, truyen qua trung binh "
+          f"{transmission[escaped].mean() if escaped.any() else 0:.3f}")
+
+    if not args.spot:
+        return 0
+    if not chief.escaped[0]:
+        print("Loi: tia chinh khong thoat ra, khong dat duoc man", file=sys.stderr)
+        return 1
+
+    center = chief.positions[0] + args.screen * chief.directions[0]
+    coords, valid = screen_coordinates(positions[escaped], exit_dirs[escaped], center,
+                                       chief.directions[0])
+    spot_wavelengths = wavelengths[escaped][valid]
+    coords = coords[valid]
+    for label, (lo, hi) in (('xanh', (450.0, 500.0)), ('do', (620.0, 700.0))):
+        band = (spot_wavelengths >= lo) & (spot_wavelengths < hi)
+        if band.any():
+            centroid = coords[band].mean(axis=0)
+            rms = np.sqrt(((coords[band] - centroid) ** 2).sum(axis=1).mean())
+            print(f"Vet {label} ({lo:.0f}-{hi:.0f} nm): tam ({centroid[0]:+.4f}, "
+                  f"{centroid[1]:+.4f}), ban kinh RMS {rms:.4f}")
+
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from prism.scene import apply_style
+
+    apply_style()
+    fig = Figure(figsize=(14, 6.5), facecolor='#1a1a2e')
+    FigureCanvasAgg(fig)
+    fig.suptitle(f'TIA XIEN 3D: A = {args.A:g}, theta1 = {args.theta1:g}, '
+                 f'tilt = {args.tilt:g} do', fontsize=14, fontweight='bold', color='white')
+    ax_xy, ax_spot = fig.subplots(1, 2, gridspec_kw={'width_ratios': [3, 2]})
+
+    sample = slice(0, min(count, 300))
+    shown = trace_skew(planes, origins[sample], directions[sample], args.n1, n_inside[sample],
+                       escape_length=args.screen)
+    plot_projection(ax_xy, shown, args.A, args.height, wavelengths[sample])
+    ax_xy.set_title('Hinh chieu len tiet dien (xy)', color='white')
+    ax_spot.set_facecolor('#16213e')
+    plot_spot(ax_spot, coords, spot_wavelengths)
+    ax_spot.set_title(f'Gian do vet tren man (cach {args.screen:g})', color='white')
+    fig.savefig(args.spot, dpi=150, facecolor=fig.get_facecolor(), edgecolor='none')
+    print(f"Da luu gian do vet: {args.spot}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
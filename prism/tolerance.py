@@ -0,0 +1,433 @@
+"""Phân tích dung sai Monte Carlo: độ phân tán của δ và độ tách phổ
+
+Mỗi mẫu là một lăng kính "chế tạo thực" với A, n₂(λ), θ₁, n₁ lệch khỏi giá
+trị danh định theo phân bố do người dùng cho. Với mỗi mẫu tính góc lệch δ tại
+λ_d và độ tách phổ δ(λ_xanh) - δ(λ_đỏ) bằng ``solve_prism_batch``; mẫu đạt nếu
+tia đi qua được và cả hai nằm trong spec.
+
+Mẫu được chia thành các chunk chạy trên process pool; mỗi worker ghi thẳng kết
+quả vào đoạn của nó trong một mảng shared memory (không gửi mảng kết quả qua
+pipe). Process chính chỉ nhận số thứ tự chunk đã xong và tính histogram,
+phân vị, tỉ lệ đạt trên phần đã có - nên có thể hiển thị trong lúc chạy. Mỗi
+chunk có seed riêng sinh từ ``seed`` nên kết quả không phụ thuộc số worker.
+
+Ví dụ::
+
+    python -m prism.tolerance --samples 1e7 --tol A=normal:0.05 --tol n2=normal:5e-4 \\
+        --tol theta1=uniform:0.2 --spec-delta 37.5:38.5 --live
+"""
+import argparse
+import os
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from prism import physics
+from prism.dispersion import REFERENCE_WAVELENGTH, CauchyModel
+
+# Số mẫu mỗi chunk mặc định
+CHUNK_SIZE = 1 << 18
+
+# Tham số có thể có dung sai (``dispersion``: sai lệch tương đối của n(λ) - n_d)
+PARAMS = ('A', 'n1', 'n2', 'theta1', 'dispersion')
+
+DISTRIBUTIONS = ('normal', 'uniform')
+
+# Trạng thái của mẫu chưa được tính
+PENDING = 255
+
+# Phân vị báo cáo (%): trung vị và ±1σ, ±2σ, ±3σ của phân bố chuẩn
+PERCENTILES = (0.135, 2.275, 15.865, 50.0, 84.135, 97.725, 99.865)
+
+
+@dataclass(frozen=True)
+class Tolerance:
+    """Sai lệch của một tham số: ``normal`` (width = σ) hoặc ``uniform`` (±width)"""
+    kind: str = 'normal'
+    width: float = 0.0
+
+    def sample(self, rng, count):
+        if self.kind == 'uniform':
+            return rng.uniform(-self.width, self.width, count)
+        return rng.normal(0.0, self.width, count)
+
+
+def parse_tolerance(text):
+    """``"A=normal:0.05"``, ``"theta1=uniform:0.2"`` hoặc ``"n2=5e-4"`` (chuẩn)"""
+    name, sep, spec = text.partition('=')
+    name = name.strip()
+    if not sep or name not in PARAMS:
+        raise ValueError(f"dung sai khong hop le '{text}' (tham so: {', '.join(PARAMS)})")
+    kind, sep, width = spec.rpartition(':')
+    kind = kind.strip() or 'normal'
+    if kind not in DISTRIBUTIONS:
+        raise ValueError(f"phan bo khong hop le '{kind}' (chon: {', '.join(DISTRIBUTIONS)})")
+    return name, Tolerance(kind, float(width))
+
+
+@dataclass(frozen=True)
+class Spec:
+    """Khoảng chấp nhận (min, max) của δ và độ tách phổ (độ); None = không giới hạn"""
+    delta: tuple = (None, None)
+    separation: tuple = (None, None)
+
+    def check(self, delta, separation):
+        passed = np.ones(np.shape(delta), dtype=bool)
+        for values, (low, high) in ((delta, self.delta), (separation, self.separation)):
+            if low is not None:
+                passed &= values >= low
+            if high is not None:
+                passed &= values <= high
+        return passed
+
+
+def parse_range(text):
+    """``"37.5:38.5"``, ``"0.9:"`` hoặc ``":40"`` -> (min, max)"""
+    low, sep, high = text.partition(':')
+    if not sep:
+        raise ValueError(f"khoang khong hop le '{text}' (dang min:max)")
+    return (float(low) if low.strip() else None, float(high) if high.strip() else None)
+
+
+@dataclass(frozen=True)
+class ToleranceSetup:
+    """Lăng kính danh định, dung sai các tham số và hai bước sóng đo độ tách phổ"""
+    n1: float = 1.0
+    n2: float = 1.5
+    theta1: float = 45.0
+    prism_angle: float = 60.0
+    dispersion_model: CauchyModel = CauchyModel()
+    # Vạch F và C của hydro (nm)
+    wavelengths: tuple = (486.1, 656.3)
+    # ((tên tham số, Tolerance), ...); tham số không có mặt giữ giá trị danh định
+    tolerances: tuple = ()
+
+
+def evaluate(setup, count, rng, workers=1):
+    """Lấy ``count`` mẫu và tính ``(delta, separation, status)``"""
+    tolerances = dict(setup.tolerances)
+    # Luôn rút số ngẫu nhiên cho mọi tham số (theo thứ tự PARAMS) để thêm/bớt
+    # dung sai của một tham số không làm đổi các mẫu của tham số khác
+    offsets = {name: tolerances.get(name, Tolerance()).sample(rng, count) for name in PARAMS}
+    A = setup.prism_angle + offsets['A']
+    n1 = setup.n1 + offsets['n1']
+    n2 = setup.n2 + offsets['n2']
+    theta1 = setup.theta1 + offsets['theta1']
+    scale = 1.0 + offsets['dispersion']
+
+    model = setup.dispersion_model
+    n_d = model.index(REFERENCE_WAVELENGTH)
+    rays = physics.solve_prism_batch(n1, n2, theta1, A, workers=workers)
+    status = rays.status.astype(np.uint8)
+    delta_by_line = []
+    for wavelength in setup.wavelengths:
+        n = n2 + scale * (model.index(wavelength) - n_d)
+        line = physics.solve_prism_batch(n1, n, theta1, A, workers=workers)
+        status = np.where(status == physics.RAY_OK, line.status, status)
+        delta_by_line.append(line.delta)
+    return rays.delta, delta_by_line[0] - delta_by_line[1], status
+
+
+class ResultBuffer:
+    """Kết quả từng mẫu trong một khối shared memory: δ, độ tách phổ (float32), trạng thái
+
+    Tạo mới khi ``name`` là None, ngược lại gắn vào khối đã có (trong worker).
+    """
+
+    def __init__(self, count, name=None):
+        self.count = count
+        size = max(1, 9 * count)
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        buf = self._shm.buf
+        self.delta = np.ndarray(count, dtype=np.float32, buffer=buf, offset=0)
+        self.separation = np.ndarray(count, dtype=np.float32, buffer=buf, offset=4 * count)
+        self.status = np.ndarray(count, dtype=np.uint8, buffer=buf, offset=8 * count)
+        if name is None:
+            self.status[:] = PENDING
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def write(self, start, delta, separation, status):
+        stop = start + len(status)
+        self.delta[start:stop] = delta
+        self.separation[start:stop] = separation
+        self.status[start:stop] = status
+
+    def close(self):
+        # Phải bỏ các view trước khi đóng mmap
+        self.delta = self.separation = self.status = None
+        self._shm.close()
+
+    def unlink(self):
+        self.close()
+        self._shm.unlink()
+
+
+def evaluate_chunk(setup, buffer, start, size, seed, workers=1):
+    """Tính một chunk và ghi vào ``buffer[start:start + size]``"""
+    rng = np.random.default_rng(seed)
+    buffer.write(start, *evaluate(setup, size, rng, workers))
+    return start, size
+
+
+# ResultBuffer đã gắn trong process worker
+_worker_buffer = None
+
+
+def _attach(name, count):
+    global _worker_buffer
+    _worker_buffer = ResultBuffer(count, name=name)
+
+
+def _worker_chunk(setup, start, size, seed):
+    return evaluate_chunk(setup, _worker_buffer, start, size, seed)
+
+
+def _chunks(total, chunk_size):
+    starts = range(0, total, chunk_size)
+    return [(start, min(chunk_size, total - start)) for start in starts]
+
+
+def stream(setup, buffer, chunk_size=CHUNK_SIZE, workers=None, seed=0):
+    """Tính toàn bộ ``buffer``, sinh số mẫu đã xong mỗi khi một chunk hoàn thành
+
+    Chunk thứ i luôn dùng seed thứ i sinh từ ``seed`` nên kết quả không phụ
+    thuộc số worker hay thứ tự hoàn thành.
+    """
+    chunks = _chunks(buffer.count, chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    done = 0
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for (start, size), chunk_seed in zip(chunks, seeds):
+            evaluate_chunk(setup, buffer, start, size, chunk_seed, workers=None)
+            done += size
+            yield done
+        return
+
+    jobs = iter([(start, size, chunk_seed) for (start, size), chunk_seed in zip(chunks, seeds)])
+    with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                             initargs=(buffer.name, buffer.count)) as pool:
+        pending = set()
+        try:
+            while True:
+                while len(pending) < 2 * workers:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    pending.add(pool.submit(_worker_chunk, setup, *job))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done += future.result()[1]
+                    yield done
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+Quantity = namedtuple('Quantity', ['mean', 'std', 'percentiles'])
+Quantity.__doc__ = """Trung bình, độ lệch chuẩn và các phân vị ``PERCENTILES`` (độ)"""
+
+ToleranceSummary = namedtuple('ToleranceSummary',
+                              ['samples', 'valid', 'passed', 'delta', 'separation'])
+ToleranceSummary.__doc__ = """Số mẫu đã tính, số mẫu tia đi qua được, số mẫu đạt spec
+và thống kê ``Quantity`` của δ và độ tách phổ trên các mẫu đi qua được"""
+
+
+def _quantity(values):
+    if not len(values):
+        nan = float('nan')
+        return Quantity(nan, nan, tuple(nan for _ in PERCENTILES))
+    values = values.astype(np.float64)
+    return Quantity(float(values.mean()), float(values.std()),
+                    tuple(float(v) for v in np.percentile(values, PERCENTILES)))
+
+
+def summarize(buffer, spec=None):
+    """Thống kê trên các mẫu đã tính của ``buffer``"""
+    computed = buffer.status != PENDING
+    valid = buffer.status == physics.RAY_OK
+    delta = buffer.delta[valid]
+    separation = buffer.separation[valid]
+    passed = int(spec.check(delta, separation).sum()) if spec is not None else len(delta)
+    return ToleranceSummary(int(computed.sum()), len(delta), passed,
+                            _quantity(delta), _quantity(separation))
+
+
+def yield_fraction(summary):
+    """Tỉ lệ đạt trên số mẫu đã tính (mẫu phản xạ toàn phần tính là hỏng)"""
+    return summary.passed / summary.samples if summary.samples else float('nan')
+
+
+def format_summary(summary, spec=None):
+    """Bảng kết quả dạng văn bản (ASCII)"""
+    labels = ['-3s', '-2s', '-1s', 'p50', '+1s', '+2s', '+3s']
+    lines = [f"mau: {summary.samples:,}  tia qua duoc: {summary.valid:,}"
+             f"  dat spec: {summary.passed:,} ({100 * yield_fraction(summary):.3f}%)"]
+    lines.append(' ' * 12 + f"{'mean':>10}{'std':>10}" + ''.join(f'{v:>10}' for v in labels))
+    for title, quantity in (('delta', summary.delta), ('tach pho', summary.separation)):
+        lines.append(title.ljust(12) + f"{quantity.mean:>10.4f}{quantity.std:>10.4f}"
+                     + ''.join(f'{v:>10.4f}' for v in quantity.percentiles))
+    return '\n'.join(lines)
+
+
+class ToleranceView:
+    """Histogram δ và độ tách phổ (kèm giới hạn spec) cập nhật trong lúc chạy"""
+
+    def __init__(self, fig, spec=None, bins=120):
+        self.fig = fig
+        self.spec = spec or Spec()
+        self.bins = bins
+        self.axes = fig.subplots(1, 2)
+        self.axes[0].set_xlabel('Góc lệch δ tại λ_d (°)')
+        self.axes[1].set_xlabel('Độ tách phổ δ(λ₁) - δ(λ₂) (°)')
+        self.title = fig.suptitle('', color='white')
+
+    def update(self, buffer, summary, total):
+        valid = buffer.status == physics.RAY_OK
+        for ax, values, limits in ((self.axes[0], buffer.delta, self.spec.delta),
+                                   (self.axes[1], buffer.separation, self.spec.separation)):
+            ax.cla()
+            data = values[valid]
+            if len(data):
+                ax.hist(data, bins=self.bins, color='tab:cyan', histtype='stepfilled')
+            for limit in limits:
+                if limit is not None:
+                    ax.axvline(limit, color='red', linestyle='--')
+        self.axes[0].set_xlabel('Góc lệch δ tại λ_d (°)')
+        self.axes[1].set_xlabel('Độ tách phổ δ(λ₁) - δ(λ₂) (°)')
+        self.title.set_text(f"{summary.samples:,}/{total:,} mẫu, "
+                            f"đạt {100 * yield_fraction(summary):.2f}%")
+
+
+def run(setup, total, spec=None, chunk_size=CHUNK_SIZE, workers=None, seed=0, live=False,
+        refresh=0.5, progress=None):
+    """Chạy hết phân tích, trả về ``(summary, delta, separation, status)``
+
+    Các mảng trả về là bản sao (shared memory được giải phóng khi kết thúc).
+    ``progress(summary)`` được gọi tối đa mỗi ``refresh`` giây; ``live=True``
+    mở cửa sổ histogram, đóng cửa sổ sẽ dừng sớm.
+    """
+    view = None
+    if live:
+        import matplotlib.pyplot as plt
+        plt.style.use('dark_background')
+        fig = plt.figure(figsize=(12, 5))
+        fig.canvas.manager.set_window_title('Phan tich dung sai')
+        view = ToleranceView(fig, spec)
+        plt.show(block=False)
+
+    buffer = ResultBuffer(int(total))
+    try:
+        last = time.perf_counter()
+        for _ in stream(setup, buffer, chunk_size, workers, seed):
+            if time.perf_counter() - last < refresh:
+                continue
+            summary = summarize(buffer, spec)
+            if progress:
+                progress(summary)
+            if view is not None:
+                if not plt.fignum_exists(fig.number):
+                    break
+                view.update(buffer, summary, buffer.count)
+                plt.pause(0.001)
+            last = time.perf_counter()
+
+        summary = summarize(buffer, spec)
+        if view is not None and plt.fignum_exists(fig.number):
+            view.update(buffer, summary, buffer.count)
+            plt.show()
+        return summary, buffer.delta.copy(), buffer.separation.copy(), buffer.status.copy()
+    finally:
+        buffer.unlink()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Phan tich dung sai Monte Carlo cua goc lech va do tach pho")
+    parser.add_argument('--samples', type=float, default=1e6, help="so mau (vd 1e7)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None,
+                        help="so process (mac dinh: so nhan CPU)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--n1', type=float, default=ToleranceSetup.n1)
+    parser.add_argument('--n2', type=float, default=None,
+                        help=f"chiet suat tai 587.6 nm (mac dinh: {ToleranceSetup.n2} "
+                             "hoac n_d cua --glass)")
+    parser.add_argument('--glass', help="thuy tinh trong danh muc (vd N-SF11)")
+    parser.add_argument('--theta1', type=float, default=ToleranceSetup.theta1)
+    parser.add_argument('--A', type=float, default=ToleranceSetup.prism_angle)
+    parser.add_argument('--wavelengths', type=float, nargs=2, default=ToleranceSetup.wavelengths,
+                        metavar=('L1', 'L2'), help="hai buoc song do do tach pho (nm)")
+    parser.add_argument('--tol', action='append', default=[], metavar='PARAM=DIST:WIDTH',
+                        help="dung sai, vd A=normal:0.05, theta1=uniform:0.2, n2=5e-4, "
+                             "dispersion=normal:0.01 (lap lai duoc)")
+    parser.add_argument('--spec-delta', help="khoang chap nhan cua delta, vd 37.5:38.5")
+    parser.add_argument('--spec-separation', help="khoang chap nhan cua do tach pho, vd 0.9:")
+    parser.add_argument('--live', action='store_true', help="hien thi histogram truc tiep")
+    parser.add_argument('-o', '--output', help="luu ket qua tung mau ra file .npz")
+    args = parser.parse_args(argv)
+
+    try:
+        tolerances = tuple(dict(parse_tolerance(text) for text in args.tol).items())
+        spec = Spec(delta=parse_range(args.spec_delta) if args.spec_delta else (None, None),
+                    separation=(parse_range(args.spec_separation)
+                                if args.spec_separation else (None, None)))
+    except ValueError as e:
+        print(f"Loi: {e}", file=sys.stderr)
+        return 2
+
+    model, n2 = CauchyModel(), args.n2
+    if args.glass:
+        from prism.catalog import CatalogGlass, load_catalog
+        catalog = load_catalog()
+        if args.glass not in catalog:
+            print(f"Loi: khong co thuy tinh '{args.glass}' trong danh muc", file=sys.stderr)
+            return 1
+        model = CatalogGlass(catalog.names[catalog.row(args.glass)])
+        if n2 is None:
+            n2 = model.nd
+    if n2 is None:
+        n2 = ToleranceSetup.n2
+
+    setup = ToleranceSetup(n1=args.n1, n2=n2, theta1=args.theta1, prism_angle=args.A,
+                           dispersion_model=model, wavelengths=tuple(args.wavelengths),
+                           tolerances=tolerances)
+    total = int(args.samples)
+
+    def progress(summary):
+        print(f"\r{summary.samples:,}/{total:,} mau, dat {100 * yield_fraction(summary):.3f}%",
+              end='', file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    summary, delta, separation, status = run(setup, total, spec, args.chunk_size, args.workers,
+                                             args.seed, live=args.live, progress=progress)
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+
+    rate = summary.samples / elapsed if elapsed > 0 else float('inf')
+    print(f"Da tinh {summary.samples:,} mau trong {elapsed:.2f}s ({rate / 1e6:.2f} trieu mau/s)")
+    print(format_summary(summary, spec))
+    if args.output:
+        np.savez_compressed(args.output, delta=delta, separation=separation, status=status,
+                            percentiles=np.array(PERCENTILES))
+        print(f"Da luu ket qua: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
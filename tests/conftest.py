@@ -0,0 +1,19 @@
+"""Cấu hình chung: chạy headless (Agg) và cache bảng thủy tinh trong thư mục tạm"""
+import os
+
+import matplotlib
+import pytest
+
+matplotlib.use('Agg')
+
+
+@pytest.fixture(autouse=True, scope='session')
+def _cache_dir(tmp_path_factory):
+    # Không ghi vào ~/.cache/prism của người chạy test
+    previous = os.environ.get('PRISM_CACHE_DIR')
+    os.environ['PRISM_CACHE_DIR'] = str(tmp_path_factory.mktemp('prism-cache'))
+    yield
+    if previous is None:
+        os.environ.pop('PRISM_CACHE_DIR', None)
+    else:
+        os.environ['PRISM_CACHE_DIR'] = previous
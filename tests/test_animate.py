@@ -0,0 +1,29 @@
+import pytest
+
+from prism import animate
+from prism.dispersion import SellmeierModel
+from prism.scene import SceneState
+
+
+def test_rejects_coefficients_cancelled_by_anchoring():
+    base = SceneState(show_dispersion=True)
+    with pytest.raises(ValueError):
+        animate.Sweep(base, (animate.parse_track('model.A=1.4,1.6'),))
+    animate.Sweep(base, (animate.parse_track('model.B=0.004,0.03'),))
+
+    sellmeier = SceneState(show_dispersion=True, dispersion_model=SellmeierModel())
+    b = SellmeierModel()
+    uniform = tuple(animate.parse_track(f'model.{name}={v},{2 * v}')
+                    for name, v in (('B1', b.B1), ('B2', b.B2), ('B3', b.B3)))
+    with pytest.raises(ValueError):
+        animate.Sweep(sellmeier, uniform)
+    animate.Sweep(sellmeier, (animate.parse_track('model.B1=1.0,1.2'),))
+
+
+def test_gif_identical_across_workers(tmp_path):
+    sweep = animate.Sweep(SceneState(), (animate.parse_track('theta1=20,70'),), frames=4)
+    single = tmp_path / 'one.gif'
+    split = tmp_path / 'two.gif'
+    animate.render_sweep(sweep, str(single), dpi=30, workers=1)
+    animate.render_sweep(sweep, str(split), dpi=30, workers=2)
+    assert single.read_bytes() == split.read_bytes()
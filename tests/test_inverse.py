@@ -0,0 +1,37 @@
+import numpy as np
+
+from prism import inverse, physics
+
+
+def test_index_from_deviation_round_trips():
+    rng = np.random.default_rng(3)
+    count = 5000
+    n2 = rng.uniform(1.3, 1.9, count)
+    A = rng.uniform(30.0, 70.0, count)
+    theta1 = rng.uniform(20.0, 85.0, count)
+    rays = physics.solve_prism_batch(1.0, n2, theta1, A)
+    ok = rays.status == physics.RAY_OK
+    assert ok.sum() > count // 2
+
+    result = inverse.index_from_deviation(rays.delta[ok], theta1[ok], A[ok])
+    assert result.converged.all()
+    np.testing.assert_allclose(result.n2, n2[ok], rtol=0, atol=1e-9)
+
+
+def test_index_from_min_deviation_round_trips():
+    n2 = np.linspace(1.3, 1.9, 200)
+    A = np.linspace(30.0, 60.0, 200)
+    # Góc tới đối xứng cho góc lệch cực tiểu
+    theta1 = np.degrees(np.arcsin(n2 * np.sin(np.radians(A / 2))))
+    delta_min = physics.solve_prism_batch(1.0, n2, theta1, A).delta
+
+    result = inverse.index_from_min_deviation(delta_min, A)
+    assert result.converged.all()
+    np.testing.assert_allclose(result.n2, n2, rtol=0, atol=1e-12)
+
+
+def test_unreachable_deviation_is_not_converged():
+    # (A + δ)/2 > 90°: công thức cho n₂ nhưng tính xuôi không cho lại δ
+    result = inverse.index_from_min_deviation(170.0, 60.0)
+    assert not result.converged
+    assert np.isnan(result.n2)
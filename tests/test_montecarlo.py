@@ -0,0 +1,27 @@
+import numpy as np
+
+from prism import montecarlo
+
+
+def _final(setup, workers, chunk_size=2000):
+    histogram = None
+    for _, histogram in montecarlo.stream(setup, 10_000, chunk_size, workers=workers, seed=7):
+        pass
+    return histogram.copy()
+
+
+def test_histogram_independent_of_workers():
+    setup = montecarlo.DetectorSetup()
+    single = _final(setup, workers=1)
+    assert single.sum() > 0
+    np.testing.assert_array_equal(single, _final(setup, workers=2))
+    np.testing.assert_array_equal(single, _final(setup, workers=3))
+
+
+def test_seed_changes_result():
+    setup = montecarlo.DetectorSetup()
+    first = _final(setup, workers=1)
+    other = None
+    for _, other in montecarlo.stream(setup, 10_000, 2000, workers=1, seed=8):
+        pass
+    assert not np.array_equal(first, other)
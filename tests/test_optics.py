@@ -0,0 +1,36 @@
+import numpy as np
+
+from prism import optics, raytrace
+
+
+def _beam(count):
+    origins, directions = raytrace.parallel_beam((0.0, 0.0), 0.0, 0.5, count)
+    return optics.make_rays(origins, directions, np.linspace(400.0, 700.0, count))
+
+
+def test_chunked_trace_matches_single_chunk():
+    # Bộ đệm dùng lại giữa các chunk/phần tử không được làm lệch kết quả
+    system = optics.demo_train(8)
+    reference = _beam(3000)
+    system.chunk_size = len(reference)
+    system.trace(reference)
+
+    rays = _beam(3000)
+    system.chunk_size = 512
+    system.trace(rays)
+    for field in optics.RAY_DTYPE.names:
+        assert np.array_equal(rays[field], reference[field]), field
+
+
+def test_trace_rays_writes_into_buffers():
+    vertices = raytrace.prism_vertices(60.0)
+    origins, directions = raytrace.parallel_beam((-1.0, 0.5), 0.0, 0.4, 100)
+    buffers = raytrace.trace_buffers(256, max_bounces=10)
+    trace = raytrace.trace_rays(vertices, origins, directions, 1.0, 1.5,
+                                record_paths=False, out=buffers)
+    fresh = raytrace.trace_rays(vertices, origins, directions, 1.0, 1.5, record_paths=False)
+
+    assert np.shares_memory(trace.positions, buffers.positions)
+    assert np.shares_memory(trace.transmission, buffers.transmission)
+    for got, expected in zip(trace[1:], fresh[1:]):
+        assert np.array_equal(got, expected)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from prism import physics
+
+
+def _random_rays(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.uniform(0.8, 1.5, count), rng.uniform(1.0, 2.5, count),
+            rng.uniform(-10, 90, count), rng.uniform(20, 90, count))
+
+
+def test_scalar_matches_batch_bitwise():
+    n1, n2, theta1, A = _random_rays(20_000)
+    batch = physics.solve_prism_batch(n1, n2, theta1, A)
+    # Đủ mọi trạng thái để kiểm tra cả các nhánh lỗi
+    assert set(np.unique(batch.status)) == {physics.RAY_OK, physics.RAY_TIR_ENTRY,
+                                            physics.RAY_NO_EXIT, physics.RAY_TIR_EXIT}
+    for i in range(len(n1)):
+        ray = physics.prism_ray(n1[i], n2[i], theta1[i], A[i])
+        if batch.status[i] == physics.RAY_OK:
+            assert (ray["r1"], ray["r2"], ray["theta2"], ray["delta"]) == (
+                batch.r1[i], batch.r2[i], batch.theta2[i], batch.delta[i])
+        else:
+            assert ray == {"error": physics.STATUS_MESSAGES[batch.status[i]]}
+
+
+def test_snell_law_matches_batch():
+    rng = np.random.default_rng(1)
+    n1, n2 = rng.uniform(1.0, 2.0, 5000), rng.uniform(1.0, 2.0, 5000)
+    theta1 = rng.uniform(-89, 89, 5000)
+    theta2, tir = physics.snell_law_batch(n1, n2, theta1)
+    for i in range(len(n1)):
+        scalar = physics.snell_law(n1[i], n2[i], theta1[i])
+        assert (scalar is None) if tir[i] else scalar == theta2[i]
+
+
+def test_single_ray_batch_is_zero_dimensional():
+    result = physics.solve_prism_batch(1.0, 1.5, 45.0, 60.0)
+    assert result.delta.shape == ()
+    assert result.delta == pytest.approx(37.3813064834, abs=1e-9)
+
+
+@pytest.mark.parametrize('workers', [2, 3, 8])
+def test_batch_independent_of_workers(workers):
+    n1, n2, theta1, A = _random_rays(16 * physics.CHUNK_SIZE, seed=2)
+    single = physics.solve_prism_batch(n1, n2, theta1, A, workers=1)
+    threaded = physics.solve_prism_batch(n1, n2, theta1, A, workers=workers)
+    for a, b in zip(single, threaded):
+        np.testing.assert_array_equal(a, b)
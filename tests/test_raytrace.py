@@ -0,0 +1,40 @@
+import numpy as np
+
+from prism import physics, raytrace
+
+
+def _trace_through_entry(A, theta1, n2, **kwargs):
+    vertices = raytrace.prism_vertices(A)
+    direction = raytrace.incident_direction(A, theta1)
+    impact = (vertices[0] + vertices[2]) / 2
+    return raytrace.trace_rays(vertices, impact - 2.0 * direction, direction, 1.0, n2, **kwargs)
+
+
+def test_exit_deviation_matches_batch_solver():
+    rng = np.random.default_rng(0)
+    count = 1500
+    A = rng.uniform(30, 80, count)
+    theta1 = rng.uniform(0, 85, count)
+    n2 = rng.uniform(1.2, 2.2, count)
+    batch = physics.solve_prism_batch(1.0, n2, theta1, A)
+
+    checked = 0
+    for i in np.flatnonzero(batch.status == physics.RAY_OK):
+        trace = _trace_through_entry(A[i], theta1[i], n2[i], record_paths=False)
+        if not (trace.faces[0, 0] == raytrace.FACE_ENTRY and trace.faces[0, 1] == raytrace.FACE_EXIT):
+            continue    # Tia chạm đáy trước mặt ra: công thức lăng kính không áp dụng
+        incident = raytrace.incident_direction(A[i], theta1[i])
+        exit_dir = trace.directions[0]
+        cross = incident[0] * exit_dir[1] - incident[1] * exit_dir[0]
+        delta = -np.degrees(np.arctan2(cross, incident @ exit_dir))
+        assert abs(delta - batch.delta[i]) < 1e-12
+        checked += 1
+    assert checked > count // 4
+
+
+def test_total_internal_reflection_stays_inside_until_escape():
+    # n lớn, góc tới nhỏ: phản xạ toàn phần tại mặt ra rồi thoát qua đáy
+    trace = _trace_through_entry(60.0, 20.0, 2.4)
+    assert trace.escaped[0]
+    assert trace.reflections[0] >= 1
+    assert raytrace.FACE_BASE in trace.faces[0]
@@ -0,0 +1,53 @@
+import warnings
+
+import numpy as np
+import pytest
+from matplotlib.backend_bases import CloseEvent
+
+
+@pytest.fixture
+def app():
+    import main
+    app = main.SimplePrismSimulator()
+    yield app
+    app.close_regime_map()
+
+
+def test_f4_reuses_window_and_releases_replaced_one(app):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)    # fig.show() trên Agg
+        app.show_regime_map()
+        first = app.regime_window
+        app.show_regime_map()
+        assert app.regime_window is first
+
+        # n₂ đổi: cửa sổ cũ được đóng, thread pool của nó được giải phóng
+        app.slider_n2.set_val(1.7)
+        app.scheduler.flush()
+        app.show_regime_map()
+    assert app.regime_window is not first
+    assert first[1].map._pool is None
+    assert app.regime_window[1].map.fixed['n2'] == 1.7
+
+
+def test_marker_follows_sliders(app):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        app.show_regime_map()
+    app.slider_theta.set_val(33.0)
+    app.slider_prism_angle.set_val(52.0)
+    app.scheduler.flush()
+    x, y = app.regime_window[1].marker.get_data()
+    assert np.array_equal(x, [33.0]) and np.array_equal(y, [52.0])
+
+
+def test_close_event_stops_map(app):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)
+        app.show_regime_map()
+    fig, view, _ = app.regime_window
+    view.map.request([(0, 0, 0)])
+    # Như khi người dùng đóng cửa sổ trên backend GUI
+    fig.canvas.callbacks.process('close_event', CloseEvent('close_event', fig.canvas))
+    assert view.map._pool is None
+    assert app.regime_window is None
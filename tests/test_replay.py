@@ -0,0 +1,56 @@
+from matplotlib.backend_bases import MouseButton, MouseEvent
+
+from prism import replay
+
+
+def _drag(canvas, ax, start, stop, steps=8):
+    """Kéo chuột như backend Tk: chuyển động chỉ mang ``buttons``, không có ``button``"""
+    def point(fx):
+        # Tọa độ pixel nguyên như sự kiện thật (MouseEvent cắt x, y về int)
+        return ax.transAxes.transform((fx, 0.5)).round()
+
+    canvas.callbacks.process('button_press_event', MouseEvent(
+        'button_press_event', canvas, *point(start), button=MouseButton.LEFT))
+    for i in range(1, steps + 1):
+        fx = start + (stop - start) * i / steps
+        canvas.callbacks.process('motion_notify_event', MouseEvent(
+            'motion_notify_event', canvas, *point(fx), buttons={MouseButton.LEFT}))
+    canvas.callbacks.process('button_release_event', MouseEvent(
+        'button_release_event', canvas, *point(stop), button=MouseButton.LEFT))
+
+
+def test_records_and_replays_tk_style_drags():
+    source = replay.create_app(replay.ReplayClock(realtime=False))
+    recorder = replay.SessionRecorder(source.fig.canvas)
+    _drag(source.fig.canvas, source.slider_theta.ax, 0.2, 0.8)
+    _drag(source.fig.canvas, source.ax_main, 0.3, 0.7)
+    recorder.stop()
+
+    motions = [event for event in recorder.events if event.kind == 'motion']
+    assert len(motions) == 16
+    assert all(event.button == 1 for event in motions)
+
+    clock = replay.ReplayClock(realtime=False)
+    app = replay.create_app(clock)
+    theta, xlim = app.slider_theta.val, app.ax_main.get_xlim()
+    replayer = replay.Replayer(app, clock)
+    replayer.run(recorder.events, speed=None)
+
+    assert app.slider_theta.val == source.slider_theta.val != theta
+    assert app.ax_main.get_xlim() != xlim
+    assert {'slider', 'pan'} <= set(replayer.latencies)
+
+
+def test_records_drag_started_before_recording():
+    # Nút được nhấn trước khi bắt đầu ghi: chỉ ``buttons`` cho biết đang kéo
+    app = replay.create_app(replay.ReplayClock(realtime=False))
+    canvas = app.fig.canvas
+    recorder = replay.SessionRecorder(canvas)
+    x, y = app.ax_main.transAxes.transform((0.5, 0.5)).round()
+    canvas.callbacks.process('motion_notify_event', MouseEvent(
+        'motion_notify_event', canvas, x, y, buttons={MouseButton.RIGHT}))
+    canvas.callbacks.process('motion_notify_event', MouseEvent(
+        'motion_notify_event', canvas, x + 5, y, buttons=set()))
+    recorder.stop()
+
+    assert [(event.kind, event.button) for event in recorder.events] == [('motion', 3)]
@@ -0,0 +1,76 @@
+import pytest
+
+from prism.scheduler import UpdateScheduler
+
+
+@pytest.fixture(scope='module')
+def app():
+    import main
+    return main.SimplePrismSimulator()
+
+
+def _settle(app):
+    app.scheduler.flush()
+    return app.scheduler.stats()
+
+
+def test_slider_burst_renders_latest_value_once(app):
+    _settle(app)
+    before = app.scheduler.stats()
+    frames = []
+    original = app.scheduler.render
+    app.scheduler.render = lambda: frames.append(app.slider_theta.val) or original()
+    try:
+        for i in range(40):
+            app.slider_theta.set_val(20 + i)
+        stats = _settle(app)
+    finally:
+        app.scheduler.render = original
+
+    assert stats["requested"] - before["requested"] == 40
+    assert stats["dropped"] - before["dropped"] == 39
+    assert stats["rendered"] - before["rendered"] == 1
+    assert frames == [59]
+
+
+def test_reset_is_one_frame(app):
+    app.slider_n2.set_val(1.8)
+    app.slider_prism_angle.set_val(45)
+    before = _settle(app)
+    app.reset_values(None)
+    stats = _settle(app)
+    assert stats["rendered"] - before["rendered"] == 1
+    assert app.slider_prism_angle.val == app.slider_prism_angle.valinit
+
+
+class _Timer:
+    def __init__(self):
+        self.started = 0
+        self.callbacks = []
+
+    def add_callback(self, func):
+        self.callbacks.append(func)
+
+    def start(self):
+        self.started += 1
+
+    def stop(self):
+        pass
+
+
+class _Canvas:
+    def new_timer(self, interval):
+        return _Timer()
+
+
+def test_batch_defers_timer_until_exit():
+    renders = []
+    scheduler = UpdateScheduler(_Canvas(), lambda: renders.append(1))
+    with scheduler.batch():
+        scheduler.request()
+        scheduler.request()
+        scheduler.flush()       # Bị hoãn trong khối batch
+        assert scheduler.timer.started == 0 and not renders
+    assert scheduler.timer.started == 1
+    scheduler.flush()
+    assert renders == [1]
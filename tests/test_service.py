@@ -0,0 +1,149 @@
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from prism import physics, service
+
+
+class _Writer:
+    """Writer giả: gom các dòng phản hồi"""
+
+    def __init__(self, on_write=None):
+        self.lines = []
+        self.closed = False
+        self.on_write = on_write
+
+    def write(self, data):
+        self.lines.append(json.loads(data))
+        if self.on_write:
+            self.on_write(self.lines[-1])
+
+    async def drain(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def _reader(*requests, limit=service.LINE_LIMIT):
+    reader = asyncio.StreamReader(limit=limit)
+    for request in requests:
+        reader.feed_data(request if isinstance(request, bytes)
+                         else json.dumps(request).encode() + b'\n')
+    reader.feed_eof()
+    return reader
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Op ``wait`` chặn thread tới khi event được set"""
+    opened = threading.Event()
+    started = []
+
+    def op_wait(svc, request):
+        started.append(request['id'])
+        if not opened.wait(10):
+            raise TimeoutError("gate khong mo")
+        return {}
+
+    monkeypatch.setitem(service.OPS, 'wait', op_wait)
+    return opened, started
+
+
+def _serve(svc, *requests, limit=service.LINE_LIMIT, on_write=None):
+    """Chạy ``handle`` trên các dòng ``requests``, trả về writer giả"""
+    writer = _Writer(on_write)
+
+    async def scenario():
+        await svc.handle(_reader(*requests, limit=limit), writer)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        svc.shutdown()
+    return writer
+
+
+def test_pipelined_responses_matched_by_id(gate):
+    opened, _ = gate
+    writer = _serve(service.PrismService(workers=2),
+                    {"id": "a", "op": "wait"}, {"id": "b", "op": "ping"},
+                    on_write=lambda response: opened.set())
+    # "a" chỉ xong sau khi phản hồi của "b" đã được ghi: về ngược thứ tự gửi
+    assert [line['id'] for line in writer.lines] == ["b", "a"]
+    assert all(line['ok'] for line in writer.lines)
+    assert writer.closed
+
+
+def test_errors_for_unknown_op_and_non_object():
+    writer = _serve(service.PrismService(workers=1),
+                    {"id": 1, "op": "nope"}, b'[1, 2]\n', {"id": 3, "op": "ping"})
+    responses = {line['id']: line for line in writer.lines}
+    assert not responses[1]['ok'] and "op khong hop le 'nope'" in responses[1]['error']
+    assert not responses[None]['ok'] and "object JSON" in responses[None]['error']
+    assert responses[3]['ok']
+
+
+def test_max_inflight_stops_reading(gate):
+    opened, started = gate
+    svc = service.PrismService(workers=4, max_inflight=2)
+    writer = _Writer()
+
+    async def scenario():
+        reader = _reader(*({"id": i, "op": "wait"} for i in range(4)))
+        handler = asyncio.create_task(svc.handle(reader, writer))
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(started) == 2:
+                break
+        await asyncio.sleep(0.05)
+        # Hai yêu cầu đang xử lý: hai dòng sau vẫn nằm trong reader
+        assert svc.inflight == 2 and started == [0, 1]
+        assert not reader.at_eof()
+        opened.set()
+        await handler
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        svc.shutdown()
+    assert sorted(line['id'] for line in writer.lines) == [0, 1, 2, 3]
+
+
+def test_base64_arrays_round_trip():
+    for values in (np.linspace(0, 1, 12).reshape(3, 4), np.arange(5, dtype=np.int8)):
+        decoded = service.decode_array(json.loads(json.dumps(service.encode_array(values))))
+        assert decoded.dtype == values.dtype and np.array_equal(decoded, values)
+
+    theta1 = np.linspace(10, 80, 50)
+    writer = _serve(service.PrismService(workers=1), {
+        "id": 1, "op": "rays", "theta1": service.encode_array(theta1), "encoding": "base64"})
+    result = writer.lines[0]['result']
+    expected = physics.solve_prism_batch(1.0, 1.5, theta1, 60.0)
+    assert np.array_equal(service.decode_array(result['delta']), expected.delta, equal_nan=True)
+    assert np.array_equal(service.decode_array(result['status']), expected.status)
+
+
+def test_overlong_line_closes_connection():
+    writer = _serve(service.PrismService(workers=1),
+                    b'{"id": 1, "op": "ping", "pad": "' + b'x' * 200 + b'"}\n',
+                    {"id": 2, "op": "ping"}, limit=64)
+    assert writer.closed
+    assert writer.lines == []
+
+
+def test_stdio_accepts_regular_file(tmp_path):
+    requests = tmp_path / 'requests.ndjson'
+    requests.write_text('{"id": 1, "op": "ping"}\n{"id": 2, "op": "nope"}\n')
+    with open(requests, 'rb') as stdin:
+        result = subprocess.run([sys.executable, '-m', 'prism.service', 'serve', '--stdio',
+                                 '--workers', '1'], stdin=stdin, capture_output=True,
+                                timeout=60)
+    assert result.returncode == 0, result.stderr.decode()
+    responses = {line['id']: line for line in map(json.loads, result.stdout.splitlines())}
+    assert responses[1]['ok'] and not responses[2]['ok']
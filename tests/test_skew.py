@@ -0,0 +1,53 @@
+import numpy as np
+
+from prism import physics, raytrace, skew
+
+
+def _trace(A, theta1, n2, tilt=0.0, length=3.0):
+    direction = skew.skew_direction(A, theta1, tilt)
+    origin = skew.entry_point(A) - 2.0 * direction
+    return skew.trace_skew(skew.prism_planes(A, length=length), origin[None], direction[None],
+                           1.0, n2, record_paths=False), direction
+
+
+def test_zero_tilt_matches_planar_tracer():
+    rng = np.random.default_rng(5)
+    for A, theta1, n2 in zip(rng.uniform(30, 80, 400), rng.uniform(0, 85, 400),
+                             rng.uniform(1.2, 2.4, 400)):
+        result, _ = _trace(A, theta1, n2)
+        vertices = raytrace.prism_vertices(A)
+        direction = raytrace.incident_direction(A, theta1)
+        impact = (vertices[0] + vertices[2]) / 2
+        planar = raytrace.trace_rays(vertices, impact - 2.0 * direction, direction, 1.0, n2,
+                                     record_paths=False)
+
+        assert np.array_equal(result.faces, planar.faces)
+        assert np.array_equal(result.escaped, planar.escaped)
+        assert np.array_equal(result.reflections, planar.reflections)
+        assert np.all(result.directions[:, 2] == 0.0)
+        np.testing.assert_allclose(result.directions[:, :2], planar.directions, rtol=0, atol=1e-14)
+
+
+def test_tilted_ray_follows_effective_index():
+    # Hình chiếu của tia nghiêng góc γ tuân theo định luật Snell 2D với
+    # n' = sqrt(n² - sin²γ) / cos γ; thành phần z của hướng được bảo toàn
+    rng = np.random.default_rng(6)
+    checked = 0
+    for A, theta1, n2, tilt in zip(rng.uniform(40, 70, 500), rng.uniform(30, 80, 500),
+                                   rng.uniform(1.4, 1.8, 500), rng.uniform(0, 30, 500)):
+        # Lăng kính rất dài để tia không chạm hai mặt đáy
+        result, direction = _trace(A, theta1, n2, tilt, length=1000.0)
+        gamma = np.radians(tilt)
+        n_eff = np.sqrt(n2 ** 2 - np.sin(gamma) ** 2) / np.cos(gamma)
+        planar = physics.solve_prism_batch(1.0, n_eff, theta1, A)
+        if planar.status != physics.RAY_OK or result.reflections[0] or not result.escaped[0]:
+            continue
+
+        incident = direction[:2] / np.hypot(*direction[:2])
+        c, s = np.cos(np.radians(-planar.delta)), np.sin(np.radians(-planar.delta))
+        expected = np.array([(c * incident[0] - s * incident[1]) * np.cos(gamma),
+                             (s * incident[0] + c * incident[1]) * np.cos(gamma),
+                             np.sin(gamma)])
+        np.testing.assert_allclose(result.directions[0], expected, rtol=0, atol=1e-14)
+        checked += 1
+    assert checked > 250
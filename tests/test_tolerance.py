@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import pytest
+
+from prism import tolerance
+
+SETUP = tolerance.ToleranceSetup(tolerances=tuple(
+    tolerance.parse_tolerance(text)
+    for text in ('A=normal:0.05', 'n2=normal:5e-4', 'theta1=uniform:0.2', 'dispersion=0.01')))
+
+
+def _shm_names():
+    return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+
+@pytest.mark.parametrize('workers', [2, 3])
+def test_results_independent_of_workers(workers):
+    args = dict(chunk_size=1000, seed=11)
+    before = _shm_names()
+    _, *reference = tolerance.run(SETUP, 7500, workers=1, **args)
+    summary, *result = tolerance.run(SETUP, 7500, workers=workers, **args)
+
+    assert summary.samples == 7500
+    for got, expected in zip(result, reference):
+        assert np.array_equal(got, expected)
+    # Khối shared memory được giải phóng sau khi chạy
+    assert _shm_names() <= before
+
+
+def test_seed_changes_samples():
+    _, delta, _, _ = tolerance.run(SETUP, 2000, workers=1, seed=1)
+    _, other, _, _ = tolerance.run(SETUP, 2000, workers=1, seed=2)
+    assert not np.array_equal(delta, other)